@@ -1,8 +1,9 @@
 """
-This module contains the `Board` class, which represents the state of a chess game. 
+This module contains the entry point of the chess game, built around the `Board` class, which represents
+the state of a chess game.
 
-The `Board` class manages the layout of the chessboard, piece movements, game rules, and 
-player turns. It provides methods to update the board, validate moves, 
+The `Board` class manages the layout of the chessboard, piece movements, game rules, and
+player turns. It provides methods to update the board, validate moves,
 and assess the current game state.
 
 Key functionality includes:
@@ -13,14 +14,62 @@ Key functionality includes:
 - Managing castling conditions for both players.
 
 Usage:
-    To use the `Board` class, import it and instantiate an object of the class to 
+    To use the `Board` class, import it and instantiate an object of the class to
     interact with the chess game.
 
+    python main.py [--computer w|b] starts a game in the terminal, and python main.py <command> runs
+    one of the tools in `COMMANDS` (perft, search, uci, serve, match, ...); --help lists its options.
+
 Example:
-    from chess.objects.board import Board
+    from objects.board import Board
     game = Board()
-    game.start_game()
+    game.play()
 """
-from objects.board import Board
-board = Board()
-board.play()
+import sys
+
+#Each subcommand and the module whose main(args) runs it. A module is only imported when its command is
+#used, so starting a game doesn't pay for the tools
+COMMANDS = {
+    'perft': 'objects.perft',
+    'search': 'objects.engine',
+    'codec-bench': 'objects.codec',
+    'pgn': 'objects.pgn',
+    'parallel-bench': 'objects.parallel',
+    'book': 'objects.book',
+    'uci': 'objects.uci',
+    'serve': 'objects.server',
+    'loadgen': 'objects.loadgen',
+    'tablebase': 'objects.tablebase',
+    'startup-bench': 'objects.startup',
+    'match': 'objects.match',
+    'dataset': 'objects.dataset',
+    'cache': 'objects.cache',
+    'render-bench': 'objects.ansi',
+}
+
+#Guarded so worker processes that import this module (the parallel search) don't start a game
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+        from importlib import import_module
+        sys.exit(import_module(COMMANDS[sys.argv[1]]).main(sys.argv[2:]))
+
+    import argparse
+    from objects.game import Game
+    from objects import terminal
+    parser = argparse.ArgumentParser(prog = 'main.py', description = 'Play chess in the terminal.')
+    parser.add_argument('--computer', choices = ('w','b'), help = 'Let the engine play this color')
+    parser.add_argument('--think-ms', type = int, default = 1000, help = 'How long the engine thinks per move')
+    parser.add_argument('--book', help = 'Opening book file for the engine (see main.py book build)')
+    parser.add_argument('--tablebases', help = 'Directory of endgame tables (see main.py tablebase generate)')
+    options = parser.parse_args()
+
+    book = None
+    if options.book:
+        from objects.book import OpeningBook
+        book = OpeningBook(options.book)
+    tablebases = None
+    if options.tablebases:
+        from objects.tablebase import Tablebases
+        tablebases = Tablebases(options.tablebases)
+    terminal.play(Game(), computer = options.computer, think_ms = options.think_ms, book = book,
+                  tablebases = tablebases)
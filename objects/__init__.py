@@ -0,0 +1,5 @@
+import os
+#Instrumentation is off unless asked for; see instrumentation.py
+if os.environ.get('TERMINALCHESS_STATS', '') not in ('', '0'):
+    from . import instrumentation
+    instrumentation.enable_from_environment()
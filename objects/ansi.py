@@ -0,0 +1,201 @@
+"""
+This module contains a diff-based ANSI renderer for the terminal board, and a broadcast that sends the
+same frames to any number of spectators.
+
+The board is laid out exactly as `terminal.render` prints it. A keyframe clears the screen and draws the
+whole board. Every frame after that moves the cursor to each square that changed since the last frame
+(ANSI `ESC[row;colH`) and rewrites that cell, so a quiet move costs two squares instead of the roughly
+900 bytes of a full redraw. The bytes of every (square, piece) cell, cursor move included, are built
+once per renderer, so a frame is a join of cached byte strings.
+
+A `Broadcast` renders each frame once and writes the very same bytes object to every spectator. A
+spectator that joins late gets a keyframe of the current position first, and one whose stream fails is
+dropped. The server's "watch" request turns a connection into a spectator of a game.
+
+Classes:
+- DiffRenderer(top): Remembers what the screen shows and renders the frames that bring it up to date.
+- Broadcast(top): One renderer and the streams it fans each frame out to.
+
+Functions:
+- DiffRenderer.keyframe(position, caption) / frame(position, caption): The bytes that draw the whole
+    board, or only what changed.
+- Broadcast.add(stream) / remove(stream) / publish(position, caption): Manage the spectators and send
+    them a position.
+- benchmark(plies, spectators, seed): Frames/sec and bytes per move of full redraws, diff frames and a
+    broadcast.
+- main(args): The `python main.py render-bench` command line.
+"""
+import time
+from .position import TURN
+from .terminal import GLYPHS, render
+
+CLEAR = b'\x1b[2J'
+#Clears from the cursor to the end of the line
+CLEAR_LINE = b'\x1b[K'
+#The rows render() prints: the letters, then a rank and a rule line per rank, then the letters again
+BOARD_LINES = 19
+
+def _goto(line, column):
+    return f'\x1b[{line};{column}H'.encode()
+
+class DiffRenderer:
+    def __init__(self, top = 1):
+        #top is the screen line the board starts on
+        self.top = top
+        #cells[sq][code]: the cursor move to sq's cell and the cell itself showing code
+        self.cells = []
+        for sq in range(64):
+            line = top + 2 + (7 - (sq >> 3)) * 2
+            column = 4 + (sq & 7) * 5 #After the "8 |" of the rank and 5 characters per square
+            self.cells.append([_goto(line, column) + f' {GLYPHS[code]:^2} '.encode() for code in range(16)])
+        self.home = _goto(top, 1)
+        self.below = _goto(top + BOARD_LINES, 1)
+        self.shown = None #The 64 square codes on screen, None before the first keyframe
+        self.caption = None
+
+    def reset(self):
+        #Forget the screen, so the next frame is a keyframe
+        self.shown = None
+        self.caption = None
+
+    def keyframe(self, position, caption = ''):
+        #Clears the screen and draws the whole board, with the caption on the line below it
+        self.shown = bytes(position.data[:64])
+        self.caption = caption
+        board = render(position).replace('\n', '\r\n').encode()
+        return CLEAR + self.home + board + self.below + caption.encode() + CLEAR_LINE
+
+    def frame(self, position, caption = ''):
+        #Only the squares (and caption) that changed since the last frame; b'' if nothing did
+        if self.shown is None:
+            return self.keyframe(position, caption)
+        squares = position.data[:64]
+        shown = self.shown
+        if shown == squares and caption == self.caption:
+            return b''
+        cells = self.cells
+        parts = [cells[sq][code] for sq, (old, code) in enumerate(zip(shown, squares)) if old != code]
+        if caption != self.caption:
+            parts.append(self.below + caption.encode() + CLEAR_LINE)
+            self.caption = caption
+        else:
+            parts.append(self.below) #Park the cursor under the board
+        self.shown = bytes(squares)
+        return b''.join(parts)
+
+class Broadcast:
+    def __init__(self, top = 1):
+        self.renderer = DiffRenderer(top)
+        self.spectators = {} #stream: its flush method, or None
+        self.position = None
+        self.caption = ''
+        self.frames = 0
+        self.bytes_sent = 0
+
+    def __len__(self):
+        return len(self.spectators)
+
+    def _send(self, stream, flush, frame):
+        try:
+            stream.write(frame)
+            if flush is not None:
+                flush()
+        except (OSError, ValueError): #A closed pipe, socket or file
+            self.spectators.pop(stream, None)
+            return False
+        self.bytes_sent += len(frame)
+        return True
+
+    def add(self, stream):
+        #stream takes bytes: a binary file, sys.stdout.buffer or an asyncio StreamWriter. It gets a
+        #keyframe of the current position straight away, if there is one
+        flush = getattr(stream, 'flush', None)
+        self.spectators[stream] = flush
+        if self.position is not None:
+            self._send(stream, flush, DiffRenderer(self.renderer.top).keyframe(self.position, self.caption))
+
+    def remove(self, stream):
+        self.spectators.pop(stream, None)
+
+    def publish(self, position, caption = ''):
+        #Render the position once and send the frame to every spectator. Returns the frame
+        frame = self.renderer.frame(position, caption)
+        self.position = position.copy()
+        self.caption = caption
+        if frame:
+            self.frames += 1
+            for stream, flush in list(self.spectators.items()):
+                self._send(stream, flush, frame)
+        return frame
+
+class _Sink:
+    #A spectator stream that only counts what it is sent
+    def __init__(self):
+        self.written = 0
+
+    def write(self, data):
+        self.written += len(data)
+
+def _sample_game(plies, seed):
+    #The positions of a game of random legal moves, starting with the initial one
+    import random
+    from .game import Game
+    rng = random.Random(seed)
+    game = Game()
+    positions = [game.position.copy()]
+    for _ in range(plies):
+        moves = game.legal_moves()
+        if not moves or game.status().result != '*':
+            break
+        game.apply_move(rng.choice(moves))
+        positions.append(game.position.copy())
+    return positions
+
+def benchmark(plies = 200, spectators = 100, seed = 1):
+    #{name: (frames/sec, bytes per move)} for redrawing the whole board with render(), diff frames, and
+    #diff frames fanned out to every spectator (bytes per move per spectator) against every spectator
+    #redrawing its own board
+    positions = _sample_game(plies, seed)
+    moves = len(positions) - 1
+    results = {}
+    start = time.perf_counter()
+    sent = sum(len(render(position).encode()) for position in positions[1:])
+    results['full redraw'] = (moves / (time.perf_counter() - start), sent / moves)
+    renderer = DiffRenderer()
+    renderer.keyframe(positions[0])
+    start = time.perf_counter()
+    sent = sum(len(renderer.frame(position, f'{"wb"[position.data[TURN]]} to move')) for position in positions[1:])
+    results['diff'] = (moves / (time.perf_counter() - start), sent / moves)
+    sinks = [_Sink() for _ in range(spectators)]
+    start = time.perf_counter()
+    for position in positions[1:]:
+        for sink in sinks: #Each viewer redrawing its own board
+            sink.write(render(position).encode())
+    results[f'full redraw x{spectators}'] = (moves / (time.perf_counter() - start),
+                                             sum(sink.written for sink in sinks) / moves / spectators)
+    broadcast = Broadcast()
+    broadcast.publish(positions[0])
+    sinks = [_Sink() for _ in range(spectators)]
+    for sink in sinks:
+        broadcast.add(sink)
+        sink.written = 0
+    start = time.perf_counter()
+    for position in positions[1:]:
+        broadcast.publish(position, f'{"wb"[position.data[TURN]]} to move')
+    results[f'broadcast x{spectators}'] = (moves / (time.perf_counter() - start),
+                                           sum(sink.written for sink in sinks) / moves / spectators)
+    return results
+
+def main(args = None):
+    import argparse
+    parser = argparse.ArgumentParser(prog = 'main.py render-bench',
+                                     description = 'Compare full board redraws with diff frames.')
+    parser.add_argument('--plies', type = int, default = 200, help = 'Length of the random game replayed')
+    parser.add_argument('--spectators', type = int, default = 100, help = 'Streams to broadcast to')
+    parser.add_argument('--seed', type = int, default = 1)
+    options = parser.parse_args(args)
+    results = benchmark(options.plies, options.spectators, options.seed)
+    full = results['full redraw'][1]
+    for name, (frames, size) in results.items():
+        print(f'{name:<20} {frames:>10.0f} frames/s {size:>8.1f} bytes/move ({size / full:.1%} of a redraw)')
+    return 0
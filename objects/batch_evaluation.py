@@ -0,0 +1,180 @@
+"""
+This module contains a NumPy version of the evaluation that scores many positions at once.
+
+Positions come packed in one of two array layouts:
+- (N, 64): the piece code on every square, as in `Position.data[:64]` (a1 = 0, h8 = 63, 0 for empty).
+- (N, 12, 64): one 0/1 plane per piece, white pawn..king then black pawn..king (see `PLANE_CODES`).
+
+evaluate_batch scores them with the same material and piece-square tables as `evaluation.evaluate`,
+plus two terms that are too slow to compute one position at a time in Python:
+- Mobility: the squares each knight, bishop, rook and queen can move to (empty or enemy-occupied),
+    with sliders stopped at the first piece in each direction.
+- Pawn structure: doubled, isolated and passed pawns.
+With mobility=False and pawns=False, the scores are exactly those of `evaluation.evaluate`.
+
+The work is done on chunks of positions so memory stays bounded for arrays of any length.
+
+This module and `dataset.py` are the only ones that need NumPy, and only `dataset.py` imports this one.
+
+Functions:
+- board_squares(boards) / board_turns(boards): Pack `Board`s or `Position`s into the (N, 64) layout and
+    the matching side to move (0 white, 1 black).
+- to_planes(squares) / from_planes(planes): Convert between the two layouts.
+- evaluate_batch(positions, turn, mobility, pawns): The (N,) scores, from white's point of view, or the
+    side to move's when `turn` is given.
+- evaluate_boards(boards): Scores `Board`s or `Position`s for their side to move, like `evaluate`.
+"""
+import numpy as np
+from .position import Position, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, WHITE, BLACK, TURN
+from .bitboard import KNIGHT_ATTACKS, squares_of
+from .evaluation import SQUARE_SCORES, KING_ENDGAME_SCORES, PHASE_BY_CODE, MAX_PHASE
+
+#The piece code of each plane in the (N, 12, 64) layout
+PLANE_CODES = np.array([color | kind for color in (WHITE, BLACK)
+                        for kind in (PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING)], dtype = np.uint8)
+
+#Centipawns per square a piece can move to
+MOBILITY_WEIGHTS = {KNIGHT: 4, BISHOP: 5, ROOK: 2, QUEEN: 1}
+DOUBLED_PAWN = -10 #For each pawn beyond the first on a file
+ISOLATED_PAWN = -15 #For each pawn with no friendly pawns on the files next to it
+#Passed pawn bonus by rank, counted from the pawn's own side (rank 1 = 0)
+PASSED_PAWN = np.array([0, 5, 10, 20, 35, 60, 100, 0], dtype = np.int32)
+
+_SQUARES = np.arange(64)
+_SQUARE_TABLE = np.array(SQUARE_SCORES, dtype = np.int32)
+#What moving each king from its middlegame to its endgame table adds; zero for every other piece
+_KING_SHIFT = np.array(KING_ENDGAME_SCORES, dtype = np.int32)
+for _code in (WHITE | KING, BLACK | KING):
+    _KING_SHIFT[_code] -= _SQUARE_TABLE[_code]
+_PHASE_TABLE = np.array(PHASE_BY_CODE, dtype = np.int32)
+
+#For each square, the squares a knight there attacks, padded with 64
+_KNIGHT_TARGETS = np.full((64, 8), 64, dtype = np.intp)
+for _sq in range(64):
+    _targets = list(squares_of(KNIGHT_ATTACKS[_sq]))
+    _KNIGHT_TARGETS[_sq, :len(_targets)] = _targets
+
+def _ray_squares(d_row, d_col):
+    #For each square, the squares in one direction, nearest first, padded with 64 past the edge
+    rays = np.full((64, 7), 64, dtype = np.intp)
+    for sq in range(64):
+        row, col = divmod(sq, 8)
+        for step in range(7):
+            row, col = row + d_row, col + d_col
+            if not (0 <= row < 8 and 0 <= col < 8):
+                break
+            rays[sq, step] = row * 8 + col
+    return rays
+
+#(64, 8, 7): the rook directions first, then the bishop ones
+_RAYS = np.stack([_ray_squares(d_row, d_col) for d_row, d_col in
+                  ((1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1))], axis = 1)
+
+def board_squares(boards):
+    #Accepts Boards or Positions
+    data = b''.join(bytes(_position_of(board).data[:64]) for board in boards)
+    return np.frombuffer(data, dtype = np.uint8).reshape(-1, 64)
+
+def board_turns(boards):
+    return np.array([_position_of(board).data[TURN] for board in boards], dtype = np.uint8)
+
+def _position_of(board):
+    return board if isinstance(board, Position) else board.position
+
+def to_planes(squares):
+    squares = np.asarray(squares)
+    return (squares[:, None, :] == PLANE_CODES[None, :, None]).astype(np.uint8)
+
+def from_planes(planes):
+    planes = np.asarray(planes)
+    return (planes.astype(np.uint8) * PLANE_CODES[None, :, None]).sum(axis = 1, dtype = np.uint8)
+
+def _material(squares):
+    #Material and piece-square tables, with the kings blended towards their endgame tables by phase
+    score = _SQUARE_TABLE[squares, _SQUARES].sum(axis = 1)
+    phase = np.minimum(_PHASE_TABLE[squares].sum(axis = 1), MAX_PHASE)
+    #Rounded per king, like evaluate does
+    score += (_KING_SHIFT[squares, _SQUARES] * (MAX_PHASE - phase)[:, None] // MAX_PHASE).sum(axis = 1)
+    return score
+
+#MOBILITY_WEIGHTS by piece code, negative for black
+_MOBILITY_BY_CODE = np.zeros(16, dtype = np.int32)
+for _kind, _weight in MOBILITY_WEIGHTS.items():
+    _MOBILITY_BY_CODE[WHITE | _kind] = _weight
+    _MOBILITY_BY_CODE[BLACK | _kind] = -_weight
+
+def _mobility(squares, white, black):
+    #Only the squares holding a knight, bishop, rook or queen are looked at
+    count = len(squares)
+    rows, cols = np.nonzero(_MOBILITY_BY_CODE[squares])
+    codes = squares[rows, cols]
+    #A 65th always-occupied square for the padding past the board's edge, owned by both sides
+    blocked = np.ones((count, 1), dtype = bool)
+    occupied = np.concatenate([white | black, blocked], axis = 1)
+    owned = np.stack([np.concatenate([white, blocked], axis = 1), np.concatenate([black, blocked], axis = 1)])
+    sides = (codes >> 3)[:, None]
+    rays = _RAYS[cols]
+    ray_rows = rows[:, None, None]
+    #A ray square is reachable if nothing stands on the squares before it
+    on_rays = occupied[ray_rows, rays]
+    reachable = np.ones_like(on_rays)
+    reachable[..., 1:] = ~np.logical_or.accumulate(on_rays, axis = 2)[..., :-1]
+    by_direction = (reachable & ~owned[sides[:, :, None], ray_rows, rays]).sum(axis = 2)
+    rook_moves = by_direction[:, :4].sum(axis = 1)
+    bishop_moves = by_direction[:, 4:].sum(axis = 1)
+    knight_moves = (~owned[sides, rows[:, None], _KNIGHT_TARGETS[cols]]).sum(axis = 1)
+    kinds = codes & 7
+    moves = np.select([kinds == KNIGHT, kinds == BISHOP, kinds == ROOK],
+                      [knight_moves, bishop_moves, rook_moves], rook_moves + bishop_moves)
+    return np.bincount(rows, weights = _MOBILITY_BY_CODE[codes] * moves, minlength = count).astype(np.int32)
+
+def _pawn_terms(own, enemy):
+    #own and enemy are (N, 8 ranks, 8 files) pawn boards, with own moving up the ranks
+    files = own.sum(axis = 1)
+    doubled = np.maximum(files - 1, 0).sum(axis = 1)
+    has_pawn = files > 0
+    neighbours = np.zeros_like(has_pawn)
+    neighbours[:, 1:] |= has_pawn[:, :-1]
+    neighbours[:, :-1] |= has_pawn[:, 1:]
+    isolated = (files * ~neighbours).sum(axis = 1)
+    #Enemy pawns that can stop a pawn: the same or a neighbouring file, on any rank in front of it
+    span = enemy.copy()
+    span[:, :, 1:] |= enemy[:, :, :-1]
+    span[:, :, :-1] |= enemy[:, :, 1:]
+    in_front = np.zeros_like(span)
+    in_front[:, :-1] = np.logical_or.accumulate(span[:, ::-1], axis = 1)[:, ::-1][:, 1:]
+    passed = (own & ~in_front).sum(axis = 2)
+    return DOUBLED_PAWN * doubled + ISOLATED_PAWN * isolated + passed @ PASSED_PAWN
+
+def _pawn_structure(squares):
+    count = len(squares)
+    white = (squares == WHITE | PAWN).reshape(count, 8, 8)
+    black = (squares == BLACK | PAWN).reshape(count, 8, 8)
+    #Flip the ranks so black's pawns also move up the board
+    return _pawn_terms(white, black) - _pawn_terms(black[:, ::-1], white[:, ::-1])
+
+def evaluate_batch(positions, turn = None, mobility = True, pawns = True, chunk_size = 1024):
+    #Scores from white's point of view, or the side to move's (0 white, 1 black) when turn is given
+    positions = np.asarray(positions)
+    if positions.ndim == 3 and positions.shape[1:] == (12, 64):
+        positions = from_planes(positions)
+    elif positions.ndim != 2 or positions.shape[1] != 64:
+        raise ValueError(f"Expected an (N, 64) or (N, 12, 64) array, got shape {positions.shape}")
+    scores = np.empty(len(positions), dtype = np.int32)
+    for start in range(0, len(positions), chunk_size):
+        squares = positions[start:start + chunk_size].astype(np.intp)
+        score = _material(squares)
+        if mobility:
+            white = (squares >= WHITE | PAWN) & (squares <= WHITE | KING)
+            black = (squares >= BLACK | PAWN) & (squares <= BLACK | KING)
+            score += _mobility(squares, white, black)
+        if pawns:
+            score += _pawn_structure(squares)
+        scores[start:start + chunk_size] = score
+    if turn is not None:
+        scores = np.where(np.asarray(turn) != 0, -scores, scores).astype(np.int32)
+    return scores
+
+def evaluate_boards(boards, mobility = True, pawns = True):
+    boards = list(boards)
+    return evaluate_batch(board_squares(boards), board_turns(boards), mobility, pawns)
@@ -0,0 +1,324 @@
+"""
+This module contains the bitboard move generator used by `Board.update_all` and `Board.assess_check`.
+
+Every piece type and color has a 64-bit occupancy mask kept on `Position.bb`, where bit `i` stands for
+square `i` of the `Position` indexing (a1 = 0, h8 = 63). Knight, king and pawn attacks come from tables
+precomputed at import. Sliding pieces use classical ray attacks: each direction has a precomputed ray
+per square, which is cut off at the first blocker found with a bit scan.
+
+Functions:
+- rook_attacks(sq, occupied) / bishop_attacks(sq, occupied) / queen_attacks(sq, occupied)
+- attacks_from(position, sq): The squares attacked by the piece standing on `sq`.
+- piece_moves(position, sq): The (moves, captures) masks `Board` exposes for the piece on `sq`.
+- piece_influence(position, sq): The squares whose contents can change `piece_moves` for `sq`.
+- is_attacked(position, sq, by_color): Whether any piece of `by_color` attacks `sq`.
+- attackers_of(position, sq, by_color): The mask of `by_color` pieces attacking `sq`.
+- legal_moves(position, captures_only): Every legal move for the side to move, as packed ints (see
+    `encode_move`). With captures_only, just the captures and promotions, for quiescence search.
+- squares_of(mask) / coords_of(mask): Iterate the set bits of a mask.
+- line_tables(): The BETWEEN and LINE tables of squares shared by two squares' line, built on first use.
+"""
+from .position import (EMPTY, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, WHITE, BLACK, TYPE_MASK,
+                       TURN, CASTLING, EP, NO_SQUARE, WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE,
+                       BLACK_QUEENSIDE, index_to_coords)
+
+FULL = (1 << 64) - 1
+
+#Board's (row, col) for every square, so masks can be turned back into coordinates cheaply
+SQUARE_COORDS = [index_to_coords(index) for index in range(64)]
+
+def _steps_table(steps):
+    #For each square, the mask of squares one (row, col) step away that stay on the board
+    table = []
+    for index in range(64):
+        row, col = index >> 3, index & 7
+        mask = 0
+        for d_row, d_col in steps:
+            new_row, new_col = row + d_row, col + d_col
+            if 0 <= new_row < 8 and 0 <= new_col < 8:
+                mask |= 1 << (new_row * 8 + new_col)
+        table.append(mask)
+    return table
+
+def _ray_table(d_row, d_col):
+    #For each square, every square in one direction up to the edge of the board
+    table = []
+    for index in range(64):
+        row, col = (index >> 3) + d_row, (index & 7) + d_col
+        mask = 0
+        while 0 <= row < 8 and 0 <= col < 8:
+            mask |= 1 << (row * 8 + col)
+            row += d_row
+            col += d_col
+        table.append(mask)
+    return table
+
+KNIGHT_ATTACKS = _steps_table([(1,2),(2,1),(2,-1),(1,-2),(-1,-2),(-2,-1),(-2,1),(-1,2)])
+KING_ATTACKS = _steps_table([(1,-1),(1,0),(1,1),(0,-1),(0,1),(-1,-1),(-1,0),(-1,1)])
+#Indexed by side (0 for white, 1 for black), then by the pawn's square
+PAWN_ATTACKS = (_steps_table([(1,-1),(1,1)]), _steps_table([(-1,-1),(-1,1)]))
+#The squares a pawn pushes through, including the double step from its starting row
+PAWN_PUSHES = (
+    [(1 << (sq + 8) | (1 << (sq + 16) if sq < 16 else 0)) if sq < 56 else 0 for sq in range(64)],
+    [(1 << (sq - 8) | (1 << (sq - 16) if sq >= 48 else 0)) if sq >= 8 else 0 for sq in range(64)]
+)
+
+#Rays towards higher square indexes are cut at their lowest blocker, the others at their highest
+NORTH = _ray_table(1, 0)
+EAST = _ray_table(0, 1)
+NORTH_EAST = _ray_table(1, 1)
+NORTH_WEST = _ray_table(1, -1)
+SOUTH = _ray_table(-1, 0)
+WEST = _ray_table(0, -1)
+SOUTH_WEST = _ray_table(-1, -1)
+SOUTH_EAST = _ray_table(-1, 1)
+
+#Squares strictly between two squares on a shared line, or 0 if they don't share one, and the whole
+#line through them, edge to edge. Only checks and pins need these, so they are built by line_tables()
+#the first time legal_moves finds one, which keeps them out of the import
+BETWEEN = None
+LINE = None
+
+def line_tables():
+    #(BETWEEN, LINE), building them on the first call
+    global BETWEEN, LINE
+    if BETWEEN is None:
+        between = [[0] * 64 for _ in range(64)]
+        line = [[0] * 64 for _ in range(64)]
+        for table, opposite in ((NORTH, SOUTH), (EAST, WEST), (NORTH_EAST, SOUTH_WEST), (NORTH_WEST, SOUTH_EAST)):
+            for a in range(64):
+                ray = table[a]
+                full = table[a] | opposite[a] | (1 << a)
+                while ray:
+                    b = (ray & -ray).bit_length() - 1
+                    ray &= ray - 1
+                    between[a][b] = between[b][a] = table[a] & opposite[b]
+                    line[a][b] = line[b][a] = full
+        BETWEEN, LINE = between, line
+    return BETWEEN, LINE
+
+def _positive_ray(table, sq, occupied):
+    ray = table[sq]
+    blockers = ray & occupied
+    if blockers:
+        ray ^= table[(blockers & -blockers).bit_length() - 1]
+    return ray
+
+def _negative_ray(table, sq, occupied):
+    ray = table[sq]
+    blockers = ray & occupied
+    if blockers:
+        ray ^= table[blockers.bit_length() - 1]
+    return ray
+
+def rook_attacks(sq, occupied):
+    return (_positive_ray(NORTH, sq, occupied) | _positive_ray(EAST, sq, occupied)
+            | _negative_ray(SOUTH, sq, occupied) | _negative_ray(WEST, sq, occupied))
+
+def bishop_attacks(sq, occupied):
+    return (_positive_ray(NORTH_EAST, sq, occupied) | _positive_ray(NORTH_WEST, sq, occupied)
+            | _negative_ray(SOUTH_WEST, sq, occupied) | _negative_ray(SOUTH_EAST, sq, occupied))
+
+def queen_attacks(sq, occupied):
+    return rook_attacks(sq, occupied) | bishop_attacks(sq, occupied)
+
+def squares_of(mask):
+    #Yield the index of every set bit, lowest first
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+def coords_of(mask):
+    return [SQUARE_COORDS[sq] for sq in squares_of(mask)]
+
+def attacks_from(position, sq):
+    piece = position.data[sq]
+    kind = piece & TYPE_MASK
+    if kind == PAWN:
+        return PAWN_ATTACKS[piece >> 3][sq]
+    if kind == KNIGHT:
+        return KNIGHT_ATTACKS[sq]
+    if kind == KING:
+        return KING_ATTACKS[sq]
+    occupied = position.bb[WHITE] | position.bb[BLACK]
+    if kind == ROOK:
+        return rook_attacks(sq, occupied)
+    if kind == BISHOP:
+        return bishop_attacks(sq, occupied)
+    if kind == QUEEN:
+        return queen_attacks(sq, occupied)
+    return 0
+
+def piece_moves(position, sq):
+    #The moves and captures Board exposes for a piece: pseudo-legal, without castling
+    bb = position.bb
+    piece = position.data[sq]
+    if piece == EMPTY:
+        return 0, 0
+    color = piece & BLACK
+    enemies = bb[color ^ BLACK]
+    if piece & TYPE_MASK != PAWN:
+        attacks = attacks_from(position, sq)
+        return attacks & ~bb[color], attacks & enemies
+    empty = ~(bb[WHITE] | bb[BLACK]) & FULL
+    captures = PAWN_ATTACKS[color >> 3][sq] & enemies
+    if color == WHITE:
+        push = (1 << (sq + 8)) & empty if sq < 56 else 0
+        if push and 8 <= sq < 16:
+            push |= (1 << (sq + 16)) & empty
+    else:
+        push = (1 << (sq - 8)) & empty if sq >= 8 else 0
+        if push and 48 <= sq < 56:
+            push |= (1 << (sq - 16)) & empty
+    moves = push | captures
+    ep = position.data[EP]
+    if ep != NO_SQUARE and (ep >> 3) == (5 if color == WHITE else 2):
+        moves |= PAWN_ATTACKS[color >> 3][sq] & (1 << ep)
+    return moves, captures
+
+def piece_influence(position, sq):
+    #Sliders depend on everything up to and including their first blockers, pawns also on their pushes
+    piece = position.data[sq]
+    if piece & TYPE_MASK == PAWN:
+        return PAWN_ATTACKS[piece >> 3][sq] | PAWN_PUSHES[piece >> 3][sq]
+    return attacks_from(position, sq)
+
+def is_attacked(position, sq, by_color, occupied = None):
+    #Look outwards from the square with each piece's attack pattern and see if it lands on an attacker.
+    #Pass occupied to see through pieces, e.g. the king when checking where it can step
+    bb = position.bb
+    if KNIGHT_ATTACKS[sq] & bb[by_color | KNIGHT]:
+        return True
+    if KING_ATTACKS[sq] & bb[by_color | KING]:
+        return True
+    #A square is hit by a pawn on the squares a pawn of the other color would attack from it
+    if PAWN_ATTACKS[1 - (by_color >> 3)][sq] & bb[by_color | PAWN]:
+        return True
+    if occupied is None:
+        occupied = bb[WHITE] | bb[BLACK]
+    queens = bb[by_color | QUEEN]
+    rooks = bb[by_color | ROOK] | queens
+    if rooks and rook_attacks(sq, occupied) & rooks:
+        return True
+    bishops = bb[by_color | BISHOP] | queens
+    if bishops and bishop_attacks(sq, occupied) & bishops:
+        return True
+    return False
+
+def attackers_of(position, sq, by_color, occupied = None):
+    bb = position.bb
+    if occupied is None:
+        occupied = bb[WHITE] | bb[BLACK]
+    queens = bb[by_color | QUEEN]
+    return ((KNIGHT_ATTACKS[sq] & bb[by_color | KNIGHT])
+            | (KING_ATTACKS[sq] & bb[by_color | KING])
+            | (PAWN_ATTACKS[1 - (by_color >> 3)][sq] & bb[by_color | PAWN])
+            | (rook_attacks(sq, occupied) & (bb[by_color | ROOK] | queens))
+            | (bishop_attacks(sq, occupied) & (bb[by_color | BISHOP] | queens)))
+
+#Castling as (right, king from, king to, squares that must be empty, squares the king crosses, rook square)
+CASTLES = (
+    (WHITE_KINGSIDE, 4, 6, 0x60, (5, 6), 7),
+    (WHITE_QUEENSIDE, 4, 2, 0x0E, (3, 2), 0),
+    (BLACK_KINGSIDE, 60, 62, 0x60 << 56, (61, 62), 63),
+    (BLACK_QUEENSIDE, 60, 58, 0x0E << 56, (59, 58), 56),
+)
+PROMOTIONS = (QUEEN, KNIGHT, ROOK, BISHOP)
+PROMOTION_RANKS = 0xFF | 0xFF << 56
+
+def legal_moves(position, captures_only = False):
+    #Find the checkers and pinned pieces once, then only generate moves that keep the king safe:
+    #in check, moves must capture the checker or block its line; pinned pieces stay on their pin line
+    data = position.data
+    bb = position.bb
+    side = data[TURN]
+    us = BLACK if side else WHITE
+    them = us ^ BLACK
+    own = bb[us]
+    enemy = bb[them]
+    occupied = own | enemy
+    moves = []
+    append = moves.append
+    king_bb = bb[us | KING]
+    if not king_bb:
+        return moves
+    king_sq = king_bb.bit_length() - 1
+
+    #The king can't step onto attacked squares, including ones behind it on a checking line
+    without_king = occupied ^ king_bb
+    for to_sq in squares_of(KING_ATTACKS[king_sq] & (enemy if captures_only else ~own)):
+        if not is_attacked(position, to_sq, them, without_king):
+            append(king_sq | to_sq << 6)
+
+    checkers = attackers_of(position, king_sq, them, occupied)
+    if checkers & (checkers - 1):
+        return moves #Double check: only the king can move
+    if checkers:
+        targets = checkers | (BETWEEN or line_tables()[0])[king_sq][checkers.bit_length() - 1]
+    else:
+        targets = FULL
+
+    #A piece is pinned when it is the only thing between the king and an enemy slider on its line
+    pinned = 0
+    pin_lines = {}
+    queens = bb[them | QUEEN]
+    snipers = ((rook_attacks(king_sq, enemy) & (bb[them | ROOK] | queens))
+               | (bishop_attacks(king_sq, enemy) & (bb[them | BISHOP] | queens)))
+    for sniper in squares_of(snipers):
+        blockers = (BETWEEN or line_tables()[0])[king_sq][sniper] & occupied
+        if blockers & own and not blockers & (blockers - 1):
+            pinned |= blockers
+            pin_lines[blockers.bit_length() - 1] = LINE[king_sq][sniper]
+
+    movable = targets & (enemy if captures_only else ~own)
+    for sq in squares_of(bb[us | KNIGHT] & ~pinned):
+        for to_sq in squares_of(KNIGHT_ATTACKS[sq] & movable):
+            append(sq | to_sq << 6)
+    for kind, attacks in ((BISHOP, bishop_attacks), (ROOK, rook_attacks), (QUEEN, queen_attacks)):
+        for sq in squares_of(bb[us | kind]):
+            mask = attacks(sq, occupied) & movable
+            if pinned >> sq & 1:
+                mask &= pin_lines[sq]
+            for to_sq in squares_of(mask):
+                append(sq | to_sq << 6)
+
+    empty = ~occupied & FULL
+    pawn_attacks = PAWN_ATTACKS[side]
+    ep = data[EP]
+    for sq in squares_of(bb[us | PAWN]):
+        if side:
+            push = (1 << (sq - 8)) & empty
+            if push and sq >= 48:
+                push |= (1 << (sq - 16)) & empty
+        else:
+            push = (1 << (sq + 8)) & empty
+            if push and sq < 16:
+                push |= (1 << (sq + 16)) & empty
+        if captures_only and not PROMOTION_RANKS & push:
+            push = 0
+        mask = (push | (pawn_attacks[sq] & enemy)) & targets
+        if pinned >> sq & 1:
+            mask &= pin_lines[sq]
+        for to_sq in squares_of(mask):
+            if to_sq >= 56 or to_sq < 8:
+                for promotion in PROMOTIONS:
+                    append(sq | to_sq << 6 | promotion << 12)
+            else:
+                append(sq | to_sq << 6)
+        if ep != NO_SQUARE and pawn_attacks[sq] >> ep & 1:
+            #En passant clears two squares on one rank, so just try it
+            move = sq | ep << 6
+            undo = position.make_move(move)
+            if not is_attacked(position, king_sq, them):
+                append(move)
+            position.unmake_move(undo)
+
+    if not checkers and data[CASTLING] and not captures_only:
+        rights = data[CASTLING]
+        for right, king_from, king_to, between, crossed, rook_sq in CASTLES[side * 2:side * 2 + 2]:
+            if (rights & right and king_sq == king_from and not occupied & between
+                    and data[rook_sq] == us | ROOK
+                    and not any(is_attacked(position, crossed_sq, them) for crossed_sq in crossed)):
+                append(king_from | king_to << 6)
+    return moves
@@ -1,31 +1,76 @@
 """
 This module contains functions and classes related to managing the game state in a chess game.
 
-It includes the logic for checking the game conditions (checkmate, check, etc.), updating the board,
-and handling player turns. The module uses `copy` for making deep copies of the game state and
-relies on other chess-specific objects such as `Square` and `Piece`.
+It includes the logic for checking the game conditions (checkmate, check, etc.) and updating the board.
+The turns of a terminal game are handled by `terminal.py`, a client of the headless `Game`. Moves are
+tried and taken back in place with `make_move`/`unmake_move` instead of copying the board, and the
+module relies on other chess-specific objects such as `Square`, `Piece` and `Position`.
 
 Dependencies:
-- `copy`: Provides the `deepcopy` function to create independent copies of the game state.
 - `Square`: A class representing the squares on the chessboard.
 - `Piece`: A class representing the chess pieces and their attributes.
-- `take_user_input`: A function to capture user input for making moves.
+- `Position`: The compact position kept in sync with the squares and pieces.
+- `bitboard`: The bitboard move generator behind `update_all` and `assess_check`.
+- `terminal`: The terminal front end that play() hands the game to.
+- `MoveStack`: The undo/redo record of the moves played.
+- `draws`: The repetition, fifty-move and insufficient material rules.
 
 Functions:
+- legal_moves(color): Every legal move, generated directly from the pins and checkers.
+- from_fen(fen) / to_fen(): Build a board from a FEN string and write the current one out.
+- make_move(move): Plays a move in place and returns an `UndoToken`.
+- unmake_move(token): Takes back a move made with `make_move`.
 - assess_checkmate(turn): Determines if the current player is in checkmate.
 - assess_check(turn): Checks if the current player’s king is in check.
-- update_all(): Updates the game state, including piece positions and available moves.
-- turn(color): Manages the player's turn, validating moves and handling the game flow.
-- game_loop(turn): The main game loop that alternates turns and checks for game-ending conditions. 
-    Called in Board.play()
-- undo(): Reverts the game to the previous state based on the history of moves.
-- play(): Starts the game and manages multiple rounds or a continuous playthrough.
+- draw_reason(): Which draw rule ends the game now, if any. The repetition counts are kept current by
+    make_move/unmake_move, so this costs the same however long the game is.
+- update_all(): Rebuilds the move maps (white_moves, black_moves, *_capturables) from scratch.
+    make_move/unmake_move keep them current incrementally, so this is only needed after
+    editing the position directly.
+- undo() / redo(): Takes back the last move, or plays the last move taken back again. Any number of
+    moves can be undone and redone.
+- goto(ply): Undoes or redoes moves until `ply` moves have been played.
+- move_list() / to_pgn(headers): Exports the game as UCI moves or PGN text.
+- play(computer, think_ms, book, tablebases): Plays a terminal game from this position, then brings the
+    board up to where the game ended. Pass computer='w' or 'b' to play against the engine.
 """
-import copy
+from collections import namedtuple
 from .elements import Square,Piece
-from .functions import take_user_input
+from .position import (Position, PIECE_TYPES, TYPE_LETTERS, WHITE, BLACK, NO_SQUARE,
+                       WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE, BLACK_QUEENSIDE,
+                       coords_to_index, encode_move, move_to_uci)
+from .bitboard import (SQUARE_COORDS, piece_moves, piece_influence, is_attacked,
+                       squares_of, coords_of, legal_moves as generate_legal_moves)
+from .history import MoveStack
+from .draws import RepetitionTable, draw_reason
+from .game import Game
+from . import terminal
+#The castling right each rook gives up once it moves, keyed by (color, row, col)
+ROOK_CASTLING_RIGHTS = {
+    ('w',0,7):WHITE_KINGSIDE,
+    ('w',0,0):WHITE_QUEENSIDE,
+    ('b',7,7):BLACK_KINGSIDE,
+    ('b',7,0):BLACK_QUEENSIDE
+}
+#Everything unmake_move needs to take a move back. The Piece objects are restored as they were,
+#so references held elsewhere (like white_king) stay valid.
+UndoToken = namedtuple('UndoToken',[
+    'orig_coords','new_coords',
+    'piece','captured','captured_coords', #The captured Piece is an empty one for quiet moves
+    'rook','rook_move', #Only set when castling
+    'has_moved', #has_moved of the moving piece and the rook before the move
+    'promoted_from', #The piece letter before promotion, or None
+    'position_undo',
+    'changed' #Mask of the squares whose moves had to be refreshed
+])
+def board_move(move):
+    #A packed Position move as the (orig_coords, new_coords[, promotion letter]) tuple Board methods take
+    promotion = move >> 12
+    if promotion:
+        return (SQUARE_COORDS[move & 63],SQUARE_COORDS[(move >> 6) & 63],TYPE_LETTERS[promotion])
+    return (SQUARE_COORDS[move & 63],SQUARE_COORDS[(move >> 6) & 63])
 class Board:
-    def __init__(self,board = None):
+    def __init__(self,board = None,debug_maps = False):
         board_arr = []
         #Create an 8 x 8 empty board
         for i in range(8):
@@ -85,11 +130,54 @@ class Board:
         self.black_capturables = set()
         self.white_moves = {}
         self.black_moves = {}
-        self.white_castles = []
-        self.black_castles = []
-        self.check_for_white_castles = True
-        self.check_for_black_castles = True
-        self.history = None
+        self.position = Position.from_layout(board)
+        self.history = MoveStack() #UndoTokens for the moves played so far, plus the moves undone
+        #For each square in the move maps: (0 for white or 1 for black, influence mask, capture mask)
+        self.map_entries = [None] * 64
+        #How many pieces of each side can capture on each square, so capturables can shrink correctly
+        self.capture_counts = ([0] * 64,[0] * 64)
+        #Cross-check every incremental update against a full rebuild
+        self.debug_maps = debug_maps
+        self.repetitions = RepetitionTable(self.position.key) #How often each position has occurred
+        self.update_all()
+    @classmethod
+    def from_position(cls,position):
+        #Build a full Board from a compact Position so display() and the move maps work on it
+        board = cls(position.to_layout())
+        board.position = position.copy()
+        board.repetitions = RepetitionTable(board.position.key)
+        rights = position.castling
+        #Carry over the state that the layout strings can't express through has_moved
+        for i in range(8):
+            for j in range(8):
+                piece = board.pieces[i][j]
+                if piece.piece == 'p':
+                    home_row = 1 if piece.color == 'w' else 6
+                    piece.has_moved = i != home_row
+                elif piece.piece == 'k':
+                    if piece.color == 'w':
+                        piece.has_moved = not rights & (WHITE_KINGSIDE | WHITE_QUEENSIDE)
+                    else:
+                        piece.has_moved = not rights & (BLACK_KINGSIDE | BLACK_QUEENSIDE)
+                elif piece.piece == 'r':
+                    piece.has_moved = not rights & ROOK_CASTLING_RIGHTS.get((piece.color,i,j),0)
+        board.update_all()
+        return board
+    @classmethod
+    def from_fen(cls,fen):
+        return cls.from_position(Position.from_fen(fen))
+    def to_fen(self):
+        return self.position.to_fen()
+    def to_position(self,turn = None):
+        #Hand out a compact copy of the current position, optionally with a different side to move
+        position = self.position.copy()
+        if turn:
+            position.turn = turn
+        return position
+    @property
+    def hash_key(self):
+        #64-bit Zobrist key of the current position, kept current by make_move/unmake_move
+        return self.position.key
     def white_king_coords(self):
         return self.white_king.square.get_coords()
     def black_king_coords(self):
@@ -100,289 +188,232 @@ class Board:
     def get_piece(self,coords):
         idx_1,idx_2 = coords
         return self.pieces[idx_1][idx_2]
-    def remove_piece(self,coords):
+    def place_piece(self,piece,coords):
+        #Point a square and the piece grid at a piece object
         square = self.get_square(coords)
-        square.occupied = False
-        square.piece = Piece('','',square)
-        self.pieces[coords[0]][coords[1]] = Piece('','',square)
-    def force_move(self,orig_coords,new_coords):
-        #Force a move even if it isn't valid
-        new_square = self.get_square(new_coords)
+        square.piece = piece
+        square.occupied = piece.color != ''
+        piece.square = square
+        self.pieces[coords[0]][coords[1]] = piece
+    def make_move(self,move):
+        #Play a move in place without checking it, and return a token unmake_move can take it back with.
+        #A move is (orig_coords, new_coords) with an optional promotion letter, which defaults to a queen
+        orig_coords, new_coords = move[0], move[1]
+        promotion = move[2] if len(move) > 2 else 'q'
         piece = self.get_piece(orig_coords)
-        new_x,new_y = new_coords
-        if new_coords not in piece.capturable:
-            new_square.occupied = True
-        if piece.piece == 'p' and (new_x == 0 or new_x == 7):
-            piece.piece = 'q'
-        new_square.piece = piece
-        piece.square = new_square
+        orig_x, orig_y = orig_coords
+        new_x, new_y = new_coords
+        captured_coords = new_coords
+        rook = rook_move = None
+        if piece.piece == 'p' and orig_y != new_y and not self.get_square(new_coords).occupied:
+            captured_coords = (orig_x,new_y) #En passant
+        elif piece.piece == 'k' and abs(new_y - orig_y) == 2 and orig_coords in ((0,4),(7,4)):
+            rook_move = ((orig_x,7),(orig_x,5)) if new_y > orig_y else ((orig_x,0),(orig_x,3))
+            rook = self.get_piece(rook_move[0])
+        promoted = piece.piece == 'p' and (new_x == 0 or new_x == 7)
+        old_ep = self.position.ep_square
+        token = UndoToken(
+            orig_coords,new_coords,
+            piece,self.get_piece(captured_coords),captured_coords,
+            rook,rook_move,
+            (piece.has_moved,rook.has_moved if rook else None),
+            piece.piece if promoted else None,
+            self.position.make_move(encode_move(coords_to_index(orig_coords),coords_to_index(new_coords),
+                                                PIECE_TYPES[promotion] if promoted else 0)),
+            0
+        )
+        self.repetitions.push(self.position.key,not self.position.halfmove)
+        if captured_coords != new_coords:
+            self.place_piece(Piece('','',None),captured_coords)
+        self.place_piece(piece,new_coords)
+        self.place_piece(Piece('','',None),orig_coords)
         piece.has_moved = True
-        self.pieces[new_x][new_y] = piece
-        self.remove_piece(orig_coords)
-    def move_piece(self,orig_coords,new_coords,turn):
-        #Attempt to move a piece and raise an error if that move isn't possible
-        new_square = self.get_square(new_coords)
+        if promoted:
+            piece.piece = promotion
+        if rook:
+            self.place_piece(rook,rook_move[1])
+            self.place_piece(Piece('','',None),rook_move[0])
+            rook.has_moved = True
+        #Every square that changed hands, plus the en passant squares pawns may have been eyeing
+        changed = 1 << coords_to_index(orig_coords) | 1 << coords_to_index(new_coords)
+        changed |= 1 << coords_to_index(captured_coords)
+        if rook:
+            changed |= 1 << coords_to_index(rook_move[0]) | 1 << coords_to_index(rook_move[1])
+        for ep in (old_ep,self.position.ep_square):
+            if ep < 64:
+                changed |= 1 << ep
+        token = token._replace(changed = changed)
+        self.refresh_maps(changed)
+        return token
+    def unmake_move(self,token):
+        self.repetitions.pop()
+        self.position.unmake_move(token.position_undo)
+        piece = token.piece
+        if token.rook:
+            self.place_piece(token.rook,token.rook_move[0])
+            self.place_piece(Piece('','',None),token.rook_move[1])
+            token.rook.has_moved = token.has_moved[1]
+        if token.captured_coords != token.new_coords:
+            self.place_piece(Piece('','',None),token.new_coords)
+        self.place_piece(token.captured,token.captured_coords)
+        self.place_piece(piece,token.orig_coords)
+        piece.has_moved = token.has_moved[0]
+        if token.promoted_from:
+            piece.piece = token.promoted_from
+        self.refresh_maps(token.changed)
+    def move_piece(self,orig_coords,new_coords,turn,promotion = 'q'):
+        #Attempt to move a piece and raise an error if that move isn't legal,
+        #including moves that would leave turn's own king in check
         piece = self.get_piece(orig_coords)
-        new_x,new_y = new_coords
-        king_coords = self.white_king_coords() if turn == 'w' else self.black_king_coords()
-        castle_coords = self.white_castles if turn == 'w' else self.black_castles
-        king_castle_moves = []
-        for king_move,_ in castle_coords:
-            king_castle_moves.append(king_move)
-        if new_coords in piece.moves:
-            #If the new square doesn't have a piece there mark it as occupied
-            if new_coords not in piece.capturable:
-                new_square.occupied = True
-            #Promotion
-            if piece.piece == 'p' and (new_x == 0 or new_x == 7):
-                piece.piece = 'q'
-            #Update the new square
-            new_square.piece = piece
-            piece.square = new_square
-            piece.has_moved = True
-            #Update displayable pieces
-            self.pieces[new_x][new_y] = piece
-            #Remove the original location of the piece
-            self.remove_piece(orig_coords)
-        elif orig_coords == king_coords and new_coords in king_castle_moves:
-            for king_move, rook_position in castle_coords:
-                if king_move == new_coords:
-                    rook = self.get_piece(rook_position)
-                    if king_move[1] > rook_position[1]:
-                        #Maybe make this smarter and more dynamic eventually
-                        self.force_move(rook_position,rook.square.right.right.right.get_coords())
-                        self.force_move(orig_coords,new_coords)
-                    else:
-                        self.force_move(rook_position,rook.square.left.left.get_coords())
-                        self.force_move(orig_coords,new_coords)
+        if piece.piece == 'p' and new_coords[0] in (0,7):
+            move = (orig_coords,new_coords,promotion)
         else:
+            move = (orig_coords,new_coords)
+        if move not in self.legal_moves(turn):
             raise ValueError("Move not valid")
+        #make_move hops the rook over when the king castles
+        return self.make_move(move)
+    def legal_moves(self,color = None):
+        #Legal moves as (orig_coords, new_coords) tuples, with a promotion letter added for promotions
+        position = self.position
+        if color and color != position.turn:
+            #Asking about the side not to move: look at a copy with the turn handed over
+            position = position.copy()
+            position.turn = color
+            position.ep_square = NO_SQUARE
+        return [board_move(move) for move in generate_legal_moves(position)]
     def display(self):
         #Print the board to the console
-        board = self.pieces
-        letters = 'abcdefgh'
-        board_str = ""
-
-        # Add the column letters at the top
-        board_str += "    " + "    ".join(letters) + "\n"
-        board_str += "  " + "-" * 41 + "\n"
-
-        # Add each row
-        for i in range(len(board) - 1, -1, -1):
-            row = f"{i + 1} |"  # Add the row number
-            for j in range(len(board[i])):
-                piece = board[i][j]
-                piece_display = str(piece) if piece else " "  # Show piece or empty square
-                row += f" {piece_display:^2} |"
-            board_str += row + f" {i + 1}\n"  # Add row number again at the end
-            board_str += "  " + "-" * 41 + "\n"
-
-        # Add the column letters at the bottom
-        board_str += "    " + "    ".join(letters) + "\n"
-
-        # Print the board
-        print(board_str)
+        print(terminal.render(self.position))
     def update_all(self):
+        #Rebuild every piece's moves and capturable pieces from the position's bitboards.
+        #Empty squares are skipped entirely since they never show up in the move maps
         self.black_capturables = set()
         self.white_capturables = set()
         self.black_moves = {}
         self.white_moves = {}
-        #Update the entire board
-        for row in self.pieces:
-            for piece in row:
-                #print(f'Updating {coords_to_str(piece.square.get_coords())}...')
-                cpt, moves = piece.update_piece()
-                if piece.color == 'b':
-                    self.black_capturables.update(cpt)
-                    self.black_moves[piece.square.get_coords()] = list(moves)
-                elif piece.color == 'w':
-                    self.white_capturables.update(cpt)
-                    self.white_moves[piece.square.get_coords()] = list(moves)
-    
-    def turn(self,color):
-        valid = False
-        while not valid:
-            inp = take_user_input()
-            if type(inp) == tuple:
-                _from, _to = inp
-            else:
-                if inp == 'undo' and self.history.history:
-                    self.undo() #Call undo twice, because history is assigned right before the turn function is called
-                    self.undo()
-                    self.display()
-                elif inp == 'undo' and not self.history.history:
-                    print("There are no more moves to undo...Please add a valid move")
-                    self.turn(color) #call itself recursively then return if no space
-                return
-            if self.get_piece(_from).color == "":
-                print("There is no piece at that location")
-                continue
-            elif self.get_piece(_from).color != color:
-                print("That piece is the wrong color")
-                continue
-            try:
-                self.move_piece(_from,_to,color)
-                valid = True
-            except ValueError:
-                print("That is not valid move. Please try again")
-        self.display()
-    def update_castles(self,turn):
-        #Overwrite the possible castles
-        if turn == 'w':
-            self.white_castles = []
+        self.map_entries = [None] * 64
+        self.capture_counts = ([0] * 64,[0] * 64)
+        bb = self.position.bb
+        for sq in squares_of(bb[WHITE] | bb[BLACK]):
+            self.add_map_entry(sq)
+    def add_map_entry(self,sq):
+        position = self.position
+        coords = SQUARE_COORDS[sq]
+        piece = self.pieces[coords[0]][coords[1]]
+        moves, cpt = piece_moves(position,sq)
+        piece.moves = set(coords_of(moves))
+        piece.capturable = set(coords_of(cpt))
+        side = 1 if piece.color == 'b' else 0
+        if side:
+            capturables, move_map = self.black_capturables, self.black_moves
         else:
-            self.black_castles = []
-
-        #Find the rooks
-        rooks = []
-        for row in self.pieces:
-            for piece in row:
-                if piece.piece == 'r' and piece.color == turn:
-                    rooks.append(piece)
-        
-        if len(rooks) == 0:
-            return False #If there are no rooks you can't castle
-        
-        #Find the king
-        king_coords = self.white_king_coords() if turn == 'w' else self.black_king_coords()
-        king = self.get_piece(king_coords)
-        
-        #King Checks
-        if king.has_moved or (all(rook.has_moved for rook in rooks)):
-            return False
-        if self.assess_check(turn):
-            return 
-        
-        
-        #Rook cheecks
-        can_castle = False
-        for rook in rooks:
-            if rook.sees_king:
-                rook_col = rook.square.get_coords()[1]
-                attempting_board = copy.deepcopy(self)
-                attempting_king = copy.deepcopy(king_coords)
-                king_row, king_col = attempting_king
-
-                # Track whether the king's path is clear
-                path_clear = True
-
-                # If king's column is greater than the rook's column, move left; otherwise, move right
-                for _ in range(2):
-                    if king_col > rook_col:
-                        king_col -= 1
-                    else:
-                        king_col += 1
-
-                    # Force the king move on the board copy
-                    attempting_board.force_move(attempting_king, (king_row, king_col))
-                    attempting_board.update_all()
-                    
-                    # Check if the king is in check
-                    if attempting_board.assess_check(turn):
-                        path_clear = False
-                        break  # Stop checking further if the king's path is under attack
-                    
-                    # Update the king's current position
-                    attempting_king = (king_row, king_col)
-
-                # If the path is clear, the king can castle
-                if path_clear:
-                    castle_move = ((king_row, king_col),rook.square.get_coords())
-                    if turn == 'w':
-                        self.white_castles.append(castle_move)
-                    else:
-                        self.black_castles.append(castle_move)
+            capturables, move_map = self.white_capturables, self.white_moves
+        move_map[coords] = list(piece.moves)
+        counts = self.capture_counts[side]
+        for target in squares_of(cpt):
+            if counts[target] == 0:
+                capturables.add(SQUARE_COORDS[target])
+            counts[target] += 1
+        self.map_entries[sq] = (side,piece_influence(position,sq),cpt)
+    def drop_map_entry(self,sq):
+        side, _, cpt = self.map_entries[sq]
+        self.map_entries[sq] = None
+        if side:
+            capturables, move_map = self.black_capturables, self.black_moves
+        else:
+            capturables, move_map = self.white_capturables, self.white_moves
+        del move_map[SQUARE_COORDS[sq]]
+        counts = self.capture_counts[side]
+        for target in squares_of(cpt):
+            counts[target] -= 1
+            if counts[target] == 0:
+                capturables.discard(SQUARE_COORDS[target])
+    def refresh_maps(self,changed):
+        #Only recompute pieces standing on a changed square or whose rays/footprints reach one.
+        #An influence mask from before the change still covers the first changed square on each ray
+        entries = self.map_entries
+        bb = self.position.bb
+        occupied = bb[WHITE] | bb[BLACK]
+        for sq in squares_of(occupied | changed):
+            entry = entries[sq]
+            if (changed >> sq) & 1 or (entry and entry[1] & changed):
+                if entry:
+                    self.drop_map_entry(sq)
+                if (occupied >> sq) & 1:
+                    self.add_map_entry(sq)
+        if self.debug_maps:
+            self.check_maps()
+    def check_maps(self):
+        #Compare the incrementally kept maps against what a full rebuild would produce
+        position = self.position
+        bb = position.bb
+        expected = ({},{},set(),set())
+        for sq in squares_of(bb[WHITE] | bb[BLACK]):
+            moves, cpt = piece_moves(position,sq)
+            side = 1 if position[sq] & BLACK else 0
+            expected[side][SQUARE_COORDS[sq]] = set(coords_of(moves))
+            expected[2 + side].update(coords_of(cpt))
+        actual = (
+            {coords:set(moves) for coords,moves in self.white_moves.items()},
+            {coords:set(moves) for coords,moves in self.black_moves.items()},
+            self.white_capturables,
+            self.black_capturables
+        )
+        names = ('white_moves','black_moves','white_capturables','black_capturables')
+        for name,want,have in zip(names,expected,actual):
+            if want != have:
+                raise RuntimeError(f"Incremental {name} diverged from a full rebuild: {have} != {want}")
+    
     def assess_check(self,turn):
+        #Ask the bitboards directly, so this stays right even while the move maps are stale
         if turn == 'w':
-            return self.white_king_coords() in self.black_capturables
+            return is_attacked(self.position,coords_to_index(self.white_king_coords()),BLACK)
         else:
-            return self.black_king_coords() in self.white_capturables
+            return is_attacked(self.position,coords_to_index(self.black_king_coords()),WHITE)
+    def draw_reason(self):
+        #'threefold repetition', 'fifty-move rule', 'insufficient material' or None
+        return draw_reason(self.position,self.repetitions)
     def assess_checkmate(self,turn):
-        temp_board = copy.deepcopy(self)
-        if turn == 'w':
-            #Look at the king's moves first, as most of the time the king can get himself out of check
-            for move in self.white_moves[self.white_king_coords()]:
-                piece_cord = self.white_king_coords()
-                temp_board.move_piece(piece_cord,move,turn)
-                temp_board.update_all()
-                if not temp_board.assess_check(turn):
-                    return False
-                temp_board = copy.deepcopy(self)
-            for piece_cord,move_list in self.white_moves.items():
-                if piece_cord != self.white_king_coords():
-                    for move in move_list:
-                        #Try to move the new piece
-                        temp_board.move_piece(piece_cord,move,turn)
-                        temp_board.update_all() #THIS MIGHT BE SUPER SLOW WE'LL SEE
-                        #See if the new position is in check. If it's possible to get out of check it's not checkmate
-                        if not temp_board.assess_check(turn):
-                            return False
-                        temp_board = copy.deepcopy(self)
-            #If no moves get out of check, then 
-            return True
-        else:
-            #Look at the king's moves first, as most of the time the king can get himself out of check
-            for move in self.black_moves[self.black_king_coords()]:
-                piece_cord = self.black_king_coords()
-                temp_board.move_piece(piece_cord,move,turn)
-                temp_board.update_all()
-                if not temp_board.assess_check(turn):
-                    return False
-                temp_board = copy.deepcopy(self)
-            for piece_cord,move_list in self.white_moves.items():
-                if piece_cord != self.black_king_coords():
-                    for move in move_list:
-                        #Try to move the new piece
-                        temp_board.move_piece(piece_cord,move,turn)
-                        temp_board.update_all() #THIS MIGHT BE SUPER SLOW WE'LL SEE
-                        #See if the new position is in check. If it's possible to get out of check it's not checkmate
-                        if not temp_board.assess_check(turn):
-                            return False
-                        temp_board = copy.deepcopy(self)
-            #If no moves get out of check, then 
-            return True
-        
-    def game_loop(self,turn):
-        self.update_all() #MAYBE PLACE THIS SOMEWHERE ELSE
-        long_turn = "White's" if turn == 'w' else "Black's"
+        #No legal moves is checkmate when in check and stalemate otherwise
+        return not self.legal_moves(turn)
         
-        castle_status = self.check_for_white_castles if turn == 'w' else self.check_for_black_castles
-        if castle_status:
-            if self.update_castles(turn) is not None:
-                castle_status = False
-        #If checkmate without check, it's a stalemate
-        if not self.assess_check(turn):
-            if self.assess_checkmate(turn):
-                print("STALEMATE! It's a draw.")
-                return 'end'
-            print(f"It's {long_turn} turn! Make a move.")
-        else:
-            if self.assess_checkmate(turn):
-                long_name = "Black" if turn == 'w' else "White"
-                print(f"CHECKMATE! {long_name} WINS!!")
-                return 'end'
-            print(f"It's {long_turn} turn! Be careful, you're in check!")
-            
-        board_copy = copy.deepcopy(self)#Copy the status of the board
-        self.history = board_copy
-        self.turn(turn)
     def undo(self):
-        #Completely reassign the object
+        #Take back the most recent move
         if self.history:
-            for attr, value in self.history.__dict__.items():
-                setattr(self, attr, value)
-    def play(self):
-        print("Let's play chess!\nInitial Board State:")
-        self.display()
-        turn = 'w'
-        while True:
-            if self.game_loop(turn): #If this has a return, then the game is over!
-                break
-            #Invert the turn
-            if turn == 'w':
-                turn = 'b'
-            else:
-                turn = 'w'
-
-board = Board()
-board.play()
+            self.unmake_move(self.history.pop())
+    def redo(self):
+        #Play the most recently undone move again. Returns False if there is none
+        move = self.history.next_redo()
+        if move is None:
+            return False
+        self.history.push(self.make_move(board_move(move)))
+        return True
+    def goto(self,ply):
+        #Undo or redo moves until ply moves have been played (0 is the starting position)
+        if not 0 <= ply <= len(self.history) + len(self.history.undone):
+            raise ValueError(f"There is no ply {ply} in this game")
+        while len(self.history) > ply:
+            self.undo()
+        while len(self.history) < ply:
+            self.redo()
+    def start_position(self):
+        #The position before the first move in the history
+        position = self.position.copy()
+        for token in reversed(self.history.played):
+            position.unmake_move(token.position_undo)
+        return position
+    def move_list(self):
+        #The moves played so far in UCI notation, e.g. ['e2e4', 'e7e5']
+        return [move_to_uci(move) for move in self.history.moves()]
+    def to_pgn(self,headers = None):
+        from .pgn import write_game #PGN text pulls in re and textwrap, so it is only loaded when asked for
+        return write_game(self.history.moves(),self.start_position(),headers)
+    def play(self,computer = None,think_ms = 1000,book = None,tablebases = None):
+        #The terminal plays on a headless Game from this position; its moves are then made on the board
+        game = Game(self.position)
+        game.repetitions = self.repetitions.copy()
+        terminal.play(game,computer,think_ms,book = book,tablebases = tablebases)
+        for move in game.history.moves():
+            self.history.push(self.make_move(board_move(move)))
+        return game
@@ -0,0 +1,195 @@
+"""
+This module contains the opening book: a sorted binary file of moves keyed by position, and a builder
+that compiles one from PGN games.
+
+File layout (all numbers big-endian):
+- 0-15: the header, `MAGIC` followed by the version and the number of entries as 32-bit numbers.
+- Then one 16-byte entry per (position, move): the position's `book_key` (8 bytes), the packed move
+    (2 bytes, see `encode_move`), its weight (2 bytes) and the number of games it was played in
+    (4 bytes), sorted by key and then by weight, highest first.
+The entries have Polyglot's layout, but the keys are this engine's Zobrist keys and the moves its
+packed moves, so Polyglot books and these aren't interchangeable. Like Polyglot, the key leaves out the
+en passant square unless a pawn can actually take there, so a position's key doesn't depend on whether
+its FEN (or the move before it) named one.
+
+`OpeningBook` maps the file into memory and binary searches it, so opening a book reads nothing but the
+header and a probe touches O(log n) entries. A book is safe to share between threads.
+
+Classes:
+- OpeningBook(path): A book file opened for probing.
+
+Functions:
+- book_key(position): The key a position is filed under.
+- OpeningBook.probe(position) / entries(key): The book moves of a position as (move, weight, games).
+- OpeningBook.choose(position, rng, best): A legal book move picked by weight, or None.
+- build_book(sources, path, max_ply, min_games, workers): Compiles PGN files into a book file.
+- main(args): The `python main.py book` command line.
+"""
+import mmap
+import os
+import random
+import struct
+import time
+from .position import Position, PAWN, WHITE, BLACK, TURN, EP, NO_SQUARE, START_FEN, move_to_uci
+from .bitboard import legal_moves, PAWN_ATTACKS
+from .zobrist import EP_KEYS
+
+MAGIC = b'TCBOOK\x00\x00'
+VERSION = 1
+HEADER = struct.Struct('>8sII')
+ENTRY = struct.Struct('>QHHI')
+ENTRY_SIZE = ENTRY.size
+MAX_WEIGHT = 0xFFFF
+
+def book_key(position):
+    key = position.key
+    ep = position.data[EP]
+    if ep == NO_SQUARE:
+        return key
+    turn = position.data[TURN]
+    #The squares a pawn of the side to move could take en passant from are those an enemy pawn on the
+    #en passant square would attack
+    if PAWN_ATTACKS[turn ^ 1][ep] & position.bb[(BLACK if turn else WHITE) | PAWN]:
+        return key
+    return key ^ EP_KEYS[ep & 7]
+
+class OpeningBook:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access = mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise ValueError(f"{path} is empty, not an opening book") from None
+        magic, version, count = HEADER.unpack_from(self.map, 0) if len(self.map) >= HEADER.size else (b'', 0, 0)
+        if magic != MAGIC or version != VERSION or len(self.map) != HEADER.size + count * ENTRY_SIZE:
+            self.close()
+            raise ValueError(f"{path} isn't a version {VERSION} opening book")
+        self.count = count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def __len__(self):
+        return self.count
+
+    def _key_at(self, index):
+        offset = HEADER.size + index * ENTRY_SIZE
+        return int.from_bytes(self.map[offset:offset + 8], 'big')
+
+    def entries(self, key):
+        #(move, weight, games) for every entry of a key, highest weight first
+        low, high = 0, self.count
+        while low < high: #The first entry whose key isn't below key
+            middle = (low + high) >> 1
+            if self._key_at(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        found = []
+        offset = HEADER.size + low * ENTRY_SIZE
+        end = HEADER.size + self.count * ENTRY_SIZE
+        while offset < end:
+            entry_key, move, weight, games = ENTRY.unpack_from(self.map, offset)
+            if entry_key != key:
+                break
+            found.append((move, weight, games))
+            offset += ENTRY_SIZE
+        return found
+
+    def probe(self, position):
+        #Accepts a Position or anything with one (Board, Game)
+        if not isinstance(position, Position):
+            position = position.position
+        return self.entries(book_key(position))
+
+    def choose(self, position, rng = None, best = False):
+        #A book move for the position, picked at random in proportion to the weights (or the heaviest
+        #one with best=True). Moves that aren't legal, from a key collision, are never returned
+        if not isinstance(position, Position):
+            position = position.position
+        found = self.entries(book_key(position))
+        if not found:
+            return None
+        legal = set(legal_moves(position))
+        found = [(move, weight) for move, weight, _ in found if move in legal and weight]
+        if not found:
+            return None
+        if best:
+            return found[0][0]
+        return (rng or random).choices([move for move, _ in found], [weight for _, weight in found])[0]
+
+def _count_moves(games, max_ply, counts):
+    #Add up (wins * 2 + draws) for the side that played each move, and the games it was played in
+    scores = {'1-0': (2, 0), '0-1': (0, 2), '1/2-1/2': (1, 1)}
+    for pgn_game in games:
+        white_score, black_score = scores.get(pgn_game.headers.get('Result'), (1, 1))
+        position = Position.from_fen(pgn_game.headers.get('FEN', START_FEN))
+        for move in pgn_game.moves[:max_ply]:
+            entry = counts.setdefault((book_key(position), move), [0, 0])
+            entry[0] += black_score if position.turn == 'b' else white_score
+            entry[1] += 1
+            position.make_move(move)
+
+def build_book(sources, path, max_ply = 20, min_games = 2, workers = 1, on_error = None):
+    #Compile the first max_ply plies of every game in the PGN files into a book. Moves played in
+    #fewer than min_games games are left out. Returns the number of entries written
+    from .pgn import read_games, replay_many
+    counts = {}
+    for source in sources:
+        if workers > 1:
+            games = replay_many(source, workers, on_error = on_error)
+        else:
+            games = read_games(source, on_error = on_error)
+        _count_moves(games, max_ply, counts)
+    entries = [(key, move, score, games) for (key, move), (score, games) in counts.items() if games >= min_games]
+    #Scale the weights into 16 bits, keeping every move with a score above zero at least 1
+    top = max((score for _, _, score, _ in entries), default = 0)
+    scale = MAX_WEIGHT / top if top > MAX_WEIGHT else 1
+    entries = [(key, move, max(1, int(score * scale)) if score else 0, min(games, 0xFFFFFFFF))
+               for key, move, score, games in entries]
+    entries.sort(key = lambda entry: (entry[0], -entry[2], entry[1]))
+    temporary = f'{path}.tmp'
+    with open(temporary, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, len(entries)))
+        for entry in entries:
+            file.write(ENTRY.pack(*entry))
+    os.replace(temporary, path) #Readers never see a half-written book
+    return len(entries)
+
+def main(args = None):
+    import argparse
+    parser = argparse.ArgumentParser(prog = 'main.py book', description = 'Build or look up an opening book.')
+    commands = parser.add_subparsers(dest = 'command', required = True)
+    build = commands.add_parser('build', help = 'Compile PGN files into a book')
+    build.add_argument('book')
+    build.add_argument('pgn', nargs = '+')
+    build.add_argument('--max-ply', type = int, default = 20, help = 'Plies of each game to use')
+    build.add_argument('--min-games', type = int, default = 2, help = 'Leave out moves played in fewer games')
+    build.add_argument('--workers', type = int, default = 1, help = 'Replay the games on this many processes')
+    probe = commands.add_parser('probe', help = 'List the book moves of a position')
+    probe.add_argument('book')
+    probe.add_argument('--fen', default = START_FEN)
+    options = parser.parse_args(args)
+    if options.command == 'build':
+        start = time.perf_counter()
+        count = build_book(options.pgn, options.book, options.max_ply, options.min_games, options.workers,
+                           on_error = print)
+        print(f'{count} entries written to {options.book} in {time.perf_counter() - start:.2f}s')
+        return 0
+    with OpeningBook(options.book) as book:
+        start = time.perf_counter()
+        found = book.probe(Position.from_fen(options.fen))
+        seconds = time.perf_counter() - start
+        for move, weight, games in found:
+            print(f'{move_to_uci(move)} weight {weight} games {games}')
+        print(f'{len(found)} moves from {len(book)} entries, probe took {seconds * 1e6:.0f} us')
+    return 0
@@ -0,0 +1,283 @@
+"""
+This module contains the analysis cache: what has been worked out about a position (its legal moves,
+whether it is checkmate or stalemate, a search result), kept by Zobrist key so no process has to work
+it out twice.
+
+There are two tiers:
+- An in-process LRU of up to `size` entries, holding the results as Python values.
+- Optionally, a SQLite file in WAL mode that any number of processes open at once. WAL lets them read
+    while one writes, and writes are batched into one transaction per `batch_size` new results.
+A lookup tries the LRU, then the file; a result found in the file is put in the LRU.
+
+Versioning: every stored result carries the version of the code it was computed with, and a result
+with another version is treated as missing (and counted as stale). Legal moves and verdicts are
+versioned by a fingerprint of the rules modules (position.py and bitboard.py). Search results are
+versioned by those plus engine.py and evaluation.py. A fingerprint is a hash of the source files, so
+editing any of them invalidates the matching results by itself. `FORMAT_VERSION` covers the way
+values are stored, and `salt` lets a caller keep results apart by anything else, such as a different
+evaluation function. `purge()` deletes the stale rows.
+
+Only positions are cached, not games: the verdict is checkmate, stalemate or neither, since the draw
+rules depend on the moves before the position. Search results come from fixed-depth searches with no
+game history, and a stored result answers any request for the same or a lower depth. A proven mate
+answers any request at the depth that was asked for, even though the search stopped before it.
+
+Classes:
+- AnalysisCache(path, size, batch_size, salt): The two tiers. Works as a context manager.
+
+Functions:
+- AnalysisCache.legal_moves(position) / verdict(position) / search(position, depth, searcher): The
+    cached answers, computed and stored on a miss. Each accepts a `Position`, `Board` or `Game`.
+- AnalysisCache.stats(): Hits per tier, misses, stale results, evictions and writes.
+- fingerprint(modules): The version string of a set of modules.
+- main(args): The `python main.py cache` command line.
+"""
+import hashlib
+import os
+import sqlite3
+import struct
+import time
+from array import array
+from collections import OrderedDict
+from .position import Position, KING, WHITE, BLACK, TURN
+from .bitboard import legal_moves, is_attacked
+from .engine import Searcher, SearchResult, MATE_BOUND
+
+#Bump when the way values are stored changes
+FORMAT_VERSION = 1
+#What each kind of result depends on
+RULES_MODULES = ('position.py', 'bitboard.py')
+SEARCH_MODULES = RULES_MODULES + ('engine.py', 'evaluation.py')
+
+LEGAL, VERDICT, SEARCH = 1, 2, 3
+VERDICTS = (None, 'checkmate', 'stalemate')
+_SEARCH_HEADER = struct.Struct('<HiB')
+_NO_MOVE = 0xFFFF
+
+_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+def fingerprint(modules):
+    digest = hashlib.sha1(str(FORMAT_VERSION).encode())
+    for module in modules:
+        with open(os.path.join(_DIRECTORY, module), 'rb') as file:
+            digest.update(file.read())
+    return digest.hexdigest()[:16]
+
+def _position_of(position):
+    return position if isinstance(position, Position) else position.position
+
+def _signed(key):
+    #SQLite integers are signed 64-bit
+    return key - (1 << 64) if key >= 1 << 63 else key
+
+def _encode(kind, value):
+    if kind == LEGAL:
+        return array('H', value).tobytes()
+    if kind == VERDICT:
+        return bytes((value,))
+    move, score, depth, pv = value
+    return _SEARCH_HEADER.pack(_NO_MOVE if move is None else move, score, depth) + array('H', pv).tobytes()
+
+def _decode(kind, blob):
+    if kind == LEGAL:
+        return tuple(array('H', blob))
+    if kind == VERDICT:
+        return blob[0]
+    move, score, depth = _SEARCH_HEADER.unpack_from(blob)
+    return (None if move == _NO_MOVE else move, score, depth, tuple(array('H', blob[_SEARCH_HEADER.size:])))
+
+class AnalysisCache:
+    def __init__(self, path = None, size = 100000, batch_size = 256, salt = ''):
+        #path is the SQLite file shared between processes, or None for the in-process LRU alone
+        if size < 1:
+            raise ValueError("size must be positive")
+        self.size = size
+        self.batch_size = batch_size
+        rules = fingerprint(RULES_MODULES) + salt
+        self.versions = {LEGAL: rules, VERDICT: rules, SEARCH: fingerprint(SEARCH_MODULES) + salt}
+        self.lru = OrderedDict() #(kind, key): value, least recently used first
+        self.pending = {} #(kind, key): encoded value, not yet written to the file
+        self.counters = {'lru_hits': 0, 'disk_hits': 0, 'misses': 0, 'stale': 0, 'evictions': 0, 'writes': 0}
+        self.searcher = None #Made on the first search that isn't given one
+        self.path = path
+        self.db = None
+        if path:
+            self.db = sqlite3.connect(path, timeout = 30, isolation_level = None)
+            self.db.execute('PRAGMA journal_mode = WAL')
+            self.db.execute('PRAGMA synchronous = NORMAL') #WAL stays consistent; only the last commits can be lost
+            self.db.execute('CREATE TABLE IF NOT EXISTS analysis (kind INTEGER, key INTEGER, version TEXT, '
+                            'value BLOB, PRIMARY KEY (kind, key)) WITHOUT ROWID')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self.db is not None:
+            self.flush()
+            self.db.close()
+            self.db = None
+
+    def __len__(self):
+        return len(self.lru)
+
+    def get(self, kind, key):
+        #The cached value, or None
+        lru = self.lru
+        value = lru.get((kind, key))
+        if value is not None:
+            lru.move_to_end((kind, key))
+            self.counters['lru_hits'] += 1
+            return value
+        if self.db is not None:
+            blob = self.pending.get((kind, key))
+            if blob is None:
+                row = self.db.execute('SELECT version, value FROM analysis WHERE kind = ? AND key = ?',
+                                      (kind, _signed(key))).fetchone()
+                if row is not None:
+                    if row[0] == self.versions[kind]:
+                        blob = row[1]
+                    else:
+                        self.counters['stale'] += 1
+            if blob is not None:
+                self.counters['disk_hits'] += 1
+                value = _decode(kind, blob)
+                self._remember(kind, key, value)
+                return value
+        self.counters['misses'] += 1
+        return None
+
+    def put(self, kind, key, value):
+        self._remember(kind, key, value)
+        if self.db is not None:
+            self.pending[(kind, key)] = _encode(kind, value)
+            if len(self.pending) >= self.batch_size:
+                self.flush()
+
+    def _remember(self, kind, key, value):
+        lru = self.lru
+        lru[(kind, key)] = value
+        lru.move_to_end((kind, key))
+        if len(lru) > self.size:
+            lru.popitem(last = False)
+            self.counters['evictions'] += 1
+
+    def flush(self):
+        #Write the new results to the file in one transaction
+        if self.db is None or not self.pending:
+            return
+        rows = [(kind, _signed(key), self.versions[kind], blob) for (kind, key), blob in self.pending.items()]
+        self.db.execute('BEGIN IMMEDIATE')
+        try:
+            self.db.executemany('INSERT OR REPLACE INTO analysis VALUES (?, ?, ?, ?)', rows)
+            self.db.execute('COMMIT')
+        except BaseException:
+            self.db.execute('ROLLBACK')
+            raise
+        self.counters['writes'] += len(rows)
+        self.pending.clear()
+
+    def legal_moves(self, position):
+        #The legal moves as a tuple of packed ints
+        position = _position_of(position)
+        moves = self.get(LEGAL, position.key)
+        if moves is None:
+            moves = tuple(legal_moves(position))
+            self.put(LEGAL, position.key, moves)
+        return moves
+
+    def verdict(self, position):
+        #'checkmate', 'stalemate' or None. The draw rules aren't looked at, since they need the game
+        position = _position_of(position)
+        verdict = self.get(VERDICT, position.key) #Kept as an index into VERDICTS
+        if verdict is None:
+            verdict = 0
+            if not self.legal_moves(position):
+                us = BLACK if position.data[TURN] else WHITE
+                in_check = is_attacked(position, position.bb[us | KING].bit_length() - 1, us ^ BLACK)
+                verdict = 1 if in_check else 2
+            self.put(VERDICT, position.key, verdict)
+        return VERDICTS[verdict]
+
+    def search(self, position, depth, searcher = None):
+        #A SearchResult for a search to at least depth plies; a cached one has no nodes or time
+        position = _position_of(position)
+        found = self.get(SEARCH, position.key)
+        if found is not None and found[2] >= depth:
+            move, score, searched, pv = found
+            return SearchResult(move, score, searched, list(pv), 0, 0.0, 0, 0.0)
+        if searcher is None:
+            if self.searcher is None:
+                self.searcher = Searcher()
+            searcher = self.searcher
+        result = searcher.search(position, depth = depth)
+        #A search stops short of depth once it proves a mate, which a deeper search can't change
+        searched = max(result.depth, depth) if abs(result.score) >= MATE_BOUND else result.depth
+        self.put(SEARCH, position.key, (result.move, result.score, searched, result.pv))
+        return result
+
+    def purge(self):
+        #Delete the stored results of other code versions. Returns how many went
+        if self.db is None:
+            return 0
+        self.flush()
+        deleted = 0
+        for kind, version in self.versions.items():
+            deleted += self.db.execute('DELETE FROM analysis WHERE kind = ? AND version != ?', (kind, version)).rowcount
+        return deleted
+
+    def stats(self):
+        counters = dict(self.counters)
+        lookups = counters['lru_hits'] + counters['disk_hits'] + counters['misses']
+        counters['hit_rate'] = (counters['lru_hits'] + counters['disk_hits']) / lookups if lookups else 0.0
+        counters['lru_entries'] = len(self.lru)
+        if self.db is not None:
+            self.flush()
+            counters['disk_entries'] = self.db.execute('SELECT COUNT(*) FROM analysis').fetchone()[0]
+        return counters
+
+def _time(function, positions):
+    start = time.perf_counter()
+    for position in positions:
+        function(position)
+    return (time.perf_counter() - start) / len(positions)
+
+def main(args = None):
+    import argparse
+    parser = argparse.ArgumentParser(prog = 'main.py cache', description = 'Inspect or time the analysis cache.')
+    commands = parser.add_subparsers(dest = 'command', required = True)
+    info = commands.add_parser('stats', help = 'Count the stored results, current and stale')
+    info.add_argument('path')
+    purge = commands.add_parser('purge', help = 'Delete the results of other code versions')
+    purge.add_argument('path')
+    bench = commands.add_parser('bench', help = 'Time legal move lookups against generating them')
+    bench.add_argument('path')
+    bench.add_argument('--positions', type = int, default = 20000)
+    options = parser.parse_args(args)
+    if options.command == 'bench':
+        from .codec import random_positions
+        positions = random_positions(options.positions)
+        generate = _time(legal_moves, positions)
+        with AnalysisCache(options.path, size = options.positions) as cache:
+            store = _time(cache.legal_moves, positions)
+            cache.flush()
+            memory = _time(cache.legal_moves, positions)
+        with AnalysisCache(options.path, size = options.positions) as cache: #An empty LRU over the same file
+            disk = _time(cache.legal_moves, positions)
+            stats = cache.stats()
+        print(f'generate {generate * 1e6:.1f} us, first lookup and store {store * 1e6:.1f} us, '
+              f'LRU hit {memory * 1e6:.2f} us, file hit {disk * 1e6:.1f} us per position')
+        print(stats)
+        return 0
+    with AnalysisCache(options.path) as cache:
+        if options.command == 'purge':
+            print(f'{cache.purge()} stale results deleted')
+            return 0
+        names = {LEGAL: 'legal moves', VERDICT: 'verdicts', SEARCH: 'searches'}
+        for kind, name in names.items():
+            current, total = cache.db.execute('SELECT SUM(version = ?), COUNT(*) FROM analysis WHERE kind = ?',
+                                              (cache.versions[kind], kind)).fetchone()
+            print(f'{name:<12} {current or 0} current, {total - (current or 0)} stale')
+    return 0
@@ -0,0 +1,156 @@
+"""
+This module contains a fixed-size binary encoding of positions: 32 bytes each.
+
+Every field of a `Position` is kept, so decode(encode(position)) == position, Zobrist key included. A
+fixed size means a file or buffer of encoded positions can be indexed directly (record i starts at
+byte 32 * i) and read with NumPy or mmap without parsing.
+
+Layout:
+- 0-7: the occupancy mask, little-endian (bit i is set when square i holds a piece).
+- 8-23: the piece code of each occupied square in square order, packed two to a byte with the lower
+    square in the low nibble. Piece codes fit in four bits and a position holds at most 32 pieces.
+- 24: the side to move in bit 0 and the castling rights in bits 1-4.
+- 25: the en passant square, or NO_SQUARE.
+- 26: the halfmove clock.
+- 27-28: the fullmove number, little-endian.
+- 29-31: zero.
+
+Functions:
+- encode(position) / decode(record): One position to 32 bytes and back. Both accept a `Board` too.
+- encode_many(positions) / decode_many(buffer): Many positions to one bytes object and back.
+- benchmark(count): Encode/decode and FEN round trips per second.
+- main(args): The `python main.py codec-bench` command line.
+"""
+import time
+from .position import (Position, WHITE, BLACK, TURN, CASTLING, EP, HALFMOVE, FULLMOVE, SIZE, NO_SQUARE,
+                       START_FEN)
+from .zobrist import PIECE_KEYS, TURN_KEY, CASTLING_KEYS, EP_KEYS
+from .bitboard import legal_moves
+
+ENCODED_SIZE = 32
+MAX_PIECES = 32
+
+#bytes.translate tables for splitting and joining nibbles
+_LOW_NIBBLE = bytes(value & 15 for value in range(256))
+_HIGH_NIBBLE = bytes(value >> 4 for value in range(256))
+_TO_HIGH_NIBBLE = bytes((value << 4) & 255 for value in range(256))
+_PIECE_CODES = frozenset((1, 2, 3, 4, 5, 6, 9, 10, 11, 12, 13, 14))
+#_BYTE_SQUARES[i][value]: the squares set in byte i of the occupancy mask when it holds value
+_BYTE_SQUARES = [[tuple(i * 8 + bit for bit in range(8) if value >> bit & 1) for value in range(256)]
+                 for i in range(8)]
+_BITS = [1 << sq for sq in range(64)]
+
+def encode(position):
+    if not isinstance(position, Position):
+        position = position.position
+    data = position.data
+    bb = position.bb
+    #The codes of the occupied squares in square order are just the squares without the zeros
+    codes = data[:64].replace(b'\x00', b'')
+    if len(codes) > MAX_PIECES:
+        raise ValueError(f"Can't encode a position with more than {MAX_PIECES} pieces")
+    #Even-numbered pieces go in the low nibbles and odd-numbered ones in the high nibbles of the same bytes
+    packed = int.from_bytes(codes[0::2], 'little') | int.from_bytes(codes[1::2].translate(_TO_HIGH_NIBBLE), 'little')
+    return ((bb[WHITE] | bb[BLACK]).to_bytes(8, 'little') + packed.to_bytes(16, 'little')
+            + bytes((data[TURN] | data[CASTLING] << 1, data[EP], data[HALFMOVE], data[FULLMOVE], data[FULLMOVE + 1], 0, 0, 0)))
+
+def decode(record):
+    record = bytes(record)
+    if len(record) != ENCODED_SIZE:
+        raise ValueError(f"Encoded positions are {ENCODED_SIZE} bytes, not {len(record)}")
+    squares = (_BYTE_SQUARES[0][record[0]] + _BYTE_SQUARES[1][record[1]] + _BYTE_SQUARES[2][record[2]]
+               + _BYTE_SQUARES[3][record[3]] + _BYTE_SQUARES[4][record[4]] + _BYTE_SQUARES[5][record[5]]
+               + _BYTE_SQUARES[6][record[6]] + _BYTE_SQUARES[7][record[7]])
+    #The even-numbered pieces are in the low nibbles and the odd-numbered ones in the high nibbles
+    packed = record[8:24]
+    count = len(squares)
+    low_codes = packed.translate(_LOW_NIBBLE)[:(count + 1) >> 1]
+    high_codes = packed.translate(_HIGH_NIBBLE)[:count >> 1]
+    if not (_PIECE_CODES.issuperset(low_codes) and _PIECE_CODES.issuperset(high_codes)):
+        raise ValueError("Bad piece code in encoded position")
+    #Rebuild the squares, piece masks and key in one pass over the occupied squares
+    data = bytearray(SIZE)
+    bb = [0] * 16
+    key = 0
+    for sq, code in zip(squares[0::2], low_codes):
+        data[sq] = code
+        bb[code] |= _BITS[sq]
+        key ^= PIECE_KEYS[code][sq]
+    for sq, code in zip(squares[1::2], high_codes):
+        data[sq] = code
+        bb[code] |= _BITS[sq]
+        key ^= PIECE_KEYS[code][sq]
+    bb[WHITE] = bb[1] | bb[2] | bb[3] | bb[4] | bb[5] | bb[6]
+    bb[BLACK] = bb[9] | bb[10] | bb[11] | bb[12] | bb[13] | bb[14]
+    flags = record[24]
+    ep = record[25]
+    if flags > 31 or ep > NO_SQUARE:
+        raise ValueError("Bad state bytes in encoded position")
+    data[TURN] = flags & 1
+    data[CASTLING] = flags >> 1
+    data[EP] = ep
+    data[HALFMOVE] = record[26]
+    data[FULLMOVE] = record[27]
+    data[FULLMOVE + 1] = record[28]
+    if flags & 1:
+        key ^= TURN_KEY
+    key ^= CASTLING_KEYS[flags >> 1]
+    if ep != NO_SQUARE:
+        key ^= EP_KEYS[ep & 7]
+    return Position(data, bb, key)
+
+def encode_many(positions):
+    return b''.join(map(encode, positions))
+
+def decode_many(buffer):
+    #Yields the positions of a buffer of back to back records (bytes, bytearray, memoryview or mmap)
+    view = memoryview(buffer)
+    if len(view) % ENCODED_SIZE:
+        raise ValueError(f"Buffer length {len(view)} isn't a multiple of {ENCODED_SIZE}")
+    for offset in range(0, len(view), ENCODED_SIZE):
+        yield decode(view[offset:offset + ENCODED_SIZE])
+
+def random_positions(count, seed = 0):
+    import random
+    #Positions from random games, for benchmarks
+    generator = random.Random(seed)
+    positions = []
+    position = Position.from_fen(START_FEN)
+    while len(positions) < count:
+        moves = legal_moves(position)
+        if not moves or position.halfmove >= 100:
+            position = Position.from_fen(START_FEN)
+            continue
+        position.make_move(generator.choice(moves))
+        positions.append(position.copy())
+    return positions
+
+def _rate(function, items):
+    start = time.perf_counter()
+    for item in items:
+        function(item)
+    return len(items) / max(time.perf_counter() - start, 1e-9)
+
+def benchmark(count = 100000, report = print):
+    #Returns {name: round trips per second}
+    positions = random_positions(count)
+    records = [encode(position) for position in positions]
+    fens = [position.to_fen() for position in positions]
+    rates = {
+        'encode': _rate(encode, positions),
+        'decode': _rate(decode, records),
+        'to_fen': _rate(Position.to_fen, positions),
+        'from_fen': _rate(Position.from_fen, fens),
+    }
+    for name, rate in rates.items():
+        report(f'{name:<9} {rate:>10.0f} positions/s')
+    report(f'{ENCODED_SIZE} bytes per encoded position, {sum(map(len, fens)) / len(fens):.1f} bytes per FEN')
+    return rates
+
+def main(args = None):
+    import argparse
+    parser = argparse.ArgumentParser(prog = 'main.py codec-bench', description = 'Time the position encodings.')
+    parser.add_argument('--count', type = int, default = 100000, help = 'How many positions to time')
+    options = parser.parse_args(args)
+    benchmark(options.count)
+    return 0
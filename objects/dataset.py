@@ -0,0 +1,303 @@
+"""
+This module contains the training-data export: positions from played games written to memory-mapped
+NumPy `.npy` shards, and a reader that walks the shards without copying them.
+
+Every position becomes one fixed-width record (`RECORD`, 112 bytes):
+- key: its Zobrist key, which also serves to drop repeated positions.
+- planes: 12 bitboards, white pawn..king then black pawn..king as in `batch_evaluation.PLANE_CODES`,
+    with bit i set when square i (a1 = 0) holds that piece. `planes(records)` unpacks them into the
+    (N, 12, 64) layout `evaluate_batch` takes, and `squares(records)` into the (N, 64) one.
+- score: a search score in centipawns for the side to move, or `NO_SCORE`.
+- turn: 0 for white to move, 1 for black.
+- castling / ep: the castling rights and en passant square, as in `Position`.
+- result: the game's result for white: 1, 0 or -1, or `NO_RESULT` for an unfinished game.
+
+`DatasetWriter` keeps at most one chunk of records as Python objects. Each full chunk is turned into an
+array and copied into the current shard, which is an `.npy` file mapped into memory, so RAM use
+doesn't grow with the number of positions. The only thing that does grow is the sorted array of the keys
+seen so far, at 8 bytes per distinct position. Repeats are dropped within a chunk by a set, and against
+earlier chunks by a binary search of that array when the chunk is flushed. A shard is written under a
+.tmp name and renamed once it is complete, so readers never see half a shard.
+
+`Dataset` opens every shard with `np.load(mmap_mode='r')`. Iterating yields slices of the mapped
+files, so reading a dataset costs page faults, not copies.
+
+Like `batch_evaluation.py`, this module needs NumPy, and no other module imports it.
+
+Classes:
+- DatasetWriter(directory, shard_size, chunk_size, dedup): Appends positions to the shards of a directory.
+- Dataset(directory): The shards of a directory, opened for reading.
+
+Functions:
+- DatasetWriter.add(position, result, score): One position. add_moves(moves, result, start, scores) and
+    add_game(game, result, scores) walk a whole game: a move list, a `Game` or a `Board`.
+- Dataset.chunks(size): Views of up to size records at a time, shard by shard.
+- planes(records) / squares(records): Unpack the piece bitboards of records.
+- export(sources, directory, ...): Writes the games of PGN files or match result files to a dataset.
+- main(args): The `python main.py dataset` command line.
+"""
+import glob
+import json
+import os
+import numpy as np
+from .position import Position, TURN, CASTLING, EP, START_FEN
+from .batch_evaluation import PLANE_CODES, from_planes
+
+RECORD = np.dtype([
+    ('key', '<u8'),
+    ('planes', '<u8', (12,)),
+    ('score', '<i4'),
+    ('turn', 'u1'),
+    ('castling', 'u1'),
+    ('ep', 'u1'),
+    ('result', 'i1'),
+])
+NO_SCORE = np.iinfo(np.int32).min
+NO_RESULT = -128
+RESULTS = {'1-0': 1, '1/2-1/2': 0, '0-1': -1, '*': NO_RESULT}
+SHARD_PATTERN = 'shard-{:05d}.npy'
+
+_PLANE_CODES = [int(code) for code in PLANE_CODES]
+
+def planes(records):
+    #(N, 12, 64) 0/1 planes of the records
+    boards = np.ascontiguousarray(records['planes']).astype('<u8', copy = False)
+    return np.unpackbits(boards.view(np.uint8), bitorder = 'little').reshape(len(records), 12, 64)
+
+def squares(records):
+    #(N, 64) piece codes of the records, as in Position.data[:64]
+    return from_planes(planes(records))
+
+def _shard_paths(directory):
+    return sorted(glob.glob(os.path.join(directory, SHARD_PATTERN.replace('{:05d}', '[0-9]' * 5))))
+
+class DatasetWriter:
+    def __init__(self, directory, shard_size = 1 << 20, chunk_size = 1 << 14, dedup = True):
+        #shard_size and chunk_size are in records. Adding to a directory that has shards continues
+        #after them, dropping positions they already hold when dedup is on
+        if shard_size < 1 or chunk_size < 1:
+            raise ValueError("shard_size and chunk_size must be positive")
+        os.makedirs(directory, exist_ok = True)
+        self.directory = directory
+        self.shard_size = shard_size
+        self.chunk_size = chunk_size
+        self.dedup = dedup
+        self.rows = []
+        self.chunk_keys = set()
+        existing = _shard_paths(directory)
+        self.next_shard = len(existing)
+        self.seen = np.empty(0, dtype = np.uint64) #Sorted keys of every record in the shards
+        if dedup and existing:
+            self.seen = np.unique(np.concatenate([np.load(path, mmap_mode = 'r')['key'] for path in existing]))
+        self.shard = None #The open shard's memmap
+        self.shard_path = None
+        self.filled = 0 #Records in the open shard
+        self.written = 0
+        self.duplicates = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add(self, position, result = '*', score = None):
+        #result is '1-0', '0-1', '1/2-1/2' or '*'; score is centipawns for the side to move, if searched
+        key = position.key
+        if self.dedup:
+            if key in self.chunk_keys:
+                self.duplicates += 1
+                return
+            self.chunk_keys.add(key)
+        bb = position.bb
+        data = position.data
+        self.rows.append((key, [bb[code] for code in _PLANE_CODES], NO_SCORE if score is None else score,
+                          data[TURN], data[CASTLING], data[EP], RESULTS[result]))
+        if len(self.rows) >= self.chunk_size:
+            self.flush()
+
+    def add_moves(self, moves, result = '*', start = None, scores = None):
+        #Every position of a game: start (a FEN or Position, the initial position by default) and the
+        #position after each move. moves are packed ints; scores, if given, line up with the positions
+        position = Position.from_fen(start or START_FEN) if not isinstance(start, Position) else start.copy()
+        for ply, move in enumerate(moves):
+            self.add(position, result, scores[ply] if scores else None)
+            position.make_move(move)
+        self.add(position, result, scores[len(moves)] if scores and len(scores) > len(moves) else None)
+
+    def add_game(self, game, result = None, scores = None):
+        #A Game or a Board, from its starting position. result defaults to how the game stands now
+        if result is None:
+            from .game import Game
+            result = (game if isinstance(game, Game) else Game(game.position)).status().result
+        start = game.start_position() if hasattr(game, 'start_position') else game.start
+        self.add_moves(game.history.moves(), result, start, scores)
+
+    def flush(self):
+        #Write the records kept in memory to the shards
+        if not self.rows:
+            return
+        chunk = np.array(self.rows, dtype = RECORD)
+        self.rows.clear()
+        self.chunk_keys.clear()
+        if self.dedup:
+            keys = chunk['key']
+            if len(self.seen):
+                found = np.searchsorted(self.seen, keys)
+                repeated = self.seen[np.minimum(found, len(self.seen) - 1)] == keys
+                if repeated.any():
+                    self.duplicates += int(repeated.sum())
+                    chunk = chunk[~repeated]
+                    keys = chunk['key']
+            #Both are sorted runs, which a stable sort merges in linear time
+            self.seen = np.sort(np.concatenate((self.seen, np.sort(keys))), kind = 'stable')
+        while len(chunk):
+            if self.shard is None:
+                self.shard_path = os.path.join(self.directory, SHARD_PATTERN.format(self.next_shard))
+                self.shard = np.lib.format.open_memmap(self.shard_path + '.tmp', mode = 'w+', dtype = RECORD,
+                                                       shape = (self.shard_size,))
+                self.next_shard += 1
+                self.filled = 0
+            part = chunk[:self.shard_size - self.filled]
+            self.shard[self.filled:self.filled + len(part)] = part
+            self.filled += len(part)
+            self.written += len(part)
+            chunk = chunk[len(part):]
+            if self.filled == self.shard_size:
+                self._finish_shard()
+            else:
+                self.shard.flush() #Hand the dirty pages to the OS rather than keeping them
+
+    def _finish_shard(self):
+        temporary = self.shard_path + '.tmp'
+        if self.filled < self.shard_size:
+            #The header holds the shape, so a short shard is copied into one of the right length
+            short = np.lib.format.open_memmap(temporary + '.short', mode = 'w+', dtype = RECORD,
+                                              shape = (self.filled,))
+            for offset in range(0, self.filled, self.chunk_size):
+                end = min(offset + self.chunk_size, self.filled)
+                short[offset:end] = self.shard[offset:end]
+            short.flush()
+            del short
+            os.replace(temporary + '.short', temporary)
+        else:
+            self.shard.flush()
+        self.shard = None
+        os.replace(temporary, self.shard_path)
+
+    def close(self):
+        self.flush()
+        if self.shard is not None:
+            if self.filled:
+                self._finish_shard()
+            else:
+                self.shard = None
+                os.remove(self.shard_path + '.tmp')
+                self.next_shard -= 1
+
+class Dataset:
+    def __init__(self, directory):
+        self.paths = _shard_paths(directory)
+        self.shards = []
+        for path in self.paths:
+            shard = np.load(path, mmap_mode = 'r')
+            if shard.dtype != RECORD or shard.ndim != 1:
+                raise ValueError(f"{path} isn't a dataset shard")
+            self.shards.append(shard)
+        self.offsets = np.cumsum([0] + [len(shard) for shard in self.shards])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        #The files are unmapped once the arrays (and any views of them) are gone
+        self.shards = []
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f"No record {index}")
+        shard = int(np.searchsorted(self.offsets, index, side = 'right')) - 1
+        return self.shards[shard][index - self.offsets[shard]]
+
+    def __iter__(self):
+        #Each shard as one memory-mapped array
+        return iter(self.shards)
+
+    def chunks(self, size = 1 << 16):
+        for shard in self.shards:
+            for offset in range(0, len(shard), size):
+                yield shard[offset:offset + size]
+
+def _match_games(path):
+    #(moves, result, fen) of every game in a match results file (see match.py)
+    from .game import Game
+    with open(path) as file:
+        for line in file:
+            if line.strip():
+                record = json.loads(line)
+                game = Game(record.get('fen'))
+                for move in record['moves']:
+                    game.apply_move(move)
+                yield game.history.moves(), record.get('result', '*'), record.get('fen')
+
+def export(sources, directory, shard_size = 1 << 20, chunk_size = 1 << 14, dedup = True, workers = 1,
+           on_error = None):
+    #Every position of every game in the sources: PGN files, or .jsonl results files from match.py.
+    #Returns the DatasetWriter, closed, for its counts
+    with DatasetWriter(directory, shard_size, chunk_size, dedup) as writer:
+        for source in sources:
+            if source.endswith('.jsonl'):
+                for moves, result, fen in _match_games(source):
+                    writer.add_moves(moves, result, fen)
+                continue
+            from .pgn import read_games, replay_many
+            games = replay_many(source, workers, on_error = on_error) if workers > 1 else read_games(source, on_error = on_error)
+            for pgn_game in games:
+                writer.add_moves(pgn_game.moves, pgn_game.headers.get('Result', '*'), pgn_game.headers.get('FEN'))
+    return writer
+
+def main(args = None):
+    import argparse
+    import time
+    parser = argparse.ArgumentParser(prog = 'main.py dataset', description = 'Export positions for training.')
+    commands = parser.add_subparsers(dest = 'command', required = True)
+    write = commands.add_parser('export', help = 'Write the positions of games to .npy shards')
+    write.add_argument('directory')
+    write.add_argument('sources', nargs = '+', help = 'PGN files or match .jsonl results files')
+    write.add_argument('--shard-size', type = int, default = 1 << 20, help = 'Records per shard')
+    write.add_argument('--chunk-size', type = int, default = 1 << 14, help = 'Records kept in memory')
+    write.add_argument('--no-dedup', action = 'store_true', help = 'Keep repeated positions')
+    write.add_argument('--workers', type = int, default = 1, help = 'Replay PGN games on this many processes')
+    info = commands.add_parser('info', help = 'Count the records of a dataset and time reading it')
+    info.add_argument('directory')
+    options = parser.parse_args(args)
+    start = time.perf_counter()
+    if options.command == 'export':
+        writer = export(options.sources, options.directory, options.shard_size, options.chunk_size,
+                        not options.no_dedup, options.workers, on_error = print)
+        seconds = time.perf_counter() - start
+        print(f'{writer.written} positions written ({writer.duplicates} repeats dropped) to '
+              f'{writer.next_shard} shards in {seconds:.2f}s, {writer.written / max(seconds, 1e-9):.0f} positions/s')
+        return 0
+    with Dataset(options.directory) as dataset:
+        results = dict.fromkeys(RESULTS, 0)
+        names = {value: name for name, value in RESULTS.items()}
+        scored = 0
+        for chunk in dataset.chunks():
+            values, counts = np.unique(chunk['result'], return_counts = True)
+            for value, count in zip(values, counts):
+                results[names[int(value)]] += int(count)
+            scored += int((chunk['score'] != NO_SCORE).sum())
+        seconds = time.perf_counter() - start
+        print(f'{len(dataset)} positions in {len(dataset.paths)} shards, {scored} with a score')
+        print(', '.join(f'{name}: {count}' for name, count in results.items()))
+        print(f'read in {seconds:.2f}s, {len(dataset) / max(seconds, 1e-9):.0f} positions/s')
+    return 0
@@ -0,0 +1,106 @@
+"""
+This module contains the draw rules that don't depend on the legal moves: threefold repetition, the
+fifty-move rule and insufficient material.
+
+Every check costs the same whatever the length of the game, so the search can make them at every node
+as well as `Game.status` once a turn:
+- The fifty-move rule reads the halfmove clock `Position.make_move` already keeps.
+- Repetitions are counted by `RepetitionTable`, a dict from Zobrist key to how often the position has
+    occurred since the last irreversible move (a capture or pawn move, which reset the halfmove clock).
+    Nothing from before such a move can come back, so each one starts a fresh dict, and the old one is
+    kept on a stack only so the move can be taken back. Pushing and popping a position is O(1).
+- Insufficient material is decided from the piece masks alone.
+
+Classes:
+- RepetitionTable(key): Repetition counts for the positions of a game, starting with `key`.
+
+Functions:
+- is_fifty_move(position): True once 100 plies have passed without a capture or pawn move.
+- insufficient_material(position): True when neither side has the material to mate.
+- draw_reason(position, repetitions): Which rule makes the position a draw, or None.
+"""
+from .position import PAWN, KNIGHT, BISHOP, ROOK, QUEEN, WHITE, BLACK, HALFMOVE
+
+#Plies without a capture or pawn move after which the game is drawn
+FIFTY_MOVE_PLIES = 100
+#Occurrences of the same position that draw the game
+REPETITION_LIMIT = 3
+
+#Squares the same color as a1
+DARK_SQUARES = sum(1 << sq for sq in range(64) if not ((sq >> 3) ^ sq) & 1)
+LIGHT_SQUARES = DARK_SQUARES ^ ((1 << 64) - 1)
+
+#Pieces that can always force or help a mate, whatever else is on the board
+_MATING_CODES = tuple(color | kind for color in (WHITE, BLACK) for kind in (PAWN, ROOK, QUEEN))
+
+class RepetitionTable:
+    __slots__ = ('counts', 'saved', 'keys')
+
+    def __init__(self, key = None):
+        self.counts = {} #Occurrences of each key since the last irreversible move
+        self.saved = [] #The counts from before each irreversible move, so pop can bring them back
+        self.keys = [] #(key, irreversible) for every position pushed, oldest first
+        if key is not None:
+            self.push(key)
+
+    def push(self, key, irreversible = False):
+        #Record the position reached by a move. irreversible: the move was a capture or pawn move.
+        #Returns how often the position has now occurred
+        if irreversible:
+            self.saved.append(self.counts)
+            self.counts = {}
+        self.keys.append((key, irreversible))
+        count = self.counts.get(key, 0) + 1
+        self.counts[key] = count
+        return count
+
+    def pop(self):
+        #Forget the last position pushed, when its move is taken back
+        key, irreversible = self.keys.pop()
+        count = self.counts[key] - 1
+        if count:
+            self.counts[key] = count
+        else:
+            del self.counts[key]
+        if irreversible:
+            self.counts = self.saved.pop()
+
+    def count(self, key):
+        return self.counts.get(key, 0)
+
+    def copy(self):
+        #A table with the same counts. Only positions since the last irreversible move are copied,
+        #so the copy can't be popped past it
+        table = RepetitionTable()
+        table.counts = dict(self.counts)
+        return table
+
+    def __len__(self):
+        return len(self.keys)
+
+def is_fifty_move(position):
+    return position.data[HALFMOVE] >= FIFTY_MOVE_PLIES
+
+def insufficient_material(position):
+    #King against king, king and one minor piece against king, or kings and bishops all on one color
+    bb = position.bb
+    for code in _MATING_CODES:
+        if bb[code]:
+            return False
+    knights = bb[WHITE | KNIGHT] | bb[BLACK | KNIGHT]
+    bishops = bb[WHITE | BISHOP] | bb[BLACK | BISHOP]
+    minors = knights | bishops
+    if not minors & (minors - 1):
+        return True
+    return not knights and (not bishops & DARK_SQUARES or not bishops & LIGHT_SQUARES)
+
+def draw_reason(position, repetitions = None):
+    #'threefold repetition', 'fifty-move rule', 'insufficient material' or None. Checkmate and
+    #stalemate need the legal moves and are left to the caller, which should look for them first
+    if repetitions is not None and repetitions.count(position.key) >= REPETITION_LIMIT:
+        return 'threefold repetition'
+    if is_fifty_move(position):
+        return 'fifty-move rule'
+    if insufficient_material(position):
+        return 'insufficient material'
+    return None
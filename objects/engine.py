@@ -0,0 +1,394 @@
+"""
+This module contains the search that lets the computer play a side.
+
+search(board, time_ms, depth) looks for the best move with negamax alpha-beta over the board's `Position`,
+deepening one ply at a time until the time or depth runs out, and returns the best move with its
+principal variation (PV). Positions already searched are remembered in a `TranspositionTable` keyed by
+the Zobrist key, and moves are tried best-first: the table's move, then captures by most valuable
+victim / least valuable attacker (MVV-LVA), then killer moves and the history heuristic for quiet moves.
+At the horizon, quiescence search keeps playing captures so a move is never judged halfway through an
+exchange. Repeated positions, the fifty-move rule and insufficient material are scored as draws at every
+node (see `draws.py`), counting repetitions of positions from the game as well as from the line searched.
+With `Tablebases`, positions they cover are scored from them (as mates in their exact number of plies,
+or draws) instead of being searched.
+
+Classes:
+- TranspositionTable(size): A fixed number of slots, each keeping the deepest result for its key.
+- Searcher(table, evaluate, tablebases): The search state (table, killers, history) reused from move to move.
+- SearchResult: The best move, score, depth reached, PV, nodes, time, nodes/second and table hit rate.
+
+Functions:
+- search(board, time_ms, depth, nodes, book, tablebases): Searches a `Board` or `Position` and returns a `SearchResult`.
+    A `Board` or `Game` brings its game's `RepetitionTable` along. With an `OpeningBook`, a book move is
+    returned at once (as depth 0) when there is one.
+    `parallel.py` splits the same search over several processes.
+- main(args): The `python main.py search` command line.
+"""
+import time
+from collections import namedtuple
+from .position import Position, PAWN, KING, WHITE, BLACK, TYPE_MASK, TURN, EP, HALFMOVE, START_FEN, move_to_uci
+from .bitboard import legal_moves, is_attacked
+from .evaluation import evaluate
+from .draws import RepetitionTable, insufficient_material, FIFTY_MOVE_PLIES
+
+INFINITY = 1000000
+#Mate is scored as MATE less the plies it takes, so scores past MATE_BOUND are mates
+MATE = 100000
+MATE_BOUND = MATE - 1000
+MAX_PLY = 128
+#Depth searched when neither a time nor a node limit is given
+DEFAULT_DEPTH = 5
+
+#What a stored score says about the true score
+EXACT, LOWER, UPPER = 0, 1, 2
+
+#Ordering keys: the table move first, then captures, promotions, killers and quiet moves by history
+TT_MOVE_ORDER = 1 << 30
+CAPTURE_ORDER = 1 << 28
+PROMOTION_ORDER = 1 << 27
+KILLER_ORDER = 1 << 26
+
+#MVV-LVA: capturing a queen beats capturing a rook, and a pawn capturing beats a queen capturing
+MVV_LVA = [[victim * 8 - attacker if victim else 0 for attacker in range(8)] for victim in range(8)]
+
+SearchResult = namedtuple('SearchResult', [
+    'move', #The best move as a packed int (see encode_move), or None without legal moves
+    'score', #Centipawns for the side to move, or +-(MATE - plies) for a forced mate
+    'depth', #The last fully searched depth
+    'pv', #The expected line of play, starting with move
+    'nodes', 'seconds', 'nps',
+    'tt_hit_rate' #Share of table probes that found their position
+])
+
+class TranspositionTable:
+    #Each slot holds one (key, depth, score, flag, move, generation) tuple for keys that share its low bits
+    def __init__(self,size = 1 << 18):
+        #size is the number of slots, rounded down to a power of two
+        self.size = 1 << (max(size,1).bit_length() - 1)
+        self.mask = self.size - 1
+        self.entries = [None] * self.size
+        self.generation = 0
+        self.probes = 0
+        self.hits = 0
+    def clear(self):
+        self.entries = [None] * self.size
+        self.generation = 0
+    def new_search(self):
+        #Entries from earlier searches can be replaced regardless of their depth
+        self.generation += 1
+        self.probes = 0
+        self.hits = 0
+    def probe(self,key):
+        self.probes += 1
+        entry = self.entries[key & self.mask]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        return None
+    def store(self,key,depth,score,flag,move):
+        index = key & self.mask
+        entry = self.entries[index]
+        if entry is None or entry[5] != self.generation or depth >= entry[1]:
+            if not move and entry is not None and entry[0] == key:
+                move = entry[4] #Keep the best move known for this position
+            self.entries[index] = (key,depth,score,flag,move,self.generation)
+    @property
+    def hit_rate(self):
+        return self.hits / self.probes if self.probes else 0.0
+    def usage(self,sample = 1000):
+        #Share of the first slots used by the current search, the way UCI reports hashfull
+        sample = min(sample,self.size)
+        generation = self.generation
+        used = sum(1 for entry in self.entries[:sample] if entry is not None and entry[5] == generation)
+        return used / sample
+
+class _Stop(Exception):
+    #Raised inside the search when the time or node budget runs out
+    pass
+
+def _score_to_table(score,ply):
+    #Mates are stored relative to the stored position, not the root
+    if score > MATE_BOUND:
+        return score + ply
+    if score < -MATE_BOUND:
+        return score - ply
+    return score
+
+def _score_from_table(score,ply):
+    if score > MATE_BOUND:
+        return score - ply
+    if score < -MATE_BOUND:
+        return score + ply
+    return score
+
+class Searcher:
+    def __init__(self,table = None,evaluate = evaluate,tablebases = None):
+        self.table = table if table is not None else TranspositionTable()
+        self.evaluate = evaluate
+        self.tablebases = tablebases #Endgame Tablebases to score the positions they cover from, or None
+        self.killers = [[0,0] for _ in range(MAX_PLY + 1)]
+        #history[piece code][to square]: how often a quiet move caused a cutoff, weighted by depth
+        self.history = [[0] * 64 for _ in range(16)]
+        self.nodes = 0
+        self.stopping = False
+        self.deadline = None
+        self.node_limit = None
+        self.completed_depth = 0
+        self.root_moves = None #Set when the search is limited to some of the root moves
+        self.repetitions = None #Positions since the last irreversible move, in the game and then the line searched
+    def stop(self):
+        #Ask a running search (e.g. on another thread) to return its last completed result
+        self.stopping = True
+    def search(self,position,time_ms = None,depth = None,nodes = None,info = None,moves = None,repetitions = None):
+        #Iterative deepening: each depth's table entries and PV order the next one.
+        #info, if given, is called with a SearchResult after every completed depth.
+        #moves, if given, limits the search to those root moves (packed ints).
+        #repetitions, if given, is the game's RepetitionTable, ending with this position
+        position = position.copy() #A search cut short leaves its moves on the board
+        if repetitions is not None:
+            self.repetitions = repetitions.copy()
+        else:
+            self.repetitions = RepetitionTable(position.key)
+        start = time.perf_counter()
+        self.nodes = 0
+        self.stopping = False
+        self.deadline = start + time_ms / 1000 if time_ms else None
+        self.node_limit = nodes
+        self.completed_depth = 0
+        self.table.new_search()
+        self.killers = [[0,0] for _ in range(MAX_PLY + 1)]
+        for scores in self.history:
+            for index in range(64):
+                scores[index] >>= 1
+        if depth is None:
+            depth = MAX_PLY if time_ms or nodes else DEFAULT_DEPTH
+        depth = min(depth,MAX_PLY)
+
+        result = self._result(None,0,0,[],start)
+        root_moves = legal_moves(position)
+        if moves is not None:
+            root_moves = [move for move in root_moves if move in moves]
+            self.root_moves = root_moves
+        else:
+            self.root_moves = None
+        if not root_moves:
+            return result
+        for current in range(1,depth + 1):
+            pv = []
+            try:
+                score = self._negamax(position,current,-INFINITY,INFINITY,0,pv)
+            except _Stop:
+                break
+            self.completed_depth = current
+            result = self._result(pv[0],score,current,pv,start)
+            if info:
+                info(result)
+            if abs(score) > MATE_BOUND and MATE - abs(score) <= current:
+                break #A forced mate was found and can't get shorter
+            if self.deadline and time.perf_counter() > start + (self.deadline - start) / 2:
+                break #The next depth would most likely not finish in time
+            if self.stopping:
+                break
+        return result
+    def _result(self,move,score,depth,pv,start):
+        seconds = time.perf_counter() - start
+        return SearchResult(move,score,depth,list(pv),self.nodes,seconds,
+                            int(self.nodes / seconds) if seconds > 0 else 0,self.table.hit_rate)
+    def _check_limits(self):
+        #Only give up once a depth has finished, so there is always a move to return
+        if not self.completed_depth:
+            return
+        if (self.stopping or (self.deadline and time.perf_counter() >= self.deadline)
+                or (self.node_limit and self.nodes >= self.node_limit)):
+            raise _Stop()
+    def _order(self,position,moves,table_move,ply):
+        data = position.data
+        ep = data[EP]
+        killers = self.killers[ply]
+        history = self.history
+        keyed = []
+        for move in moves:
+            if move == table_move:
+                keyed.append((TT_MOVE_ORDER,move))
+                continue
+            to_sq = (move >> 6) & 63
+            piece = data[move & 63]
+            victim = data[to_sq] & TYPE_MASK
+            if victim or (to_sq == ep and piece & TYPE_MASK == PAWN):
+                keyed.append((CAPTURE_ORDER + MVV_LVA[victim or PAWN][piece & TYPE_MASK] + (move >> 12),move))
+            elif move >> 12:
+                keyed.append((PROMOTION_ORDER + (move >> 12),move))
+            elif move == killers[0]:
+                keyed.append((KILLER_ORDER + 1,move))
+            elif move == killers[1]:
+                keyed.append((KILLER_ORDER,move))
+            else:
+                keyed.append((history[piece][to_sq],move))
+        keyed.sort(reverse = True)
+        return [move for _, move in keyed]
+    def _negamax(self,position,depth,alpha,beta,ply,pv):
+        self.nodes += 1
+        if not self.nodes & 1023:
+            self._check_limits()
+        data = position.data
+        key = position.key
+        #A position seen before on the way here (or in the game) would just be repeated: call it a draw
+        if ply and (data[HALFMOVE] >= FIFTY_MOVE_PLIES or self.repetitions.counts.get(key,0) > 1
+                    or insufficient_material(position)):
+            return 0
+        if ply and self.tablebases is not None:
+            found = self.tablebases.probe(position)
+            if found is not None:
+                wdl, plies = found
+                return wdl * (MATE - ply - plies)
+        bb = position.bb
+        us = BLACK if data[TURN] else WHITE
+        in_check = is_attacked(position,bb[us | KING].bit_length() - 1,us ^ BLACK)
+        if in_check:
+            depth += 1 #Look one ply further at checks so forcing lines are seen through
+        if depth <= 0 or ply >= MAX_PLY:
+            return self._quiescence(position,alpha,beta,ply)
+
+        entry = self.table.probe(key)
+        table_move = 0
+        if entry is not None:
+            table_move = entry[4]
+            #Only cut on null-window nodes, so the PV is always searched out in full
+            if ply and entry[1] >= depth and beta - alpha == 1:
+                score = _score_from_table(entry[2],ply)
+                flag = entry[3]
+                if flag == EXACT or (flag == LOWER and score >= beta) or (flag == UPPER and score <= alpha):
+                    return score
+
+        moves = self.root_moves if not ply and self.root_moves else legal_moves(position)
+        if not moves:
+            return -MATE + ply if in_check else 0
+        original_alpha = alpha
+        best_score = -INFINITY
+        best_move = 0
+        make_move = position.make_move
+        unmake_move = position.unmake_move
+        repetitions = self.repetitions
+        for index, move in enumerate(self._order(position,moves,table_move,ply)):
+            capture = data[(move >> 6) & 63]
+            undo = make_move(move)
+            repetitions.push(position.key,not data[HALFMOVE])
+            child_pv = []
+            if index == 0:
+                score = -self._negamax(position,depth - 1,-beta,-alpha,ply + 1,child_pv)
+            else:
+                #Principal variation search: prove the move is worse with a null window, re-search if not
+                score = -self._negamax(position,depth - 1,-alpha - 1,-alpha,ply + 1,child_pv)
+                if alpha < score < beta:
+                    child_pv = []
+                    score = -self._negamax(position,depth - 1,-beta,-alpha,ply + 1,child_pv)
+            repetitions.pop()
+            unmake_move(undo)
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    pv[:] = [move] + child_pv
+                    if alpha >= beta:
+                        if not capture and not move >> 12:
+                            killers = self.killers[ply]
+                            if killers[0] != move:
+                                killers[1] = killers[0]
+                                killers[0] = move
+                            self.history[data[move & 63]][(move >> 6) & 63] += depth * depth
+                        break
+        if best_score >= beta:
+            flag = LOWER
+        elif best_score > original_alpha:
+            flag = EXACT
+        else:
+            flag = UPPER
+        if ply or not self.root_moves: #A score over some of the root moves isn't the position's score
+            self.table.store(key,depth,_score_to_table(best_score,ply),flag,best_move)
+        return best_score
+    def _quiescence(self,position,alpha,beta,ply):
+        #Only captures and promotions from here; standing pat assumes a quiet move is at least as good
+        self.nodes += 1
+        if not self.nodes & 1023:
+            self._check_limits()
+        best_score = self.evaluate(position)
+        if best_score >= beta or ply >= MAX_PLY:
+            return best_score
+        if best_score > alpha:
+            alpha = best_score
+        moves = legal_moves(position,True)
+        if not moves:
+            return best_score
+        make_move = position.make_move
+        unmake_move = position.unmake_move
+        for move in self._order(position,moves,0,ply):
+            undo = make_move(move)
+            score = -self._quiescence(position,-beta,-alpha,ply + 1)
+            unmake_move(undo)
+            if score > best_score:
+                best_score = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        return best_score
+
+def search(board,time_ms = None,depth = None,nodes = None,table = None,info = None,book = None,tablebases = None):
+    #Search a Board or Game (through its position) or a Position. Without any limit, searches DEFAULT_DEPTH plies.
+    #Pass the same table between calls to keep what earlier searches learned
+    if isinstance(board,Position):
+        position, repetitions = board, None
+    else:
+        position, repetitions = board.position, board.repetitions
+    if book is not None:
+        move = book.choose(position)
+        if move is not None:
+            return SearchResult(move,0,0,[move],0,0.0,0,0.0) #Depth 0: from the book, not searched
+    return Searcher(table,tablebases = tablebases).search(position,time_ms = time_ms,depth = depth,nodes = nodes,info = info,
+                                  repetitions = repetitions)
+
+def format_score(score):
+    if score > MATE_BOUND:
+        return f'mate {(MATE - score + 1) // 2}'
+    if score < -MATE_BOUND:
+        return f'mate -{(MATE + score) // 2}'
+    return f'cp {score}'
+
+def report(result):
+    print(f'depth {result.depth:>2} score {format_score(result.score):<9} nodes {result.nodes:>9} '
+          f'nps {result.nps:>7} tt hits {result.tt_hit_rate:6.1%} '
+          f'pv {" ".join(move_to_uci(move) for move in result.pv)}')
+
+def main(args = None):
+    import argparse
+    parser = argparse.ArgumentParser(prog = 'main.py search', description = 'Search a position for the best move.')
+    parser.add_argument('--fen', default = START_FEN, help = 'Position to search (default: the initial position)')
+    parser.add_argument('--depth', type = int, help = f'Depth to search to (default: {DEFAULT_DEPTH} without --time-ms)')
+    parser.add_argument('--time-ms', type = int, help = 'Time to search for, in milliseconds')
+    parser.add_argument('--nodes', type = int, help = 'Nodes to search at most')
+    parser.add_argument('--tt-size', type = int, default = 1 << 18, help = 'Transposition table slots (per worker)')
+    parser.add_argument('--workers', type = int, default = 1, help = 'Split the search over this many processes')
+    parser.add_argument('--tablebases', help = 'Directory of endgame tables (see main.py tablebase)')
+    options = parser.parse_args(args)
+    position = Position.from_fen(options.fen)
+    if options.workers > 1:
+        from .parallel import ParallelSearcher
+        #Every worker opens the tables itself
+        with ParallelSearcher(options.workers,options.tt_size,options.tablebases) as searcher:
+            result = searcher.search(position,time_ms = options.time_ms,depth = options.depth,
+                                     nodes = options.nodes,info = report)
+    else:
+        tablebases = None
+        if options.tablebases:
+            from .tablebase import Tablebases
+            tablebases = Tablebases(options.tablebases)
+        result = search(position,time_ms = options.time_ms,depth = options.depth,nodes = options.nodes,
+                        table = TranspositionTable(options.tt_size),info = report,tablebases = tablebases)
+    if result.move is None:
+        print('No legal moves')
+        return 1
+    print(f'bestmove {move_to_uci(result.move)}')
+    print(f'{result.nodes} nodes in {result.seconds:.2f}s ({result.nps} nps), '
+          f'tt hit rate {result.tt_hit_rate:.1%}')
+    return 0
@@ -0,0 +1,137 @@
+"""
+This module contains the static evaluation used by the engine.
+
+A position is scored in centipawns from material plus piece-square tables (the "simplified evaluation"
+tables). The king uses separate middlegame and endgame tables, blended by how much non-pawn material is
+left on the board. Scores are from the side to move's point of view, as negamax expects.
+
+The tables below are written the way they are usually printed, from white's side with rank 8 on top.
+`SQUARE_SCORES` turns them into one signed lookup per piece code and square index (positive for white).
+"""
+from .position import PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, WHITE, BLACK, TURN
+
+PIECE_VALUES = {PAWN: 100, KNIGHT: 320, BISHOP: 330, ROOK: 500, QUEEN: 900, KING: 0}
+
+PAWN_TABLE = [
+     0,  0,  0,  0,  0,  0,  0,  0,
+    50, 50, 50, 50, 50, 50, 50, 50,
+    10, 10, 20, 30, 30, 20, 10, 10,
+     5,  5, 10, 25, 25, 10,  5,  5,
+     0,  0,  0, 20, 20,  0,  0,  0,
+     5, -5,-10,  0,  0,-10, -5,  5,
+     5, 10, 10,-20,-20, 10, 10,  5,
+     0,  0,  0,  0,  0,  0,  0,  0
+]
+KNIGHT_TABLE = [
+    -50,-40,-30,-30,-30,-30,-40,-50,
+    -40,-20,  0,  0,  0,  0,-20,-40,
+    -30,  0, 10, 15, 15, 10,  0,-30,
+    -30,  5, 15, 20, 20, 15,  5,-30,
+    -30,  0, 15, 20, 20, 15,  0,-30,
+    -30,  5, 10, 15, 15, 10,  5,-30,
+    -40,-20,  0,  5,  5,  0,-20,-40,
+    -50,-40,-30,-30,-30,-30,-40,-50
+]
+BISHOP_TABLE = [
+    -20,-10,-10,-10,-10,-10,-10,-20,
+    -10,  0,  0,  0,  0,  0,  0,-10,
+    -10,  0,  5, 10, 10,  5,  0,-10,
+    -10,  5,  5, 10, 10,  5,  5,-10,
+    -10,  0, 10, 10, 10, 10,  0,-10,
+    -10, 10, 10, 10, 10, 10, 10,-10,
+    -10,  5,  0,  0,  0,  0,  5,-10,
+    -20,-10,-10,-10,-10,-10,-10,-20
+]
+ROOK_TABLE = [
+     0,  0,  0,  0,  0,  0,  0,  0,
+     5, 10, 10, 10, 10, 10, 10,  5,
+    -5,  0,  0,  0,  0,  0,  0, -5,
+    -5,  0,  0,  0,  0,  0,  0, -5,
+    -5,  0,  0,  0,  0,  0,  0, -5,
+    -5,  0,  0,  0,  0,  0,  0, -5,
+    -5,  0,  0,  0,  0,  0,  0, -5,
+     0,  0,  0,  5,  5,  0,  0,  0
+]
+QUEEN_TABLE = [
+    -20,-10,-10, -5, -5,-10,-10,-20,
+    -10,  0,  0,  0,  0,  0,  0,-10,
+    -10,  0,  5,  5,  5,  5,  0,-10,
+     -5,  0,  5,  5,  5,  5,  0, -5,
+      0,  0,  5,  5,  5,  5,  0, -5,
+    -10,  5,  5,  5,  5,  5,  0,-10,
+    -10,  0,  5,  0,  0,  0,  0,-10,
+    -20,-10,-10, -5, -5,-10,-10,-20
+]
+KING_MIDDLEGAME_TABLE = [
+    -30,-40,-40,-50,-50,-40,-40,-30,
+    -30,-40,-40,-50,-50,-40,-40,-30,
+    -30,-40,-40,-50,-50,-40,-40,-30,
+    -30,-40,-40,-50,-50,-40,-40,-30,
+    -20,-30,-30,-40,-40,-30,-30,-20,
+    -10,-20,-20,-20,-20,-20,-20,-10,
+     20, 20,  0,  0,  0,  0, 20, 20,
+     20, 30, 10,  0,  0, 10, 30, 20
+]
+KING_ENDGAME_TABLE = [
+    -50,-40,-30,-20,-20,-30,-40,-50,
+    -30,-20,-10,  0,  0,-10,-20,-30,
+    -30,-10, 20, 30, 30, 20,-10,-30,
+    -30,-10, 30, 40, 40, 30,-10,-30,
+    -30,-10, 30, 40, 40, 30,-10,-30,
+    -30,-10, 20, 30, 30, 20,-10,-30,
+    -30,-30,  0,  0,  0,  0,-30,-30,
+    -50,-30,-30,-30,-30,-30,-30,-50
+]
+PIECE_TABLES = {PAWN: PAWN_TABLE, KNIGHT: KNIGHT_TABLE, BISHOP: BISHOP_TABLE, ROOK: ROOK_TABLE,
+                QUEEN: QUEEN_TABLE, KING: KING_MIDDLEGAME_TABLE}
+
+#How much each piece counts towards the middlegame, out of MAX_PHASE for the full starting set
+PHASE_WEIGHTS = {KNIGHT: 1, BISHOP: 1, ROOK: 2, QUEEN: 4}
+MAX_PHASE = 24
+
+def _signed_table(table, color, value):
+    #Map a printed table onto square indexes: white reads it upside down, black reads it as printed
+    if color == WHITE:
+        return [value + table[(7 - (sq >> 3)) * 8 + (sq & 7)] for sq in range(64)]
+    return [-(value + table[sq]) for sq in range(64)]
+
+#Material plus position for each piece code and square, positive for white
+SQUARE_SCORES = [[0] * 64 for _ in range(16)]
+#The king's endgame table, kept apart so it can be blended by phase
+KING_ENDGAME_SCORES = [[0] * 64 for _ in range(16)]
+for _color in (WHITE, BLACK):
+    for _kind, _table in PIECE_TABLES.items():
+        SQUARE_SCORES[_color | _kind] = _signed_table(_table, _color, PIECE_VALUES[_kind])
+    KING_ENDGAME_SCORES[_color | KING] = _signed_table(KING_ENDGAME_TABLE, _color, 0)
+
+#The phase weight of each piece code, so one pass over the board can sum both
+PHASE_BY_CODE = [0] * 16
+for _color in (WHITE, BLACK):
+    for _kind, _weight in PHASE_WEIGHTS.items():
+        PHASE_BY_CODE[_color | _kind] = _weight
+
+def game_phase(position):
+    #MAX_PHASE with all pieces on the board, 0 with only kings and pawns
+    data = position.data
+    return min(sum(PHASE_BY_CODE[data[sq]] for sq in range(64)), MAX_PHASE)
+
+def evaluate(position):
+    data = position.data
+    bb = position.bb
+    occupied = bb[WHITE] | bb[BLACK]
+    score = 0
+    phase = 0
+    while occupied:
+        low = occupied & -occupied
+        sq = low.bit_length() - 1
+        code = data[sq]
+        score += SQUARE_SCORES[code][sq]
+        phase += PHASE_BY_CODE[code]
+        occupied ^= low
+    #SQUARE_SCORES has the kings on their middlegame tables; move them towards the endgame ones
+    if phase < MAX_PHASE:
+        for code in (WHITE | KING, BLACK | KING):
+            if bb[code]:
+                sq = bb[code].bit_length() - 1
+                score += (KING_ENDGAME_SCORES[code][sq] - SQUARE_SCORES[code][sq]) * (MAX_PHASE - phase) // MAX_PHASE
+    return -score if data[TURN] else score
@@ -8,9 +8,9 @@ def translate_input(input):
 def take_user_input():
     valid = False
     while not valid:
-        _from = input("What piece would you like to move? (Type 'undo' to go back a move)")
-        if _from == "undo":
-            return 'undo'
+        _from = input("What piece would you like to move? (Type 'undo' to go back a move, 'redo' to replay it)")
+        if _from in ("undo","redo"):
+            return _from
         if len(_from) != 2:
             print("Input must be in the form a-h0-8 Ex:a1. Try again")
             continue
@@ -36,11 +36,6 @@ def take_user_input():
         valid = True
     return (_from,_to)
 
-def assess_capturable(piece,other_piece):
-    piece_color = piece.color
-    other_piece_color = other_piece.color
-    return piece_color != other_piece_color
-
 def coords_to_str(coords):
     x,y = coords
     map = {
@@ -0,0 +1,171 @@
+"""
+This module contains `Game`, a chess game with no user interface.
+
+A Game never reads input or prints: moves go in as UCI strings (e2e4, e7e8q) and everything about the
+game comes back as values, so one process can hold as many games as it likes and drive them from any
+front end. The terminal game in `terminal.py` is one such client.
+
+A Game keeps only what the rules need: the `Position`, its `RepetitionTable` and a `MoveStack` of the
+position's undo records. It doesn't build the `Square`/`Piece` graph or the move maps of a `Board`, so it
+is cheap to create and to play moves on. The legal moves are generated once per ply and reused by
+legal_moves(), apply_move() and status().
+
+Classes:
+- Game(start): A game from the initial position, a FEN string or a `Position`. Raises ValueError unless
+    each side has exactly one king.
+- GameStatus: The side to move, whether it is in check, the result and what decided it.
+
+Functions:
+- Game.apply_move(uci): Plays a legal move. Raises ValueError for anything else.
+- Game.play_move(uci): Plays a legal move without asking whether the game is over, for replaying moves
+    played on past a draw that could have been claimed.
+- Game.legal_moves(): The legal moves in UCI notation.
+- Game.status(): The current `GameStatus`.
+- Game.to_fen(): The current position as a FEN string.
+- Game.undo() / redo(): Takes back the last move, or plays the last move taken back again.
+- Game.engine_move(time_ms, depth, nodes, book, tablebases): Lets the engine (or an opening book) pick
+    and play the next move.
+- Game.adjudicate(tablebases): The result endgame tablebases give the position with best play, if any.
+- Game.moves() / to_pgn(headers): Exports the game as UCI moves or PGN text.
+"""
+from collections import namedtuple
+from .position import Position, KING, WHITE, BLACK, TURN, START_FEN, PIECE_TYPES, SQUARE_INDEXES, move_to_uci
+from .bitboard import legal_moves, is_attacked
+from .draws import RepetitionTable, draw_reason
+from .history import MoveStack
+from .engine import search
+
+GameStatus = namedtuple('GameStatus', [
+    'turn', #'w' or 'b'
+    'in_check',
+    'result', #'*' while the game goes on, else '1-0', '0-1' or '1/2-1/2'
+    'reason' #None while the game goes on, else 'checkmate', 'stalemate' or a draw rule (see draws.py)
+])
+
+class Game:
+    __slots__ = ('position', 'repetitions', 'history', 'start', '_moves')
+
+    def __init__(self, start = None):
+        #start: a FEN string or Position to play from, or None for the initial position
+        if start is None:
+            start = Position.from_fen(START_FEN)
+        elif isinstance(start, str):
+            start = Position.from_fen(start)
+        elif bin(start.bb[WHITE | KING]).count('1') != 1 or bin(start.bb[BLACK | KING]).count('1') != 1:
+            raise ValueError("A game needs exactly one king of each color")
+        self.position = start.copy()
+        self.start = start.copy()
+        self.repetitions = RepetitionTable(self.position.key)
+        self.history = MoveStack() #The position's undo records, plus the moves undone
+        self._moves = None #The packed legal moves of the current position, once generated
+
+    def _legal_moves(self):
+        if self._moves is None:
+            self._moves = legal_moves(self.position)
+        return self._moves
+
+    def legal_moves(self):
+        return [move_to_uci(move) for move in self._legal_moves()]
+
+    def parse_move(self, uci):
+        #The packed move for a legal UCI move. A promotion without a piece letter promotes to a queen
+        if (not isinstance(uci, str) or len(uci) not in (4, 5) or uci[:2] not in SQUARE_INDEXES
+                or uci[2:4] not in SQUARE_INDEXES or uci[4:] not in ('', 'n', 'b', 'r', 'q')):
+            raise ValueError(f"Bad UCI move {uci!r}")
+        promotion = uci[4:]
+        move = SQUARE_INDEXES[uci[:2]] | SQUARE_INDEXES[uci[2:4]] << 6
+        moves = self._legal_moves()
+        if promotion:
+            move |= PIECE_TYPES[promotion] << 12
+        elif move not in moves:
+            move |= PIECE_TYPES['q'] << 12
+        if move not in moves:
+            raise ValueError(f"Illegal move {uci!r}")
+        return move
+
+    def _play(self, move):
+        position = self.position
+        self.history.push(position.make_move(move))
+        self.repetitions.push(position.key, not position.halfmove)
+        self._moves = None
+
+    def apply_move(self, uci):
+        #Play a move and return the new status. Raises ValueError if the move is malformed or illegal,
+        #or the game is already over
+        if self.status().result != '*':
+            raise ValueError("The game is over")
+        self._play(self.parse_move(uci))
+        return self.status()
+
+    def play_move(self, uci):
+        #Like apply_move, but plays on past a draw rule: the caller decides when the game is over.
+        #Returns the new status
+        self._play(self.parse_move(uci))
+        return self.status()
+
+    def status(self):
+        position = self.position
+        us = BLACK if position.data[TURN] else WHITE
+        in_check = is_attacked(position, position.bb[us | KING].bit_length() - 1, us ^ BLACK)
+        turn = 'b' if us else 'w'
+        if not self._legal_moves():
+            if in_check:
+                return GameStatus(turn, True, '0-1' if us == WHITE else '1-0', 'checkmate')
+            return GameStatus(turn, False, '1/2-1/2', 'stalemate')
+        reason = draw_reason(position, self.repetitions)
+        if reason:
+            return GameStatus(turn, in_check, '1/2-1/2', reason)
+        return GameStatus(turn, in_check, '*', None)
+
+    def to_fen(self):
+        return self.position.to_fen()
+
+    def undo(self):
+        #Take back the last move. Returns False if there is none
+        if not self.history:
+            return False
+        self.repetitions.pop()
+        self.position.unmake_move(self.history.pop())
+        self._moves = None
+        return True
+
+    def redo(self):
+        #Play the last move taken back again. Returns False if there is none
+        move = self.history.next_redo()
+        if move is None:
+            return False
+        self._play(move)
+        return True
+
+    def engine_move(self, time_ms = None, depth = None, nodes = None, table = None, book = None,
+                    tablebases = None):
+        #Search the current position, play the best move and return the SearchResult. The search runs
+        #in the calling thread, so a server should call this from a worker. A move from book, if given,
+        #is played without searching
+        if self.status().result != '*':
+            raise ValueError("The game is over")
+        result = search(self, time_ms = time_ms, depth = depth, nodes = nodes, table = table, book = book,
+                        tablebases = tablebases)
+        self._play(result.move)
+        return result
+
+    def adjudicate(self, tablebases):
+        #'1-0', '0-1' or '1/2-1/2' if the game is still going and tablebases know how it ends with best
+        #play, else None
+        if self.status().result != '*':
+            return None
+        return tablebases.result(self.position)
+
+    def moves(self):
+        #The moves played so far in UCI notation, e.g. ['e2e4', 'e7e5']
+        return [move_to_uci(move) for move in self.history.moves()]
+
+    def to_pgn(self, headers = None):
+        tags = {'Result': self.status().result}
+        tags.update(headers or {})
+        from .pgn import write_game
+        return write_game(self.history.moves(), self.start, tags)
+
+    @property
+    def ply(self):
+        return len(self.history)
@@ -0,0 +1,66 @@
+"""
+This module contains `MoveStack`, the record of a game's moves behind `Board.undo` and `Board.redo`.
+
+Each played move is kept as the `UndoToken` that `Board.make_move` returned (or, for a `Game`, the undo
+record of `Position.make_move` inside it): an immutable record of the move, the piece it captured and
+the castling rights, en passant square, halfmove clock and key from before it. That is everything needed to take the move back, so a game costs the same small record per
+ply however long it gets, and any number of moves can be undone.
+
+Undone moves are kept (as packed ints) until a different move is played, so they can be redone. Playing
+the same move as the next redo keeps the rest of the undone line.
+
+Functions:
+- push(token) / append(token): Records a move just played.
+- pop(): Removes the last move's token, remembering the move for redo.
+- next_redo(): The move redo would play, or None.
+- moves(): The packed moves played so far, in order.
+"""
+
+def token_move(token):
+    #The packed move (see encode_move) an UndoToken or Position undo record was made with
+    return getattr(token, 'position_undo', token)[0]
+
+class MoveStack:
+    __slots__ = ('played', 'undone')
+
+    def __init__(self):
+        self.played = [] #UndoTokens or Position undo records, oldest first
+        self.undone = [] #Packed moves taken back, the next one to redo last
+
+    def push(self, token):
+        move = token_move(token)
+        if self.undone and self.undone[-1] == move:
+            self.undone.pop()
+        else:
+            self.undone.clear()
+        self.played.append(token)
+
+    #So the stack can be used where the plain list of tokens used to be
+    append = push
+
+    def pop(self):
+        token = self.played.pop()
+        self.undone.append(token_move(token))
+        return token
+
+    def next_redo(self):
+        return self.undone[-1] if self.undone else None
+
+    def moves(self):
+        return [token_move(token) for token in self.played]
+
+    def clear(self):
+        self.played.clear()
+        self.undone.clear()
+
+    def __len__(self):
+        return len(self.played)
+
+    def __bool__(self):
+        return bool(self.played)
+
+    def __iter__(self):
+        return iter(self.played)
+
+    def __getitem__(self, index):
+        return self.played[index]
@@ -0,0 +1,256 @@
+"""
+This module contains the instrumentation of the rules core: per-phase timers and call counters, a
+cProfile capture of a single turn, and a JSON dump of the numbers for every game.
+
+Turning it on swaps timed wrappers in for the methods and functions it measures, and turning it off
+puts the originals back, so while it is off the code runs exactly as if this module didn't exist. A
+function is swapped in its own module and in every module of the package that imported it by name, and
+as the default evaluation of `Searcher`s made while it is on. Switch it on:
+- with the environment variable TERMINALCHESS_STATS: 1 to collect, or a directory to also write one
+    JSON file per game played in the terminal into. TERMINALCHESS_PROFILE_TURN=n also profiles the
+    n-th turn of every game. The package checks these when it is imported.
+- from code, with `enable()`/`disable()` or `with instrumented() as stats:`.
+
+Phases (each with its calls and total seconds; a phase's time includes the phases it calls). These are
+the rules core a `Game`, and so a terminal game, the server and the engine, actually runs:
+- position.make_move / position.unmake_move
+- position.make_move.<p|n|b|r|q|k>: The same moves again, by the type of the piece moved.
+- bitboard.legal_moves / bitboard.is_attacked
+- evaluation.evaluate
+- game.apply_move / game.engine_move / game.status / game.legal_moves
+- engine.search, with the nodes searched counted as engine.nodes
+- turn.human / turn.computer: A whole turn of a terminal game, input included.
+
+Classes:
+- Stats: The numbers collected; `STATS` is the one the wrappers add to.
+
+Functions:
+- enable(dump_dir, profile_turn) / disable(): Starts and stops collecting.
+- instrumented(dump_dir, profile_turn): The same as a context manager, yielding `STATS`.
+- capture_profile(path): A context manager that runs cProfile over its block.
+- Stats.to_dict() / dump(path) / report(): The numbers as a dict, a JSON file or a table.
+"""
+import os
+import json
+import time
+from contextlib import contextmanager
+
+ENV_STATS = 'TERMINALCHESS_STATS'
+ENV_PROFILE_TURN = 'TERMINALCHESS_PROFILE_TURN'
+#Lines of profile output kept with the stats
+PROFILE_LINES = 40
+
+PIECE_LETTERS = ' pnbrqk'
+
+class Stats:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.calls = {}
+        self.seconds = {}
+        self.counters = {}
+        self.profiles = [] #(turn, text) for every profiled turn
+        self.started = time.perf_counter()
+
+    def add(self, name, seconds):
+        self.calls[name] = self.calls.get(name, 0) + 1
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+
+    def count(self, name, amount = 1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def to_dict(self):
+        phases = {name: {'calls': calls, 'seconds': self.seconds[name],
+                         'mean_us': self.seconds[name] / calls * 1e6}
+                  for name, calls in sorted(self.calls.items())}
+        return {'wall_seconds': time.perf_counter() - self.started, 'phases': phases,
+                'counters': dict(sorted(self.counters.items())),
+                'profiles': [{'turn': turn, 'text': text} for turn, text in self.profiles]}
+
+    def dump(self, path, **extra):
+        #Write to_dict() (plus any extra fields) to path as JSON
+        with open(path, 'w') as file:
+            json.dump(dict(self.to_dict(), **extra), file, indent = 2)
+
+    def report(self):
+        #The phases as a table, most time first
+        lines = [f'{"phase":<28} {"calls":>9} {"total ms":>10} {"mean us":>9}']
+        for name in sorted(self.calls, key = self.seconds.get, reverse = True):
+            calls, seconds = self.calls[name], self.seconds[name]
+            lines.append(f'{name:<28} {calls:>9} {seconds * 1000:>10.2f} {seconds / calls * 1e6:>9.1f}')
+        for name, value in sorted(self.counters.items()):
+            lines.append(f'{name:<28} {value:>9}')
+        return '\n'.join(lines)
+
+STATS = Stats()
+
+#What enable() was asked for, and the (owner, name, original) of every attribute it replaced
+_settings = {'dump_dir': None, 'profile_turn': None, 'games': 0}
+_patched = []
+_depth = [0]
+#The timed wrapper of every module-level function swapped, by the original
+_functions = {}
+
+@contextmanager
+def capture_profile(path = None):
+    #Profile the block. Yields a list that gets the text report; path, if given, gets the raw stats
+    #for pstats or snakeviz
+    import cProfile
+    import io
+    import pstats
+    profiler = cProfile.Profile()
+    captured = []
+    profiler.enable()
+    try:
+        yield captured
+    finally:
+        profiler.disable()
+        if path:
+            profiler.dump_stats(path)
+        text = io.StringIO()
+        pstats.Stats(profiler, stream = text).sort_stats('cumulative').print_stats(PROFILE_LINES)
+        captured.append(text.getvalue())
+
+def _timed(function, name):
+    perf_counter = time.perf_counter
+    add = STATS.add
+    def timed(*args, **kwargs):
+        start = perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            add(name, perf_counter() - start)
+    return timed
+
+def _timed_make_move(function):
+    #Position.make_move, filed under its own name and the type of the piece moved
+    perf_counter = time.perf_counter
+    add = STATS.add
+    names = [f'position.make_move.{letter}' for letter in PIECE_LETTERS]
+    def make_move(position, move):
+        kind = position.data[move & 63] & 7
+        start = perf_counter()
+        try:
+            return function(position, move)
+        finally:
+            seconds = perf_counter() - start
+            add('position.make_move', seconds)
+            add(names[kind], seconds)
+    return make_move
+
+def _timed_search(function):
+    timed = _timed(function, 'engine.search')
+    def search(*args, **kwargs):
+        result = timed(*args, **kwargs)
+        STATS.count('engine.nodes', result.nodes)
+        return result
+    return search
+
+def _timed_turn(function, name):
+    timed = _timed(function, name)
+    def turn(*args, **kwargs):
+        STATS.count('turns')
+        number = STATS.counters['turns']
+        if number != _settings['profile_turn']:
+            return timed(*args, **kwargs)
+        path = None
+        if _settings['dump_dir']:
+            path = os.path.join(_settings['dump_dir'], f'game-{_settings["games"] + 1}-turn-{number}.prof')
+        with capture_profile(path) as captured:
+            result = timed(*args, **kwargs)
+        STATS.profiles.append((number, captured[0]))
+        return result
+    return turn
+
+def _counted_game(function):
+    #terminal.play: every game starts from fresh numbers, and is dumped to dump_dir when it ends
+    def play(*args, **kwargs):
+        STATS.reset()
+        game = function(*args, **kwargs)
+        _settings['games'] += 1
+        if _settings['dump_dir']:
+            STATS.dump(os.path.join(_settings['dump_dir'], f'game-{_settings["games"]}-{os.getpid()}.json'),
+                       result = game.status().result, plies = game.ply, moves = game.moves())
+        return game
+    return play
+
+def _swap_function(original, name, wrapper):
+    #(module, name, wrapper) for every module of the package that has the function under that name
+    import sys
+    package = __name__.rpartition('.')[0]
+    return [(module, name, wrapper) for module_name, module in list(sys.modules.items())
+            if (module_name == package or module_name.startswith(package + '.'))
+            and getattr(module, name, None) is original]
+
+def _install():
+    from .position import Position
+    from . import bitboard, evaluation
+    from .game import Game
+    from .engine import Searcher
+    from . import terminal
+    wrappers = [(Position, 'make_move', _timed_make_move(Position.make_move)),
+                (Position, 'unmake_move', _timed(Position.unmake_move, 'position.unmake_move'))]
+    for module, name in ((bitboard, 'legal_moves'), (bitboard, 'is_attacked'), (evaluation, 'evaluate')):
+        original = getattr(module, name)
+        _functions[original] = _timed(original, f'{module.__name__.rpartition(".")[2]}.{name}')
+        wrappers += _swap_function(original, name, _functions[original])
+    #Searcher bound the original evaluate as the default of its evaluate argument
+    wrappers.append((Searcher.__init__, '__defaults__',
+                     tuple(_functions.get(value, value) for value in Searcher.__init__.__defaults__)))
+    wrappers += [(Game, name, _timed(getattr(Game, name), f'game.{name}'))
+                 for name in ('apply_move', 'engine_move', 'status')]
+    wrappers.append((Game, '_legal_moves', _timed(Game._legal_moves, 'game.legal_moves')))
+    wrappers.append((Searcher, 'search', _timed_search(Searcher.search)))
+    wrappers.append((terminal, 'human_turn', _timed_turn(terminal.human_turn, 'turn.human')))
+    wrappers.append((terminal, 'computer_turn', _timed_turn(terminal.computer_turn, 'turn.computer')))
+    wrappers.append((terminal, 'play', _counted_game(terminal.play)))
+    for owner, name, wrapper in wrappers:
+        _patched.append((owner, name, getattr(owner, name)))
+        setattr(owner, name, wrapper)
+
+def enable(dump_dir = None, profile_turn = None):
+    #Start collecting into STATS. dump_dir gets a JSON file per terminal game; profile_turn=n runs
+    #cProfile over the n-th turn of every game. Calls nest: each needs its own disable()
+    _depth[0] += 1
+    if dump_dir:
+        os.makedirs(dump_dir, exist_ok = True)
+    _settings['dump_dir'] = dump_dir
+    _settings['profile_turn'] = profile_turn
+    if not _patched:
+        _install()
+    return STATS
+
+def disable():
+    _depth[0] = max(0, _depth[0] - 1)
+    if _depth[0]:
+        return
+    while _patched:
+        owner, name, original = _patched.pop()
+        setattr(owner, name, original)
+    #Modules imported while it was on took the timed functions by name too
+    for original, wrapper in _functions.items():
+        for module, name, _ in _swap_function(wrapper, original.__name__, None):
+            setattr(module, name, original)
+    _functions.clear()
+
+def is_enabled():
+    return bool(_patched)
+
+@contextmanager
+def instrumented(dump_dir = None, profile_turn = None):
+    stats = enable(dump_dir, profile_turn)
+    try:
+        yield stats
+    finally:
+        disable()
+
+def enable_from_environment(environ = None):
+    #Called when the package is imported; does nothing unless TERMINALCHESS_STATS is set
+    environ = os.environ if environ is None else environ
+    setting = environ.get(ENV_STATS, '')
+    if setting in ('', '0'):
+        return False
+    turn = environ.get(ENV_PROFILE_TURN, '')
+    enable(dump_dir = None if setting == '1' else setting, profile_turn = int(turn) if turn.isdigit() else None)
+    return True
@@ -0,0 +1,172 @@
+"""
+This module contains a load generator for the game server in `server.py`.
+
+It opens a few connections and keeps many games going on each at once. Every game is started with a
+"new" request and then played out with random legal moves (and, if asked, every n-th move by the engine)
+until it ends or reaches a ply limit, then closed. The time from sending each move request to reading
+its reply is recorded, so the report gives the move latency percentiles as well as throughput.
+
+Without an address, a server is started in a subprocess on a free localhost port for the run, so
+capacity can be measured on one machine with nothing else running.
+
+Classes:
+- LoadReport: Games and moves played, seconds, p50/p99 move latency, games/second, moves/second, errors.
+
+Functions:
+- run_load(address, games, connections, concurrency, plies, engine_every, engine_depth, seed): Plays
+    the games against a running server and returns a `LoadReport`.
+- spawn_server(workers): Starts a server subprocess and returns (process, address).
+- main(args): The `python main.py loadgen` command line.
+"""
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import namedtuple
+
+LoadReport = namedtuple('LoadReport', ['games', 'moves', 'seconds', 'p50_ms', 'p99_ms', 'games_per_second',
+                                       'moves_per_second', 'errors'])
+
+def percentile(values, fraction):
+    #Nearest-rank percentile of a sorted list
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, int(round(fraction * len(values))) - 1))]
+
+async def _open(address):
+    #address is host:port, or the path of a Unix socket
+    host, _, port = address.rpartition(':')
+    if host and port.isdigit():
+        return await asyncio.open_connection(host, int(port))
+    return await asyncio.open_unix_connection(address)
+
+class _Connection:
+    #One socket, with replies matched to their requests by id
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.replies = {}
+        self.next_id = 0
+        self.reading = asyncio.ensure_future(self._read())
+
+    async def _read(self):
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                break
+            reply = json.loads(line)
+            future = self.replies.pop(reply.get('id'), None)
+            if future is not None and not future.done():
+                future.set_result(reply)
+        for future in self.replies.values():
+            if not future.done():
+                future.set_exception(ConnectionError("The server closed the connection"))
+
+    async def request(self, **fields):
+        self.next_id += 1
+        fields['id'] = self.next_id
+        future = asyncio.get_running_loop().create_future()
+        self.replies[self.next_id] = future
+        self.writer.write(json.dumps(fields).encode() + b'\n')
+        await self.writer.drain()
+        return await future
+
+    async def close(self):
+        self.writer.close()
+        self.reading.cancel()
+
+async def _play_games(connection, remaining, rng, plies, engine_every, engine_depth, latencies, totals):
+    #Keep playing games until the shared count of games left runs out
+    while remaining[0] > 0:
+        remaining[0] -= 1
+        reply = await connection.request(op = 'new', legal = True)
+        if not reply['ok']:
+            totals['errors'] += 1
+            continue
+        game = reply['game']
+        for ply in range(plies):
+            if reply['status']['result'] != '*':
+                break
+            start = time.perf_counter()
+            if engine_every and ply % engine_every == engine_every - 1:
+                reply = await connection.request(op = 'engine', game = game, depth = engine_depth, legal = True)
+            else:
+                reply = await connection.request(op = 'move', game = game, move = rng.choice(reply['legal']),
+                                                 legal = True)
+            latencies.append(time.perf_counter() - start)
+            if not reply['ok']:
+                totals['errors'] += 1
+                break
+            totals['moves'] += 1
+        await connection.request(op = 'close', game = game)
+        totals['games'] += 1
+
+async def _run_load(address, games, connections, concurrency, plies, engine_every, engine_depth, seed):
+    rng = random.Random(seed)
+    latencies = []
+    totals = {'games': 0, 'moves': 0, 'errors': 0}
+    remaining = [games]
+    opened = [_Connection(*await _open(address)) for _ in range(connections)]
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(_play_games(connection, remaining, random.Random(rng.random()), plies,
+                                           engine_every, engine_depth, latencies, totals)
+                               for connection in opened for _ in range(concurrency)))
+    finally:
+        for connection in opened:
+            await connection.close()
+    seconds = time.perf_counter() - start
+    latencies.sort()
+    return LoadReport(totals['games'], totals['moves'], seconds,
+                      percentile(latencies, 0.5) * 1000, percentile(latencies, 0.99) * 1000,
+                      totals['games'] / max(seconds, 1e-9), totals['moves'] / max(seconds, 1e-9), totals['errors'])
+
+def run_load(address, games = 1000, connections = 4, concurrency = 32, plies = 60, engine_every = 0,
+             engine_depth = 1, seed = 0):
+    #concurrency is the number of games kept going at once on each connection. engine_every=n has the
+    #engine play every n-th move of each game, searching engine_depth plies
+    return asyncio.run(_run_load(address, games, connections, concurrency, plies, engine_every,
+                                 engine_depth, seed))
+
+def spawn_server(workers = None):
+    #A server in a subprocess on a free localhost port. Returns (process, address)
+    args = ['--port', '0'] + (['--workers', str(workers)] if workers else [])
+    process = subprocess.Popen([sys.executable, '-c', f'from objects.server import main; main({args!r})'],
+                               cwd = os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                               stdout = subprocess.PIPE, text = True)
+    line = process.stdout.readline()
+    if not line.startswith('listening on '):
+        process.kill()
+        raise RuntimeError(f"The server didn't start: {line!r}")
+    return process, line[len('listening on '):].strip()
+
+def main(args = None):
+    import argparse
+    parser = argparse.ArgumentParser(prog = 'main.py loadgen', description = 'Measure the game server under load.')
+    parser.add_argument('--address', help = 'host:port or Unix socket path (default: start a local server)')
+    parser.add_argument('--games', type = int, default = 1000, help = 'Games to play in total')
+    parser.add_argument('--connections', type = int, default = 4)
+    parser.add_argument('--concurrency', type = int, default = 32, help = 'Games in flight per connection')
+    parser.add_argument('--plies', type = int, default = 60, help = 'Longest game to play')
+    parser.add_argument('--engine-every', type = int, default = 0, help = 'Let the engine play every n-th move')
+    parser.add_argument('--engine-depth', type = int, default = 1)
+    parser.add_argument('--workers', type = int, default = None, help = 'Engine processes of a started server')
+    options = parser.parse_args(args)
+    process = None
+    address = options.address
+    if address is None:
+        process, address = spawn_server(options.workers)
+    try:
+        report = run_load(address, options.games, options.connections, options.concurrency, options.plies,
+                          options.engine_every, options.engine_depth)
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+    print(f'{report.games} games, {report.moves} moves in {report.seconds:.2f}s, {report.errors} errors')
+    print(f'move latency p50 {report.p50_ms:.2f} ms, p99 {report.p99_ms:.2f} ms')
+    print(f'{report.games_per_second:.1f} games/s, {report.moves_per_second:.0f} moves/s')
+    return 1 if report.errors else 0
@@ -0,0 +1,363 @@
+"""
+This module contains the match runner, which plays two engine configurations against each other over
+many games at once to tell which one is stronger.
+
+Every opening of the suite is played twice, once with each engine as white. The games are dealt out to
+a pool of worker processes, each of which keeps one `Searcher` (and its transposition table) per engine
+for all the games it plays. An engine is a configuration of this engine: its evaluation function, its
+transposition table size and how it spends time, either a clock with an increment per move (`tc`),
+a fixed time per move, a depth or a node count. Clocks are kept per side and a side whose clock runs out
+loses on time.
+
+A game ends when `Game.status()` says so (checkmate, stalemate or a draw rule), when tablebases know
+the result, when both engines have agreed for a while that one side is winning (`resign_cp`) or that
+it is level late in the game (`draw_cp`), or at `max_plies`. Each finished game is written as one JSON
+line to the results file straight away, so a match can be followed or cut short.
+
+With an SPRT (sequential probability ratio test), the match stops as soon as the results show that the
+first engine is `elo1` Elo stronger than the second rather than only `elo0` (or the other way round),
+with error rates alpha and beta, though never before `SPRT_MIN_GAMES` games. Games already being played
+still finish and are counted.
+
+Classes:
+- EngineSpec: An engine configuration. parse_engine(text) builds one from "name=new,depth=4,...".
+- MatchReport: The wins, draws and losses of the first engine, its Elo difference, the SPRT state,
+    games/second and how busy the workers were.
+
+Functions:
+- load_openings(path, plies): An opening suite from a FEN/EPD file, a file of UCI move lines or a PGN file.
+- sprt_llr(wins, draws, losses, elo0, elo1): The log-likelihood ratio of elo1 over elo0.
+- sprt_bounds(alpha, beta): The ratios below and above which the SPRT accepts elo0 or elo1.
+- elo(wins, draws, losses): The Elo difference and its 95% error margin.
+- run_match(first, second, openings, games, workers, output, sprt, ...): Plays the match and returns a
+    `MatchReport`.
+- main(args): The `python main.py match` command line.
+"""
+import json
+import math
+import os
+import time
+from collections import namedtuple
+from .game import Game
+from .position import move_to_uci
+from .engine import Searcher, TranspositionTable
+from .evaluation import evaluate
+from .uci import time_budget
+
+EngineSpec = namedtuple('EngineSpec', [
+    'name',
+    'evaluate', #"module:function" of the evaluation, or None for evaluation.evaluate
+    'tc', #(base ms, increment ms) of a clock, or None
+    'movetime', #Milliseconds per move, or None
+    'depth', 'nodes',
+    'hash' #Transposition table slots
+], defaults = (None, None, None, None, None, 1 << 16))
+
+MatchReport = namedtuple('MatchReport', [
+    'games', 'wins', 'draws', 'losses', #From the first engine's side
+    'elo', 'elo_margin',
+    'llr', 'verdict', #None without an SPRT, else 'H1' (elo1), 'H0' (elo0) or None while undecided
+    'seconds', 'games_per_second',
+    'cpu_utilisation' #Worker CPU seconds over wall seconds times workers
+])
+
+#A few well-known openings, as UCI moves from the initial position
+OPENINGS = [
+    'e2e4 e7e5 g1f3 b8c6', 'e2e4 c7c5 g1f3 d7d6', 'e2e4 e7e6 d2d4 d7d5', 'e2e4 c7c6 d2d4 d7d5',
+    'd2d4 d7d5 c2c4 e7e6', 'd2d4 g8f6 c2c4 g7g6', 'd2d4 g8f6 c2c4 e7e6', 'c2c4 e7e5 b1c3 g8f6',
+    'g1f3 d7d5 g2g3 g8f6', 'e2e4 d7d5 e4d5 d8d5', 'e2e4 g7g6 d2d4 f8g7', 'd2d4 f7f5 g2g3 g8f6',
+]
+#Plies both engines must agree on a score for before the game is adjudicated on it
+ADJUDICATION_PLIES = 8
+#No draw is adjudicated before this ply
+DRAW_ADJUDICATION_PLY = 80
+#Games played before the SPRT may stop a match
+SPRT_MIN_GAMES = 20
+#Time per move when an engine has no limit at all
+DEFAULT_MOVETIME = 100
+
+def parse_engine(text):
+    #"name=new,tc=10+0.1,evaluate=mymodule:evaluate,depth=4,nodes=20000,movetime=100,hash=65536"
+    fields = {}
+    for item in text.split(','):
+        key, equals, value = item.partition('=')
+        key = key.strip()
+        if not equals or key not in EngineSpec._fields:
+            raise ValueError(f"Bad engine field {item!r}, expected one of {', '.join(EngineSpec._fields)}")
+        fields[key] = value.strip()
+    if 'name' not in fields:
+        raise ValueError(f"Engine {text!r} has no name")
+    if 'tc' in fields:
+        base, _, increment = fields['tc'].partition('+')
+        try:
+            fields['tc'] = (int(float(base) * 1000), int(float(increment or 0) * 1000))
+        except ValueError:
+            raise ValueError(f"Bad time control {fields['tc']!r}, expected seconds+increment") from None
+    for key in ('movetime', 'depth', 'nodes', 'hash'):
+        if key in fields:
+            if not fields[key].isdigit() or not int(fields[key]):
+                raise ValueError(f"{key} must be a positive integer")
+            fields[key] = int(fields[key])
+    if 'evaluate' in fields and ':' not in fields['evaluate']:
+        raise ValueError("evaluate must be module:function")
+    return EngineSpec(**fields)
+
+def load_openings(path, plies = 8):
+    #(fen, [uci moves]) for every opening. PGN files give the first plies of each game; other files have
+    #a FEN (or 4-field EPD) or UCI moves from the initial position on each line
+    openings = []
+    if path.endswith('.pgn'):
+        from .pgn import read_games
+        for pgn_game in read_games(path):
+            openings.append((pgn_game.headers.get('FEN'), [move_to_uci(move) for move in pgn_game.moves[:plies]]))
+        return openings
+    with open(path) as file:
+        for line in file:
+            line = line.split('#')[0].strip()
+            if not line:
+                continue
+            if '/' in line:
+                fields = line.split(';')[0].split()
+                fen = ' '.join(fields[:4] + (fields[4:6] if len(fields) >= 6 and fields[4].isdigit() else ['0', '1']))
+                openings.append((fen, []))
+            else:
+                openings.append((None, line.split()))
+    return openings
+
+def _check_openings(openings):
+    for fen, moves in openings:
+        game = Game(fen)
+        for move in moves:
+            game.apply_move(move)
+        if game.status().result != '*':
+            raise ValueError(f"Opening {fen or ''} {' '.join(moves)} is already over")
+
+def elo(wins, draws, losses):
+    #(Elo difference, 95% margin) from a score; infinite for a clean sweep either way
+    games = wins + draws + losses
+    if not games:
+        return 0.0, math.inf
+    score = (wins + draws / 2) / games
+    deviation = math.sqrt(max((wins + draws / 4) / games - score * score, 0) / games)
+    def to_elo(value):
+        if value <= 0:
+            return -math.inf
+        if value >= 1:
+            return math.inf
+        return -400 * math.log10(1 / value - 1) + 0.0 #Never -0.0
+    high, low = to_elo(score + 1.96 * deviation), to_elo(score - 1.96 * deviation)
+    if math.isinf(high) or math.isinf(low): #Also keeps a sweep's inf - inf from giving nan
+        return to_elo(score), math.inf
+    return to_elo(score), (high - low) / 2
+
+def sprt_llr(wins, draws, losses, elo0, elo1):
+    #Generalised SPRT on the trinomial results: the log-likelihood ratio of a true Elo difference of
+    #elo1 over one of elo0, approximated from the mean and variance of the score. Half a game is added
+    #to each count, so a clean sweep has a variance and a few games can't swing the ratio wildly
+    wins, draws, losses = wins + 0.5, draws + 0.5, losses + 0.5
+    games = wins + draws + losses
+    score = (wins + draws / 2) / games
+    variance = ((wins + draws / 4) / games - score * score) / games
+    score0 = 1 / (1 + 10 ** (-elo0 / 400))
+    score1 = 1 / (1 + 10 ** (-elo1 / 400))
+    return (score1 - score0) * (2 * score - score0 - score1) / (2 * variance)
+
+def sprt_bounds(alpha, beta):
+    #(lower, upper): accept elo0 below lower and elo1 above upper
+    return math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+
+#The searchers of a worker process, one per engine, and its tablebases
+_searchers = {}
+_tablebases = None
+
+def _start_worker(tablebases):
+    global _tablebases
+    if tablebases:
+        from .tablebase import Tablebases
+        _tablebases = Tablebases(tablebases)
+
+def _searcher(spec):
+    searcher = _searchers.get(spec)
+    if searcher is None:
+        function = evaluate
+        if spec.evaluate:
+            import importlib
+            module, _, name = spec.evaluate.partition(':')
+            function = getattr(importlib.import_module(module), name)
+        searcher = _searchers[spec] = Searcher(TranspositionTable(spec.hash), function, _tablebases)
+    return searcher
+
+def _play_game(number, opening, fen, moves, white, black, max_plies, resign_cp, draw_cp):
+    #Runs in a worker. Plays one game and returns its record
+    cpu = time.process_time()
+    start = time.perf_counter()
+    game = Game(fen)
+    for move in moves:
+        game.apply_move(move)
+    specs = {'w': white, 'b': black}
+    clocks = {side: spec.tc[0] for side, spec in specs.items() if spec.tc}
+    for spec in (white, black):
+        _searcher(spec).table.clear() #Nothing carries over from the last game
+    scores = [] #White's score after every engine move
+    nodes = 0
+    result = reason = None
+    while result is None:
+        status = game.status()
+        if status.result != '*':
+            result, reason = status.result, status.reason
+            break
+        if _tablebases is not None:
+            result = game.adjudicate(_tablebases)
+            if result:
+                reason = 'tablebases'
+                break
+        if game.ply - len(moves) >= max_plies:
+            result, reason = '1/2-1/2', 'move limit'
+            break
+        turn = status.turn
+        spec = specs[turn]
+        time_ms = spec.movetime
+        if spec.tc:
+            time_ms = time_budget({turn + 'time': clocks[turn], turn + 'inc': spec.tc[1]}, turn)
+        elif time_ms is None and spec.depth is None and spec.nodes is None:
+            time_ms = DEFAULT_MOVETIME
+        searched = time.perf_counter()
+        found = _searcher(spec).search(game.position, time_ms = time_ms, depth = spec.depth, nodes = spec.nodes,
+                                       repetitions = game.repetitions)
+        if spec.tc:
+            clocks[turn] -= int((time.perf_counter() - searched) * 1000)
+            if clocks[turn] < 0:
+                result, reason = ('0-1' if turn == 'w' else '1-0'), 'time'
+                break
+            clocks[turn] += spec.tc[1]
+        nodes += found.nodes
+        game.apply_move(move_to_uci(found.move))
+        scores.append(found.score if turn == 'w' else -found.score)
+        recent = scores[-ADJUDICATION_PLIES:]
+        if resign_cp and len(recent) == ADJUDICATION_PLIES:
+            if min(recent) >= resign_cp:
+                result, reason = '1-0', 'adjudication'
+            elif max(recent) <= -resign_cp:
+                result, reason = '0-1', 'adjudication'
+        if (draw_cp and result is None and game.ply >= DRAW_ADJUDICATION_PLY and len(recent) == ADJUDICATION_PLIES
+                and max(abs(score) for score in recent) <= draw_cp):
+            result, reason = '1/2-1/2', 'adjudication'
+    return {'game': number, 'opening': opening, 'fen': fen, 'white': white.name, 'black': black.name, 'result': result,
+            'reason': reason, 'plies': game.ply, 'moves': game.moves(), 'nodes': nodes,
+            'seconds': round(time.perf_counter() - start, 3), 'cpu_seconds': round(time.process_time() - cpu, 3)}
+
+def run_match(first, second, openings = None, games = 100, workers = None, output = None, sprt = None,
+              max_plies = 300, resign_cp = 1000, draw_cp = 10, tablebases = None, report = None):
+    #first and second are EngineSpecs; openings is a list of (fen, [uci moves]), the built-in suite by
+    #default. output, if given, is a path that gets one JSON line per game as it finishes. sprt is
+    #(elo0, elo1, alpha, beta) or None. report, if given, is called with the MatchReport after every game
+    from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+    if first.name == second.name:
+        raise ValueError("The two engines need different names")
+    if openings is None:
+        openings = [(None, line.split()) for line in OPENINGS]
+    if not openings:
+        raise ValueError("The opening suite is empty")
+    _check_openings(openings)
+    workers = workers or os.cpu_count() or 1
+    bounds = sprt_bounds(*sprt[2:]) if sprt else None
+    tally = {'1-0': 0, '1/2-1/2': 0, '0-1': 0} #From the first engine's side: wins, draws, losses
+    cpu_seconds = 0.0
+    played = 0
+    verdict = None
+    llr = None
+    results = open(output, 'a') if output else None
+    start = time.perf_counter()
+
+    def summary():
+        seconds = time.perf_counter() - start
+        wins, draws, losses = tally['1-0'], tally['1/2-1/2'], tally['0-1']
+        difference, margin = elo(wins, draws, losses)
+        return MatchReport(played, wins, draws, losses, difference, margin, llr, verdict, seconds,
+                           played / max(seconds, 1e-9), cpu_seconds / max(seconds * workers, 1e-9))
+
+    def jobs():
+        for number in range(games):
+            opening = (number // 2) % len(openings)
+            fen, moves = openings[opening]
+            white, black = (first, second) if number % 2 == 0 else (second, first)
+            yield (number, opening, fen, moves, white, black, max_plies, resign_cp, draw_cp)
+
+    try:
+        with ProcessPoolExecutor(workers, initializer = _start_worker, initargs = (tablebases,)) as pool:
+            waiting = jobs()
+            running = set()
+            while True:
+                while verdict is None and len(running) < workers * 2: #Keep every worker busy, no more
+                    job = next(waiting, None)
+                    if job is None:
+                        break
+                    running.add(pool.submit(_play_game, *job))
+                if not running:
+                    break
+                done, running = wait(running, return_when = FIRST_COMPLETED)
+                for future in done:
+                    record = future.result()
+                    played += 1
+                    cpu_seconds += record['cpu_seconds']
+                    outcome = record['result']
+                    if record['white'] != first.name:
+                        outcome = {'1-0': '0-1', '0-1': '1-0'}.get(outcome, outcome)
+                    tally[outcome] += 1
+                    if results:
+                        results.write(json.dumps(record) + '\n')
+                        results.flush()
+                if sprt and verdict is None:
+                    llr = sprt_llr(tally['1-0'], tally['1/2-1/2'], tally['0-1'], sprt[0], sprt[1])
+                    if played >= SPRT_MIN_GAMES:
+                        if llr >= bounds[1]:
+                            verdict = 'H1'
+                        elif llr <= bounds[0]:
+                            verdict = 'H0'
+                if report:
+                    report(summary())
+    finally:
+        if results:
+            results.close()
+    return summary()
+
+def main(args = None):
+    import argparse
+    parser = argparse.ArgumentParser(prog = 'main.py match', description = 'Play two engine configurations against each other.')
+    parser.add_argument('first', type = parse_engine, help = 'name=...,tc=10+0.1|movetime=ms|depth=n|nodes=n,evaluate=module:function,hash=slots')
+    parser.add_argument('second', type = parse_engine, help = 'The engine the first is measured against')
+    parser.add_argument('--games', type = int, default = 100, help = 'Games to play (fewer if the SPRT stops it)')
+    parser.add_argument('--workers', type = int, default = None, help = 'Games played at once (default: all cores)')
+    parser.add_argument('--openings', help = 'FEN/EPD, UCI move or .pgn file (default: a built-in suite)')
+    parser.add_argument('--opening-plies', type = int, default = 8, help = 'Plies of each PGN game to use')
+    parser.add_argument('--output', help = 'Append one JSON line per game to this file')
+    parser.add_argument('--sprt', nargs = 2, type = float, metavar = ('ELO0', 'ELO1'), help = 'Stop once elo0 or elo1 is accepted')
+    parser.add_argument('--alpha', type = float, default = 0.05)
+    parser.add_argument('--beta', type = float, default = 0.05)
+    parser.add_argument('--max-plies', type = int, default = 300, help = 'Adjudicate a draw after this many plies')
+    parser.add_argument('--resign-cp', type = int, default = 1000, help = 'Adjudicate a win at this score (0: never)')
+    parser.add_argument('--draw-cp', type = int, default = 10, help = 'Adjudicate a late draw within this score (0: never)')
+    parser.add_argument('--tablebases', help = 'Directory of endgame tables to adjudicate from')
+    parser.add_argument('--quiet', action = 'store_true', help = 'Only print the final report')
+    options = parser.parse_args(args)
+    openings = load_openings(options.openings, options.opening_plies) if options.openings else None
+    sprt = (options.sprt[0], options.sprt[1], options.alpha, options.beta) if options.sprt else None
+
+    def show(report):
+        line = (f'{report.games} games: +{report.wins} ={report.draws} -{report.losses}  '
+                f'elo {report.elo:+.1f} +- {report.elo_margin:.1f}')
+        if report.llr is not None:
+            low, high = sprt_bounds(options.alpha, options.beta)
+            line += f'  llr {report.llr:.2f} ({low:.2f}, {high:.2f})'
+        print(line, flush = True)
+
+    report = run_match(options.first, options.second, openings, options.games, options.workers, options.output,
+                       sprt, options.max_plies, options.resign_cp, options.draw_cp, options.tablebases,
+                       None if options.quiet else show)
+    show(report)
+    if report.verdict:
+        accepted = sprt[1] if report.verdict == 'H1' else sprt[0]
+        print(f'SPRT accepts {report.verdict}: {options.first.name} against {options.second.name} is {accepted:+g} Elo')
+    print(f'{report.seconds:.1f}s, {report.games_per_second:.2f} games/s, '
+          f'worker CPU utilisation {report.cpu_utilisation:.0%} of {options.workers or os.cpu_count() or 1} workers')
+    return 0
@@ -0,0 +1,160 @@
+"""
+This module contains the parallel search, which splits the root moves of a position across processes.
+
+A Python process only ever uses one core, so `ParallelSearcher` keeps a pool of worker processes, deals
+the root moves out between them and has each worker run the ordinary iterative deepening search
+(`Searcher.search`) over its share. The moves are dealt best-looking first and round robin, so every
+worker gets some of the promising ones. A worker's best score is exact for its share, so the best of
+the workers' results at a depth they all finished is the best move at that depth. Each worker keeps its
+own transposition table from one search to the next.
+
+Workers are sent the position as a 32-byte `codec` record and the moves as ints, never a pickled `Board`.
+
+Classes:
+- ParallelSearcher(workers, table_size, tablebases): The worker pool. search() takes the same limits as
+    `search`. With a tablebase directory, every worker opens the tables and scores endgames from them.
+
+Functions:
+- parallel_search(board, time_ms, depth, nodes, workers): One search with a temporary pool.
+- split_root_moves(position, shares): Deals the root moves out into `shares` lists.
+- benchmark(max_workers, depth): Time, nodes/second and speedup over a few positions for 1..N workers.
+- main(args): The `python main.py parallel-bench` command line.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from .position import Position
+from .bitboard import legal_moves
+from .evaluation import evaluate
+from .engine import Searcher, TranspositionTable, SearchResult
+from .codec import encode, decode
+
+#Positions timed by the benchmark: the start, a sharp middlegame and a quieter one
+BENCHMARK_POSITIONS = [
+    'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1',
+    'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+    'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10',
+]
+
+#The searcher of a worker process, created by _start_worker
+_searcher = None
+
+def _start_worker(table_size,tablebases = None):
+    #tablebases is a directory of endgame tables, or None
+    global _searcher
+    if tablebases:
+        from .tablebase import Tablebases
+        tablebases = Tablebases(tablebases)
+    _searcher = Searcher(TranspositionTable(table_size),tablebases = tablebases)
+
+def _ready(_):
+    #Lets the pool be started up front, so process start-up isn't counted in the first search
+    return os.getpid()
+
+def _search_share(record,moves,time_ms,depth,nodes,repetitions):
+    #Runs in a worker. Returns (move, score, pv) for every depth completed over the given root moves,
+    #then the nodes searched and the table's probes and hits
+    position = decode(record)
+    completed = []
+    result = _searcher.search(position,time_ms = time_ms,depth = depth,nodes = nodes,
+                              info = completed.append,moves = moves,repetitions = repetitions)
+    table = _searcher.table
+    return [(done.move,done.score,done.pv) for done in completed],result.nodes,table.probes,table.hits
+
+def split_root_moves(position,shares):
+    #Order the root moves by a one ply look, then deal them out like cards
+    scored = []
+    for move in legal_moves(position):
+        undo = position.make_move(move)
+        scored.append((-evaluate(position),move))
+        position.unmake_move(undo)
+    scored.sort(reverse = True)
+    split = [[] for _ in range(min(shares,len(scored)))]
+    for index, (_, move) in enumerate(scored):
+        split[index % len(split)].append(move)
+    return split
+
+class ParallelSearcher:
+    def __init__(self,workers = None,table_size = 1 << 18,tablebases = None):
+        #tablebases is the directory the workers open their Tablebases from, or None
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = ProcessPoolExecutor(self.workers,initializer = _start_worker,
+                                        initargs = (table_size,tablebases))
+    def __enter__(self):
+        return self
+    def __exit__(self,*exc_info):
+        self.close()
+    def close(self):
+        self.pool.shutdown()
+    def start(self):
+        #Start every worker process now instead of on the first search
+        list(self.pool.map(_ready,range(self.workers)))
+    def search(self,board,time_ms = None,depth = None,nodes = None,info = None):
+        #Search a Board or Position. nodes is shared out evenly between the workers, and info is called
+        #with a SearchResult for every depth all of them completed once the search is over
+        if isinstance(board,Position):
+            position, repetitions = board, None
+        else:
+            #Only the counts since the last irreversible move are sent along
+            position, repetitions = board.position, board.repetitions.copy()
+        start = time.perf_counter()
+        shares = split_root_moves(position.copy(),self.workers)
+        if not shares:
+            return SearchResult(None,0,0,[],0,time.perf_counter() - start,0,0.0)
+        record = encode(position)
+        share_nodes = nodes // len(shares) if nodes else None
+        futures = [self.pool.submit(_search_share,record,share,time_ms,depth,share_nodes,repetitions)
+                   for share in shares]
+        outcomes = [future.result() for future in futures]
+        seconds = time.perf_counter() - start
+        total_nodes = sum(outcome[1] for outcome in outcomes)
+        probes = sum(outcome[2] for outcome in outcomes)
+        hits = sum(outcome[3] for outcome in outcomes)
+        nps = int(total_nodes / seconds) if seconds > 0 else 0
+        hit_rate = hits / probes if probes else 0.0
+        #Every worker finishes depth 1, and only depths they all finished can be compared
+        reached = min(len(outcome[0]) for outcome in outcomes)
+        result = None
+        for index in range(reached):
+            move, score, pv = max((outcome[0][index] for outcome in outcomes),key = lambda done: done[1])
+            result = SearchResult(move,score,index + 1,pv,total_nodes,seconds,nps,hit_rate)
+            if info:
+                info(result)
+        return result
+
+def parallel_search(board,time_ms = None,depth = None,nodes = None,workers = None):
+    with ParallelSearcher(workers) as searcher:
+        return searcher.search(board,time_ms = time_ms,depth = depth,nodes = nodes)
+
+def benchmark(max_workers = None,depth = 5,positions = BENCHMARK_POSITIONS,report = print):
+    #Search every position to a fixed depth with 1, 2, 4, ... and max_workers workers.
+    #Returns (workers, seconds, nodes) for each run
+    max_workers = max_workers or os.cpu_count() or 1
+    counts = []
+    workers = 1
+    while workers < max_workers:
+        counts.append(workers)
+        workers *= 2
+    counts.append(max_workers)
+    runs = []
+    for workers in counts:
+        with ParallelSearcher(workers) as searcher:
+            searcher.start()
+            start = time.perf_counter()
+            nodes = sum(searcher.search(Position.from_fen(fen),depth = depth).nodes for fen in positions)
+            seconds = time.perf_counter() - start
+        runs.append((workers,seconds,nodes))
+        report(f'{workers:>3} workers: {seconds:7.2f}s {nodes:>10} nodes {nodes / max(seconds,1e-9):>9.0f} nps '
+               f'speedup {runs[0][1] / max(seconds,1e-9):5.2f}x')
+    return runs
+
+def main(args = None):
+    import argparse
+    parser = argparse.ArgumentParser(prog = 'main.py parallel-bench',
+                                     description = 'Time the parallel search with 1 up to N workers.')
+    parser.add_argument('--workers', type = int, default = os.cpu_count(), help = 'Most workers to try (default: all cores)')
+    parser.add_argument('--depth', type = int, default = 5, help = 'Depth to search each position to')
+    options = parser.parse_args(args)
+    print(f'{os.cpu_count()} cores, depth {options.depth}, {len(BENCHMARK_POSITIONS)} positions')
+    benchmark(options.workers,options.depth)
+    return 0
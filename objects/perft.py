@@ -0,0 +1,163 @@
+"""
+This module contains perft, the standard correctness and speed check for a chess move generator.
+
+perft(board, depth) plays out every legal move sequence of `depth` plies from the board's position and
+counts the positions reached. Those counts are known exactly for a set of reference positions, so any
+change to `bitboard.legal_moves`, `Position.make_move`/`unmake_move` or the Board's incremental move maps
+that breaks a rule shows up as a wrong number, and the nodes/second figure tracks how fast move
+generation is.
+
+Functions:
+- perft(board, depth): Counts the leaf nodes `depth` plies deep. Given a `Position` instead of a `Board`,
+    it counts with the bare position and move generator, skipping the squares and move maps.
+- divide(board, depth): The perft count below each root move, for tracking down a wrong total.
+- run_suite(max_depth, max_nodes): Checks every reference position and reports nodes/second.
+- main(args): The `python main.py perft` command line.
+"""
+import time
+from .board import Board
+from .position import Position, START_FEN, SQUARE_NAMES, coords_to_index, move_to_uci
+from .bitboard import legal_moves
+
+#Reference positions with their known node counts by depth
+REFERENCE_POSITIONS = [
+    ('initial', START_FEN,
+     {1: 20, 2: 400, 3: 8902, 4: 197281, 5: 4865609}),
+    ('kiwipete', 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+     {1: 48, 2: 2039, 3: 97862, 4: 4085603}),
+    ('endgame en passant', '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+     {1: 14, 2: 191, 3: 2812, 4: 43238, 5: 674624}),
+    ('promotions and castling', 'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1',
+     {1: 6, 2: 264, 3: 9467, 4: 422333}),
+    ('promotions and castling mirrored', 'r2q1rk1/pP1p2pp/Q4n2/bbp1p3/Np6/1B3NBn/pPPP1PPP/R3K2R b KQ - 0 1',
+     {1: 6, 2: 264, 3: 9467, 4: 422333}),
+    ('underpromotion with check', 'rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8',
+     {1: 44, 2: 1486, 3: 62379, 4: 2103487}),
+    ('middlegame', 'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10',
+     {1: 46, 2: 2079, 3: 89890, 4: 3894594}),
+    ('illegal en passant into check', '3k4/3p4/8/K1P4r/8/8/8/8 b - - 0 1',
+     {6: 1134888}),
+    ('en passant capture gives check', '8/8/1k6/2b5/2pP4/8/5K2/8 b - d3 0 1',
+     {6: 1440467}),
+    ('short castling gives check', '5k2/8/8/8/8/8/8/4K2R w K - 0 1',
+     {6: 661072}),
+    ('long castling gives check', '3k4/8/8/8/8/8/8/R3K3 w Q - 0 1',
+     {6: 803711}),
+    ('castling rights', 'r3k2r/1b4bq/8/8/8/8/7B/R3K2R w KQkq - 0 1',
+     {4: 1274206}),
+    ('castling prevented', 'r3k2r/8/3Q4/8/8/5q2/8/R3K2R b KQkq - 0 1',
+     {4: 1720476}),
+    ('promote out of check', '2K2r2/4P3/8/8/8/8/8/3k4 w - - 0 1',
+     {6: 3821001}),
+    ('underpromote to check', '4k3/1P6/8/8/8/8/K7/8 w - - 0 1',
+     {6: 217342}),
+    ('self stalemate', 'K1k5/8/P7/8/8/8/8/8 w - - 0 1',
+     {6: 2217}),
+    ('stalemate and checkmate', '8/k1P5/8/1K6/8/8/8/8 w - - 0 1',
+     {7: 567584}),
+]
+
+def move_name(move):
+    #Long algebraic name of a Board move, e.g. e7e8n
+    name = SQUARE_NAMES[coords_to_index(move[0])] + SQUARE_NAMES[coords_to_index(move[1])]
+    return name + move[2] if len(move) > 2 else name
+
+def perft(board, depth):
+    if isinstance(board, Position):
+        return position_perft(board, depth)
+    if depth == 0:
+        return 1
+    moves = board.legal_moves()
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        token = board.make_move(move)
+        nodes += perft(board, depth - 1)
+        board.unmake_move(token)
+    return nodes
+
+def position_perft(position, depth):
+    moves = legal_moves(position)
+    if depth <= 1:
+        return len(moves) if depth == 1 else 1
+    nodes = 0
+    make_move = position.make_move
+    unmake_move = position.unmake_move
+    for move in moves:
+        undo = make_move(move)
+        nodes += position_perft(position, depth - 1)
+        unmake_move(undo)
+    return nodes
+
+def divide(board, depth):
+    counts = {}
+    if isinstance(board, Position):
+        for move in legal_moves(board):
+            undo = board.make_move(move)
+            counts[move_to_uci(move)] = position_perft(board, depth - 1)
+            board.unmake_move(undo)
+        return counts
+    for move in board.legal_moves():
+        token = board.make_move(move)
+        counts[move_name(move)] = perft(board, depth - 1)
+        board.unmake_move(token)
+    return counts
+
+def timed_perft(board, depth):
+    #Returns (nodes, seconds)
+    start = time.perf_counter()
+    nodes = perft(board, depth)
+    return nodes, time.perf_counter() - start
+
+def run_suite(max_depth = 3, max_nodes = 200000, report = print, use_board = True):
+    #Check each reference position at every known depth up to the limits. Returns the failures
+    failures = []
+    total_nodes = 0
+    total_time = 0.0
+    for name, fen, counts in REFERENCE_POSITIONS:
+        for depth in sorted(counts):
+            expected = counts[depth]
+            if depth > max_depth or expected > max_nodes:
+                continue
+            position = Position.from_fen(fen)
+            nodes, seconds = timed_perft(Board.from_position(position) if use_board else position, depth)
+            total_nodes += nodes
+            total_time += seconds
+            status = 'ok' if nodes == expected else f'FAIL (expected {expected})'
+            report(f'{name:<34} depth {depth}: {nodes:>10} nodes {nodes / max(seconds, 1e-9):>10.0f} nps  {status}')
+            if nodes != expected:
+                failures.append((name, depth, nodes, expected))
+    report(f'{total_nodes} nodes in {total_time:.2f}s ({total_nodes / max(total_time, 1e-9):.0f} nps), '
+           f'{len(failures)} failures')
+    return failures
+
+def main(args = None):
+    import argparse
+    parser = argparse.ArgumentParser(prog = 'main.py perft', description = 'Count move generation leaf nodes.')
+    parser.add_argument('depth', type = int, nargs = '?', default = 3)
+    parser.add_argument('--fen', default = START_FEN, help = 'Position to search from (default: the initial position)')
+    parser.add_argument('--divide', action = 'store_true', help = 'Print the node count below each root move')
+    parser.add_argument('--suite', action = 'store_true', help = 'Check the reference positions instead')
+    parser.add_argument('--max-nodes', type = int, default = 200000,
+                        help = 'With --suite, skip reference counts larger than this')
+    parser.add_argument('--position', action = 'store_true',
+                        help = 'Count with the bare Position generator instead of a full Board')
+    options = parser.parse_args(args)
+    if options.suite:
+        return 1 if run_suite(options.depth, options.max_nodes, use_board = not options.position) else 0
+    board = Position.from_fen(options.fen)
+    if not options.position:
+        board = Board.from_position(board)
+    start = time.perf_counter()
+    if options.divide:
+        counts = divide(board, options.depth)
+        for name in sorted(counts):
+            print(f'{name}: {counts[name]}')
+        nodes = sum(counts.values())
+    else:
+        nodes = perft(board, options.depth)
+    seconds = time.perf_counter() - start
+    print(f'Nodes: {nodes}')
+    print(f'Time: {seconds:.3f}s ({nodes / max(seconds, 1e-9):.0f} nps)')
+    return 0
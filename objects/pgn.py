@@ -0,0 +1,268 @@
+"""
+This module contains a streaming reader for PGN game archives and a parallel replayer.
+
+read_games(source) walks a PGN file game by game. The file is read through a large buffer one line at a
+time, so memory use depends on the longest game rather than the size of the archive. Each game's moves
+are checked and resolved against the legal move generator (`bitboard.legal_moves`, the one `Board`
+uses), so a game that breaks a rule is reported at the move where it happens.
+
+Games come out as `PGNGame(headers, moves, final_position)`: the tag pairs as a dict, the moves as packed
+ints (see `encode_move`) and the `Position` after the last move. Games with a FEN tag start from that
+position. Comments, variations, NAGs and move numbers are skipped.
+
+Functions:
+- read_games(source, on_error): Yields a `PGNGame` per game in a path or open file.
+- replay_many(source, workers, batch_size, on_error): The same games, replayed on a process pool.
+- parse_san(position, san) / move_to_san(position, move): Convert between SAN and packed moves.
+- write_game(moves, start, headers): PGN text for a list of packed moves.
+- main(args): The `python main.py pgn` command line.
+"""
+import os
+import re
+import textwrap
+import time
+from collections import namedtuple
+from .position import (Position, PAWN, KING, QUEEN, WHITE, BLACK, TYPE_MASK, EP, TURN, START_FEN, PIECE_TYPES,
+                       TYPE_LETTERS, SQUARE_NAMES, SQUARE_INDEXES)
+from .bitboard import legal_moves, is_attacked
+from .codec import encode, decode
+
+PGNGame = namedtuple('PGNGame', ['headers', 'moves', 'final_position'])
+
+class PGNError(ValueError):
+    #A game that can't be read or breaks a rule. game is its number in the file, counting from 1
+    def __init__(self, message, game = None, headers = None):
+        super().__init__(f"Game {game}: {message}" if game else message)
+        self.game = game
+        self.headers = headers or {}
+
+#Size of the read buffer
+BUFFER_SIZE = 1 << 20
+
+_TAG = re.compile(r'\[\s*(\w+)\s+"((?:[^"\\]|\\.)*)"\s*\]')
+_COMMENT = re.compile(r'\{[^}]*\}|;[^\n]*')
+_TOKEN = re.compile(r'1-0|0-1|1/2-1/2|\*|\(|\)|\$\d+|\d+\.+|[^\s()]+')
+_RESULTS = ('1-0', '0-1', '1/2-1/2', '*')
+_SAN = re.compile(r'([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([NBRQnbrq]))?$')
+
+def _lines(source):
+    #Lines of a path or an open text or binary file
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, encoding = 'utf-8', errors = 'replace', buffering = BUFFER_SIZE) as file:
+            yield from file
+        return
+    for line in source:
+        yield line.decode('utf-8', 'replace') if isinstance(line, bytes) else line
+
+def iter_game_texts(source):
+    #Split the archive into the raw text of each game: a game ends where the next one's tags begin
+    lines = []
+    in_moves = False
+    for line in _lines(source):
+        stripped = line.lstrip()
+        if stripped.startswith('['):
+            if in_moves:
+                yield ''.join(lines)
+                lines = []
+                in_moves = False
+        elif stripped and not stripped.startswith('%'):
+            in_moves = True
+        lines.append(line)
+    if in_moves or any(line.strip() for line in lines):
+        yield ''.join(lines)
+
+def parse_san(position, san, moves = None):
+    #The packed move for a SAN string like Nbd7, exd6, e8=Q or O-O-O. Raises ValueError if no legal
+    #move (or more than one) matches
+    if moves is None:
+        moves = legal_moves(position)
+    data = position.data
+    token = san.rstrip('+#!?')
+    if token in ('O-O', '0-0', 'O-O-O', '0-0-0'):
+        king_sq = position.bb[(BLACK if data[TURN] else WHITE) | KING].bit_length() - 1
+        to_sq = king_sq + (2 if len(token) == 3 else -2)
+        candidates = [move for move in moves if move == king_sq | to_sq << 6]
+    else:
+        match = _SAN.match(token)
+        if not match:
+            raise ValueError(f"Bad SAN move {san!r}")
+        piece, file, rank, to_name, promotion = match.groups()
+        kind = PIECE_TYPES[piece.lower()] if piece else PAWN
+        to_sq = SQUARE_INDEXES[to_name]
+        promotion = PIECE_TYPES[promotion.lower()] if promotion else 0
+        if kind == PAWN and not promotion and to_sq >> 3 in (0, 7):
+            promotion = QUEEN #Some writers leave out the piece for queen promotions
+        file = ord(file) - ord('a') if file else None
+        rank = int(rank) - 1 if rank else None
+        candidates = [move for move in moves
+                      if (move >> 6) & 63 == to_sq and move >> 12 == promotion
+                      and data[move & 63] & TYPE_MASK == kind
+                      and (file is None or move & 7 == file) and (rank is None or (move & 63) >> 3 == rank)]
+    if len(candidates) != 1:
+        raise ValueError(f"{'Ambiguous' if candidates else 'Illegal'} move {san!r}")
+    return candidates[0]
+
+def move_to_san(position, move, moves = None):
+    #The SAN string for a legal packed move, with + or # when it gives check or mate
+    if moves is None:
+        moves = legal_moves(position)
+    data = position.data
+    from_sq = move & 63
+    to_sq = (move >> 6) & 63
+    kind = data[from_sq] & TYPE_MASK
+    if kind == KING and abs(to_sq - from_sq) == 2:
+        san = 'O-O' if to_sq > from_sq else 'O-O-O'
+    else:
+        capture = data[to_sq] or (kind == PAWN and to_sq == data[EP])
+        if kind == PAWN:
+            san = (SQUARE_NAMES[from_sq][0] + 'x' if capture else '') + SQUARE_NAMES[to_sq]
+        else:
+            #Name the file, else the rank, else both, when another piece of the kind can go there too
+            others = [other & 63 for other in moves if (other >> 6) & 63 == to_sq and other & 63 != from_sq
+                      and data[other & 63] & TYPE_MASK == kind]
+            if not others:
+                origin = ''
+            elif all(other & 7 != from_sq & 7 for other in others):
+                origin = SQUARE_NAMES[from_sq][0]
+            elif all(other >> 3 != from_sq >> 3 for other in others):
+                origin = SQUARE_NAMES[from_sq][1]
+            else:
+                origin = SQUARE_NAMES[from_sq]
+            san = TYPE_LETTERS[kind].upper() + origin + ('x' if capture else '') + SQUARE_NAMES[to_sq]
+        if move >> 12:
+            san += '=' + TYPE_LETTERS[move >> 12].upper()
+    undo = position.make_move(move)
+    us = BLACK if data[TURN] else WHITE
+    if is_attacked(position, position.bb[us | KING].bit_length() - 1, us ^ BLACK):
+        san += '#' if not legal_moves(position) else '+'
+    position.unmake_move(undo)
+    return san
+
+def parse_game(text, number = None):
+    #Read and replay the text of one game. Raises PGNError on bad tags or an illegal move
+    headers = dict((name, value.replace('\\"', '"').replace('\\\\', '\\')) for name, value in _TAG.findall(text))
+    movetext = _COMMENT.sub(' ', _TAG.sub(' ', text))
+    try:
+        position = Position.from_fen(headers['FEN']) if 'FEN' in headers else Position.from_fen(START_FEN)
+    except ValueError as error:
+        raise PGNError(f"bad FEN tag: {error}", number, headers) from None
+    moves = []
+    depth = 0 #Inside how many variations
+    for token in _TOKEN.findall(movetext):
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth -= 1
+        elif depth or token[0] == '$' or token[0].isdigit() and token.endswith('.') or token in _RESULTS:
+            continue
+        else:
+            try:
+                move = parse_san(position, token)
+            except ValueError as error:
+                raise PGNError(f"{error} at ply {len(moves) + 1}", number, headers) from None
+            position.make_move(move)
+            moves.append(move)
+    return PGNGame(headers, moves, position)
+
+#The tags every PGN game has, with their values when unknown
+SEVEN_TAG_ROSTER = (('Event', '?'), ('Site', '?'), ('Date', '????.??.??'), ('Round', '?'),
+                    ('White', '?'), ('Black', '?'), ('Result', '*'))
+
+def write_game(moves, start = None, headers = None):
+    #PGN text for moves played from start (default: the initial position). headers adds or overrides tags
+    position = Position.from_fen(START_FEN) if start is None else start.copy()
+    tags = dict(SEVEN_TAG_ROSTER)
+    tags.update(headers or {})
+    fen = position.to_fen()
+    if fen != START_FEN:
+        tags['SetUp'] = '1'
+        tags['FEN'] = fen
+    lines = ['[{} "{}"]'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+             for name, value in tags.items()]
+    tokens = []
+    for index, move in enumerate(moves):
+        if not position.data[TURN]:
+            tokens.append(f'{position.fullmove}.')
+        elif not index:
+            tokens.append(f'{position.fullmove}...')
+        tokens.append(move_to_san(position, move))
+        position.make_move(move)
+    tokens.append(tags['Result'])
+    movetext = textwrap.wrap(' '.join(tokens), 79, break_long_words = False, break_on_hyphens = False)
+    return '\n'.join(lines) + '\n\n' + '\n'.join(movetext) + '\n'
+
+def read_games(source, on_error = None):
+    #Yields a PGNGame for every game in source (a path or open file). A game that can't be replayed raises
+    #PGNError, unless on_error is given: then it is called with the error and the game is left out
+    for number, text in enumerate(iter_game_texts(source), 1):
+        try:
+            yield parse_game(text, number)
+        except PGNError as error:
+            if on_error is None:
+                raise
+            on_error(error)
+
+def _replay_batch(first_number, texts):
+    #Runs in a worker. Returns (headers, moves, encoded final position) or a PGNError per game
+    replayed = []
+    for number, text in enumerate(texts, first_number):
+        try:
+            game = parse_game(text, number)
+            replayed.append((game.headers, game.moves, encode(game.final_position)))
+        except PGNError as error:
+            replayed.append(error)
+    return replayed
+
+def replay_many(source, workers = None, batch_size = 64, on_error = None):
+    #Like read_games, but the games are replayed on a pool of processes, batch_size games at a time.
+    #Games still come out in file order, and only a few batches per worker are read ahead
+    from concurrent.futures import ProcessPoolExecutor
+    workers = workers or os.cpu_count() or 1
+    texts = iter_game_texts(source)
+    number = 1
+    with ProcessPoolExecutor(workers) as pool:
+        pending = []
+        while True:
+            while len(pending) < workers * 2:
+                batch = [text for _, text in zip(range(batch_size), texts)]
+                if not batch:
+                    break
+                pending.append(pool.submit(_replay_batch, number, batch))
+                number += len(batch)
+            if not pending:
+                return
+            for replayed in pending.pop(0).result():
+                if isinstance(replayed, PGNError):
+                    if on_error is None:
+                        raise replayed
+                    on_error(replayed)
+                    continue
+                headers, moves, record = replayed
+                yield PGNGame(headers, moves, decode(record))
+
+def main(args = None):
+    import argparse
+    parser = argparse.ArgumentParser(prog = 'main.py pgn', description = 'Replay and check the games of a PGN file.')
+    parser.add_argument('file')
+    parser.add_argument('--workers', type = int, default = 1, help = 'Replay on this many processes')
+    parser.add_argument('--print', action = 'store_true', help = 'Print each game\'s result and final FEN')
+    options = parser.parse_args(args)
+    errors = []
+    def report_error(error):
+        errors.append(error)
+        print(error)
+    start = time.perf_counter()
+    if options.workers > 1:
+        games = replay_many(options.file, options.workers, on_error = report_error)
+    else:
+        games = read_games(options.file, on_error = report_error)
+    count = plies = 0
+    for game in games:
+        count += 1
+        plies += len(game.moves)
+        if options.print:
+            print(f"{game.headers.get('Result', '*')} {game.final_position.to_fen()}")
+    seconds = time.perf_counter() - start
+    print(f'{count} games, {plies} plies, {len(errors)} errors in {seconds:.2f}s '
+          f'({count / max(seconds, 1e-9):.0f} games/s, {plies / max(seconds, 1e-9):.0f} plies/s)')
+    return 1 if errors else 0
@@ -0,0 +1,461 @@
+"""
+This module contains the `Position` class, a compact array-backed representation of a chess position.
+
+Where `Board` builds a graph of 64 `Square` objects and 64 `Piece` objects, a `Position` is a single
+`bytearray` holding the 64 squares followed by the side to move, castling rights, en passant square
+and move clocks. Copying a position is one slice of that array, which makes it cheap to store,
+send between processes and use as scratch space when testing moves.
+
+Alongside the array, `Position.bb` keeps a 64-bit occupancy mask per piece code (indexed by the
+code itself) plus one per color at `bb[WHITE]` and `bb[BLACK]`. The masks are updated with a few
+XORs in `make_move`/`unmake_move` and feed the generator in `bitboard.py`. `Position.key` is the
+64-bit Zobrist key of the position (see `zobrist.py`), kept current the same way.
+
+Squares are indexed 0-63 as `row * 8 + col`, using the same (row, col) coordinates as `Board`,
+so a1 is 0, h1 is 7 and h8 is 63.
+
+Piece codes:
+- The low three bits hold the piece type (`PAWN` ... `KING`).
+- The `BLACK` bit (8) is set for black pieces. `EMPTY` (0) marks an empty square.
+
+Layout of `Position.data`:
+- 0-63: piece codes for each square.
+- `TURN`: 0 if white is to move, 1 if black is.
+- `CASTLING`: bitmask of `WHITE_KINGSIDE`, `WHITE_QUEENSIDE`, `BLACK_KINGSIDE`, `BLACK_QUEENSIDE`.
+- `EP`: the en passant target square, or `NO_SQUARE`.
+- `HALFMOVE`: plies since the last capture or pawn move.
+- `FULLMOVE`: the full move number, stored little-endian over two bytes.
+"""
+from .zobrist import PIECE_KEYS, TURN_KEY, CASTLING_KEYS, EP_KEYS, compute_key
+
+EMPTY = 0
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = 1, 2, 3, 4, 5, 6
+WHITE, BLACK = 0, 8
+TYPE_MASK = 7
+
+#Offsets of the game state stored after the squares
+TURN = 64
+CASTLING = 65
+EP = 66
+HALFMOVE = 67
+FULLMOVE = 68
+SIZE = 70
+
+NO_SQUARE = 64
+
+WHITE_KINGSIDE = 1
+WHITE_QUEENSIDE = 2
+BLACK_KINGSIDE = 4
+BLACK_QUEENSIDE = 8
+ALL_CASTLING = 15
+
+#Translate between Board's 'wr' style strings and piece codes
+PIECE_CODES = {'': EMPTY}
+PIECE_NAMES = {EMPTY: ''}
+for _color, _color_bit in (('w', WHITE), ('b', BLACK)):
+    for _letter, _piece_type in zip('pnbrqk', (PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING)):
+        PIECE_CODES[_color + _letter] = _color_bit | _piece_type
+        PIECE_NAMES[_color_bit | _piece_type] = _color + _letter
+
+#FEN letters for each piece code, uppercase for white
+FEN_CODES = {}
+for _code, _name in PIECE_NAMES.items():
+    if _code:
+        FEN_CODES[_name[1].upper() if _name[0] == 'w' else _name[1]] = _code
+FEN_LETTERS = {code: letter for letter, code in FEN_CODES.items()}
+#Translation table from piece codes to FEN letters, '1' for an empty square
+FEN_TABLE = bytes(ord(FEN_LETTERS.get(code, '1')) for code in range(256))
+#Translation tables for parsing: digits to runs of '1', then letters to piece codes (BAD_FEN_LETTER if unknown)
+FEN_EXPAND = {ord(str(run)): '1' * run for run in range(1, 9)}
+BAD_FEN_LETTER = 255
+FEN_PARSE_TABLE = bytes(FEN_CODES.get(chr(value), EMPTY if value == ord('1') else BAD_FEN_LETTER)
+                        for value in range(256))
+FEN_CASTLING = (('K', WHITE_KINGSIDE), ('Q', WHITE_QUEENSIDE), ('k', BLACK_KINGSIDE), ('q', BLACK_QUEENSIDE))
+
+#Algebraic names of the squares, a1 through h8
+SQUARE_NAMES = [f'{"abcdefgh"[index & 7]}{(index >> 3) + 1}' for index in range(64)]
+SQUARE_INDEXES = {name: index for index, name in enumerate(SQUARE_NAMES)}
+
+COLOR_BITS = {'w': WHITE, 'b': BLACK}
+PIECE_TYPES = {'p': PAWN, 'n': KNIGHT, 'b': BISHOP, 'r': ROOK, 'q': QUEEN, 'k': KING}
+TYPE_LETTERS = {piece_type: letter for letter, piece_type in PIECE_TYPES.items()}
+
+#Castling rights that survive a move from or to each square
+CASTLING_MASKS = [ALL_CASTLING] * 64
+CASTLING_MASKS[4] = ALL_CASTLING & ~(WHITE_KINGSIDE | WHITE_QUEENSIDE)
+CASTLING_MASKS[7] = ALL_CASTLING & ~WHITE_KINGSIDE
+CASTLING_MASKS[0] = ALL_CASTLING & ~WHITE_QUEENSIDE
+CASTLING_MASKS[60] = ALL_CASTLING & ~(BLACK_KINGSIDE | BLACK_QUEENSIDE)
+CASTLING_MASKS[63] = ALL_CASTLING & ~BLACK_KINGSIDE
+CASTLING_MASKS[56] = ALL_CASTLING & ~BLACK_QUEENSIDE
+
+#Where the rook hops from and to when castling, keyed by the king's destination
+CASTLING_ROOKS = {6: (7, 5), 2: (0, 3), 62: (63, 61), 58: (56, 59)}
+
+def coords_to_index(coords):
+    row, col = coords
+    return row * 8 + col
+
+def index_to_coords(index):
+    return (index >> 3, index & 7)
+
+def piece_color(code):
+    #Returns 'w', 'b', or '' for an empty square
+    if code == EMPTY:
+        return ''
+    return 'b' if code & BLACK else 'w'
+
+def piece_type(code):
+    return code & TYPE_MASK
+
+#Moves are packed into ints: from square, to square and an optional promotion piece type
+def encode_move(from_sq, to_sq, promotion=EMPTY):
+    return from_sq | (to_sq << 6) | (promotion << 12)
+
+def move_from(move):
+    return move & 63
+
+def move_to(move):
+    return (move >> 6) & 63
+
+def move_promotion(move):
+    return move >> 12
+
+def move_to_uci(move):
+    promotion = move >> 12
+    return SQUARE_NAMES[move & 63] + SQUARE_NAMES[(move >> 6) & 63] + (TYPE_LETTERS[promotion] if promotion else '')
+
+def masks_from_squares(squares):
+    #Build the piece and color occupancy masks from the 64 square codes
+    bb = [0] * 16
+    for index in range(64):
+        code = squares[index]
+        if code:
+            bit = 1 << index
+            bb[code] |= bit
+            bb[code & BLACK] |= bit
+    return bb
+
+def infer_castling(squares):
+    #Grant a castling right whenever the king and rook still stand on their original squares
+    rights = 0
+    if squares[4] == WHITE | KING:
+        if squares[7] == WHITE | ROOK:
+            rights |= WHITE_KINGSIDE
+        if squares[0] == WHITE | ROOK:
+            rights |= WHITE_QUEENSIDE
+    if squares[60] == BLACK | KING:
+        if squares[63] == BLACK | ROOK:
+            rights |= BLACK_KINGSIDE
+        if squares[56] == BLACK | ROOK:
+            rights |= BLACK_QUEENSIDE
+    return rights
+
+class Position:
+    __slots__ = ('data', 'bb', 'key')
+
+    def __init__(self, data=None, bb=None, key=None):
+        if data is None:
+            data = bytearray(SIZE)
+            data[EP] = NO_SQUARE
+            data[FULLMOVE] = 1
+        elif len(data) != SIZE:
+            raise ValueError(f"Position data must be {SIZE} bytes")
+        self.data = data
+        self.bb = masks_from_squares(data) if bb is None else bb
+        self.key = self.compute_key() if key is None else key
+
+    def compute_key(self):
+        data = self.data
+        return compute_key(data, data[TURN], data[CASTLING], data[EP])
+
+    @classmethod
+    def from_layout(cls, layout=None, turn='w', castling=None):
+        #Build a position from the nested 8 x 8 list of strings Board accepts
+        if layout is None:
+            layout = START_LAYOUT
+        position = cls()
+        data = position.data
+        for i in range(8):
+            for j in range(8):
+                code = layout[i][j]
+                if code not in PIECE_CODES:
+                    raise ValueError(f"Unknown piece code {code!r}")
+                data[i * 8 + j] = PIECE_CODES[code]
+        position.bb = masks_from_squares(data)
+        data[TURN] = 0 if turn == 'w' else 1
+        data[CASTLING] = infer_castling(data) if castling is None else castling
+        position.key = position.compute_key()
+        return position
+
+    @classmethod
+    def from_fen(cls, fen):
+        fields = fen.split()
+        if len(fields) < 4:
+            raise ValueError(f"FEN needs at least 4 fields: {fen!r}")
+        placement, turn, castling, ep = fields[:4]
+        rows = placement.split('/')
+        if len(rows) != 8:
+            raise ValueError(f"FEN placement needs 8 rows: {placement!r}")
+        #Spell out the empty squares so every row is 8 letters, then translate the letters to codes
+        expanded = [row_str.translate(FEN_EXPAND) for row_str in rows]
+        for row_str, letters in zip(rows, expanded):
+            if len(letters) != 8:
+                raise ValueError(f"FEN row {row_str!r} doesn't cover 8 squares")
+        #FEN lists the 8th rank first
+        squares = ''.join(reversed(expanded)).encode('latin-1', 'replace').translate(FEN_PARSE_TABLE)
+        if BAD_FEN_LETTER in squares:
+            bad = 7 - squares.index(BAD_FEN_LETTER) // 8
+            raise ValueError(f"Bad FEN row {rows[bad]!r}")
+        #Check, checkmate and move generation all look for the side to move's one king
+        if squares.count(WHITE | KING) != 1 or squares.count(BLACK | KING) != 1:
+            raise ValueError(f"FEN must have exactly one king of each color: {placement!r}")
+        data = bytearray(SIZE)
+        data[:64] = squares
+        if turn not in ('w', 'b'):
+            raise ValueError(f"Side to move must be 'w' or 'b', not {turn!r}")
+        data[TURN] = 0 if turn == 'w' else 1
+        rights = 0
+        if castling != '-':
+            letters = dict(FEN_CASTLING)
+            for letter in castling:
+                if letter not in letters:
+                    raise ValueError(f"Bad castling field {castling!r}")
+                rights |= letters[letter]
+        data[CASTLING] = rights
+        if ep == '-':
+            data[EP] = NO_SQUARE
+        elif ep in SQUARE_INDEXES:
+            data[EP] = SQUARE_INDEXES[ep]
+        else:
+            raise ValueError(f"Bad en passant square {ep!r}")
+        data[HALFMOVE] = min(int(fields[4]), 255) if len(fields) > 4 else 0
+        fullmove = min(int(fields[5]), 0xFFFF) if len(fields) > 5 else 1
+        data[FULLMOVE] = fullmove & 0xFF
+        data[FULLMOVE + 1] = fullmove >> 8
+        return cls(data)
+
+    def to_fen(self):
+        data = self.data
+        #One letter per square with '1' for empty ones, 8th rank first, then merge the runs of '1's
+        letters = data[:64].translate(FEN_TABLE)
+        placement = b'/'.join(letters[row * 8:row * 8 + 8] for row in range(7, -1, -1))
+        for run in range(8, 1, -1):
+            placement = placement.replace(b'1' * run, str(run).encode())
+        castling = ''.join(letter for letter, right in FEN_CASTLING if data[CASTLING] & right) or '-'
+        ep = SQUARE_NAMES[data[EP]] if data[EP] != NO_SQUARE else '-'
+        return f"{placement.decode()} {'b' if data[TURN] else 'w'} {castling} {ep} {data[HALFMOVE]} {self.fullmove}"
+
+    def to_layout(self):
+        data = self.data
+        return [[PIECE_NAMES[data[i * 8 + j]] for j in range(8)] for i in range(8)]
+
+    def copy(self):
+        return Position(self.data[:], self.bb[:], self.key)
+
+    def __eq__(self, other):
+        if not isinstance(other, Position):
+            return NotImplemented
+        return self.data == other.data
+
+    __hash__ = None
+
+    def __getitem__(self, index):
+        return self.data[index]
+
+    def __setitem__(self, index, code):
+        data = self.data
+        if index < 64:
+            bb = self.bb
+            bit = 1 << index
+            old = data[index]
+            if old:
+                bb[old] ^= bit
+                bb[old & BLACK] ^= bit
+            if code:
+                bb[code] ^= bit
+                bb[code & BLACK] ^= bit
+            self.key ^= PIECE_KEYS[old][index] ^ PIECE_KEYS[code][index]
+            data[index] = code
+        else:
+            data[index] = code
+            self.key = self.compute_key()
+
+    def make_move(self, move):
+        #Play a move in place and return what unmake_move needs to take it back
+        data = self.data
+        bb = self.bb
+        from_sq = move & 63
+        to_sq = (move >> 6) & 63
+        piece = data[from_sq]
+        captured = data[to_sq]
+        ep = data[EP]
+        castling = data[CASTLING]
+        key = self.key
+        undo = (move, piece, captured, castling, ep, data[HALFMOVE], key)
+        color = piece & BLACK
+        kind = piece & TYPE_MASK
+        from_bit = 1 << from_sq
+        to_bit = 1 << to_sq
+        placed = piece
+        data[from_sq] = EMPTY
+        data[EP] = NO_SQUARE
+        if captured:
+            bb[captured] ^= to_bit
+            bb[captured & BLACK] ^= to_bit
+            key ^= PIECE_KEYS[captured][to_sq]
+        if ep != NO_SQUARE:
+            key ^= EP_KEYS[ep & 7]
+        if kind == PAWN:
+            data[HALFMOVE] = 0
+            if to_sq == ep and (from_sq ^ to_sq) & 7:
+                #En passant removes the pawn that just passed the target square
+                captured_sq = to_sq - 8 if color == WHITE else to_sq + 8
+                captured_bit = 1 << captured_sq
+                data[captured_sq] = EMPTY
+                bb[(color ^ BLACK) | PAWN] ^= captured_bit
+                bb[color ^ BLACK] ^= captured_bit
+                key ^= PIECE_KEYS[(color ^ BLACK) | PAWN][captured_sq]
+            elif to_sq - from_sq in (16, -16):
+                data[EP] = (from_sq + to_sq) >> 1
+                key ^= EP_KEYS[from_sq & 7]
+            elif to_sq >= 56 or to_sq < 8:
+                placed = color | (move >> 12 or QUEEN)
+        else:
+            if captured:
+                data[HALFMOVE] = 0
+            elif data[HALFMOVE] < 255:
+                data[HALFMOVE] += 1
+            if kind == KING and to_sq - from_sq in (2, -2) and from_sq in (4, 60):
+                rook_from, rook_to = CASTLING_ROOKS[to_sq]
+                rook_bits = (1 << rook_from) | (1 << rook_to)
+                data[rook_to] = data[rook_from]
+                data[rook_from] = EMPTY
+                bb[color | ROOK] ^= rook_bits
+                bb[color] ^= rook_bits
+                key ^= PIECE_KEYS[color | ROOK][rook_from] ^ PIECE_KEYS[color | ROOK][rook_to]
+        data[to_sq] = placed
+        bb[piece] ^= from_bit
+        bb[placed] ^= to_bit
+        bb[color] ^= from_bit | to_bit
+        new_castling = castling & CASTLING_MASKS[from_sq] & CASTLING_MASKS[to_sq]
+        data[CASTLING] = new_castling
+        self.key = (key ^ PIECE_KEYS[piece][from_sq] ^ PIECE_KEYS[placed][to_sq]
+                    ^ CASTLING_KEYS[castling] ^ CASTLING_KEYS[new_castling] ^ TURN_KEY)
+        if data[TURN]:
+            self.fullmove += 1
+        data[TURN] ^= 1
+        return undo
+
+    def unmake_move(self, undo):
+        move, piece, captured, castling, ep, halfmove, key = undo
+        data = self.data
+        bb = self.bb
+        from_sq = move & 63
+        to_sq = (move >> 6) & 63
+        from_bit = 1 << from_sq
+        to_bit = 1 << to_sq
+        color = piece & BLACK
+        placed = data[to_sq]
+        data[from_sq] = piece
+        data[to_sq] = captured
+        bb[piece] ^= from_bit
+        bb[placed] ^= to_bit
+        bb[color] ^= from_bit | to_bit
+        if captured:
+            bb[captured] ^= to_bit
+            bb[captured & BLACK] ^= to_bit
+        kind = piece & TYPE_MASK
+        if kind == PAWN:
+            if to_sq == ep and (from_sq ^ to_sq) & 7:
+                captured_sq = to_sq - 8 if color == WHITE else to_sq + 8
+                captured_bit = 1 << captured_sq
+                data[captured_sq] = (color ^ BLACK) | PAWN
+                bb[(color ^ BLACK) | PAWN] ^= captured_bit
+                bb[color ^ BLACK] ^= captured_bit
+        elif kind == KING and to_sq - from_sq in (2, -2) and from_sq in (4, 60):
+            rook_from, rook_to = CASTLING_ROOKS[to_sq]
+            rook_bits = (1 << rook_from) | (1 << rook_to)
+            data[rook_from] = data[rook_to]
+            data[rook_to] = EMPTY
+            bb[color | ROOK] ^= rook_bits
+            bb[color] ^= rook_bits
+        data[CASTLING] = castling
+        data[EP] = ep
+        data[HALFMOVE] = halfmove
+        self.key = key
+        data[TURN] ^= 1
+        if data[TURN]:
+            self.fullmove -= 1
+
+    def piece_at(self, coords):
+        return self.data[coords_to_index(coords)]
+
+    def king_square(self, color):
+        king = COLOR_BITS[color] | KING
+        index = self.data.find(king, 0, 64)
+        return None if index == -1 else index
+
+    @property
+    def turn(self):
+        return 'b' if self.data[TURN] else 'w'
+
+    @turn.setter
+    def turn(self, color):
+        side = 0 if color == 'w' else 1
+        if side != self.data[TURN]:
+            self.key ^= TURN_KEY
+        self.data[TURN] = side
+
+    @property
+    def castling(self):
+        return self.data[CASTLING]
+
+    @castling.setter
+    def castling(self, rights):
+        self.key ^= CASTLING_KEYS[self.data[CASTLING]] ^ CASTLING_KEYS[rights]
+        self.data[CASTLING] = rights
+
+    @property
+    def ep_square(self):
+        return self.data[EP]
+
+    @ep_square.setter
+    def ep_square(self, index):
+        old = self.data[EP]
+        if old != NO_SQUARE:
+            self.key ^= EP_KEYS[old & 7]
+        if index != NO_SQUARE:
+            self.key ^= EP_KEYS[index & 7]
+        self.data[EP] = index
+
+    @property
+    def halfmove(self):
+        return self.data[HALFMOVE]
+
+    @halfmove.setter
+    def halfmove(self, value):
+        self.data[HALFMOVE] = min(value, 255)
+
+    @property
+    def fullmove(self):
+        return self.data[FULLMOVE] | (self.data[FULLMOVE + 1] << 8)
+
+    @fullmove.setter
+    def fullmove(self, value):
+        value = min(value, 0xFFFF)
+        self.data[FULLMOVE] = value & 0xFF
+        self.data[FULLMOVE + 1] = value >> 8
+
+START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+START_LAYOUT = [
+    ['wr','wn','wb','wq','wk','wb','wn','wr'],
+    ['wp','wp','wp','wp','wp','wp','wp','wp'],
+    ['','','','','','','',''],
+    ['','','','','','','',''],
+    ['','','','','','','',''],
+    ['','','','','','','',''],
+    ['bp','bp','bp','bp','bp','bp','bp','bp'],
+    ['br','bn','bb','bq','bk','bb','bn','br']
+]
@@ -0,0 +1,339 @@
+"""
+This module contains an asyncio server that hosts many games at once over a TCP or Unix socket.
+
+The protocol is JSON lines: every request is one JSON object on its own line, and gets back one JSON
+object on its own line with the same "id". Requests on one connection are handled concurrently, so
+replies can come back in a different order than the requests went out. Any connection can address any
+game by its number.
+
+Requests ("game" is the number a "new" request returned):
+- {"op": "new", "fen": optional}: Starts a game.
+- {"op": "move", "game", "move": "e2e4"}: Plays a UCI move.
+- {"op": "engine", "game", "time_ms" / "depth" / "nodes"}: Lets the engine play the next move.
+- {"op": "status", "game"} / {"op": "legal", "game"} / {"op": "undo", "game"} / {"op": "pgn", "game"}
+- {"op": "close", "game"}: Forgets a game.
+- {"op": "watch", "game"}: After the reply, the connection is also sent the game's board as ANSI frames
+    (see `ansi.py`): a keyframe, then only the squares each move changes.
+- {"op": "stats"}: Server counters.
+Replies have "ok": true, the game's "fen" and "status", and "legal" (the legal moves) when the request
+had "legal": true. A failed request gets "ok": false and an "error" message instead.
+
+The games are headless `Game`s, so each costs a Position and its move history rather than a full
+`Board`. Everything but the engine is quick and runs on the event loop. Engine searches run on a pool of
+worker processes, sent the position as a 32-byte `codec` record, so a search never stalls the loop. With
+an opening book, engine moves are looked up in it first, on the loop, since a probe takes microseconds.
+With a tablebase directory, every worker opens the tables and its searches score endgames from them.
+
+Backpressure: a connection stops being read once `max_pending` of its requests are unanswered, so a
+client that sends faster than it reads ends up blocked by its own socket buffers. Replies wait for the
+socket to drain, and at most two engine searches per worker are queued at once. Every spectator of a
+game is sent the same frame bytes, rendered once per move; one that lets more than
+`SPECTATOR_BUFFER` bytes pile up unread is disconnected.
+
+Classes:
+- GameServer(workers, max_games, max_pending, book, tablebases): The games, the engine pool and the
+    connection handler.
+
+Functions:
+- serve(host, port, path, workers, max_games, book, tablebases): Runs a server until interrupted or sent
+    SIGTERM, then shuts down the engine pool.
+- main(args): The `python main.py serve` command line.
+"""
+import asyncio
+import json
+import os
+import signal
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from .game import Game
+from .engine import Searcher, TranspositionTable
+from .codec import encode, decode
+from .position import move_to_uci
+from .book import OpeningBook
+from .tablebase import Tablebases
+from .ansi import Broadcast
+
+#The searcher of an engine worker process, created by _start_worker
+_searcher = None
+
+def _start_worker(table_size, tablebases):
+    #tablebases is a directory of endgame tables, or None
+    global _searcher
+    _searcher = Searcher(TranspositionTable(table_size), tablebases = Tablebases(tablebases) if tablebases else None)
+
+def _engine_search(record, repetitions, time_ms, depth, nodes):
+    #Runs in a worker. Returns the best move in UCI notation, or None without legal moves
+    result = _searcher.search(decode(record), time_ms = time_ms, depth = depth, nodes = nodes,
+                              repetitions = repetitions)
+    return move_to_uci(result.move) if result.move is not None else None
+
+OPS = ('new', 'move', 'engine', 'status', 'legal', 'undo', 'pgn', 'close', 'stats', 'watch')
+#Unsent frame bytes a spectator may fall behind by before it is disconnected
+SPECTATOR_BUFFER = 1 << 16
+
+class RequestError(ValueError):
+    #A request that can't be carried out; its message goes back to the client
+    pass
+
+class GameServer:
+    def __init__(self, workers = None, max_games = 100000, max_pending = 64, table_size = 1 << 16, book = None,
+                 tablebases = None):
+        self.workers = workers or os.cpu_count() or 1
+        self.book = book #An OpeningBook, or None
+        self.tablebases = tablebases #The directory the engine workers open their Tablebases from, or None
+        self.max_games = max_games
+        self.max_pending = max_pending
+        self.table_size = table_size
+        self.games = {}
+        self.locks = {} #One lock per game, so requests for the same game run one at a time
+        self.broadcasts = {} #The Broadcast of every game with spectators
+        self.next_game = 1
+        self.pool = None
+        self.engine_slots = None
+        self.counters = {'connections': 0, 'requests': 0, 'errors': 0, 'engine_moves': 0, 'book_moves': 0,
+                         'games_started': 0}
+
+    async def start(self, host = '127.0.0.1', port = 0, path = None):
+        #Listen on a Unix socket when path is given, else on TCP. Returns the asyncio server
+        self._start_pool()
+        self.engine_slots = asyncio.Semaphore(self.workers * 2)
+        if path:
+            return await asyncio.start_unix_server(self.handle, path)
+        return await asyncio.start_server(self.handle, host, port)
+
+    def _start_pool(self):
+        self.pool = ProcessPoolExecutor(self.workers, initializer = _start_worker,
+                                        initargs = (self.table_size, self.tablebases))
+
+    def close(self):
+        if self.pool:
+            self.pool.shutdown()
+            self.pool = None
+
+    async def handle(self, reader, writer):
+        self.counters['connections'] += 1
+        pending = asyncio.Semaphore(self.max_pending)
+        write_lock = asyncio.Lock()
+        tasks = set()
+        watched = set() #The broadcasts this connection is a spectator of
+
+        async def answer(line):
+            try:
+                reply = await self.respond(line)
+                async with write_lock:
+                    writer.write(json.dumps(reply).encode() + b'\n')
+                    if reply.get('watching'):
+                        watched.add(self._watch(reply['game'], writer))
+                    await writer.drain()
+            except (ConnectionError, asyncio.CancelledError):
+                pass
+            finally:
+                pending.release()
+
+        try:
+            while True:
+                await pending.acquire() #Stop reading while too many requests are unanswered
+                line = await reader.readline()
+                if not line:
+                    pending.release()
+                    break
+                task = asyncio.ensure_future(answer(line))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.wait(tasks)
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            for task in tasks:
+                task.cancel()
+        finally:
+            for broadcast in watched:
+                broadcast.remove(writer)
+            writer.close()
+
+    async def respond(self, line):
+        #The reply to one request line
+        self.counters['requests'] += 1
+        request_id = None
+        try:
+            try:
+                request = json.loads(line)
+            except ValueError:
+                raise RequestError("Request isn't valid JSON") from None
+            if not isinstance(request, dict):
+                raise RequestError("Request must be a JSON object")
+            request_id = request.get('id')
+            reply = await self.dispatch(request)
+        except (RequestError, ValueError) as error:
+            self.counters['errors'] += 1
+            return {'id': request_id, 'ok': False, 'error': str(error)}
+        except Exception as error: #Anything unexpected still gets a reply, so the client isn't left waiting
+            self.counters['errors'] += 1
+            return {'id': request_id, 'ok': False, 'error': f'Internal error: {error!r}'}
+        reply['id'] = request_id
+        reply['ok'] = True
+        return reply
+
+    def _game(self, request):
+        number = request.get('game')
+        if not isinstance(number, int) or number not in self.games:
+            raise RequestError(f"No game {number!r}")
+        return number, self.games[number]
+
+    def _describe(self, number, game, request, **extra):
+        reply = {'game': number, 'fen': game.to_fen(), 'status': game.status()._asdict()}
+        if request.get('legal'):
+            reply['legal'] = game.legal_moves()
+        reply.update(extra)
+        return reply
+
+    def _watch(self, number, writer):
+        #Make writer a spectator of the game; it gets a keyframe straight away
+        broadcast = self.broadcasts.get(number)
+        if broadcast is None:
+            broadcast = self.broadcasts[number] = Broadcast()
+            broadcast.publish(self.games[number].position, self._caption(number, self.games[number]))
+        broadcast.add(writer)
+        return broadcast
+
+    def _caption(self, number, game):
+        status = game.status()
+        if status.result == '*':
+            return f"Game {number}, ply {game.ply}: {'White' if status.turn == 'w' else 'Black'} to move"
+        return f"Game {number}, ply {game.ply}: {status.result} by {status.reason or 'adjudication'}"
+
+    def _publish(self, number, game):
+        #Send the game's spectators a frame of its new position
+        broadcast = self.broadcasts.get(number)
+        if broadcast is None:
+            return
+        for writer in list(broadcast.spectators):
+            if writer.is_closing() or writer.transport.get_write_buffer_size() > SPECTATOR_BUFFER:
+                broadcast.remove(writer)
+                writer.close()
+        if not broadcast.spectators:
+            del self.broadcasts[number]
+            return
+        broadcast.publish(game.position, self._caption(number, game))
+
+    async def dispatch(self, request):
+        op = request.get('op')
+        if op not in OPS:
+            raise RequestError(f"Unknown op {op!r}")
+        if op == 'new':
+            if len(self.games) >= self.max_games:
+                raise RequestError(f"Too many games (at most {self.max_games})")
+            fen = request.get('fen')
+            if fen is not None and not isinstance(fen, str):
+                raise RequestError("fen must be a string")
+            game = Game(fen)
+            number = self.next_game
+            self.next_game += 1
+            self.games[number] = game
+            self.locks[number] = asyncio.Lock()
+            self.counters['games_started'] += 1
+            return self._describe(number, game, request)
+        if op == 'stats':
+            return dict(self.counters, games = len(self.games),
+                        spectators = sum(len(broadcast) for broadcast in self.broadcasts.values()))
+        number, game = self._game(request)
+        async with self.locks[number]:
+            if self.games.get(number) is not game:
+                raise RequestError(f"No game {number!r}") #Closed while this request waited
+            if op == 'move':
+                game.apply_move(request.get('move'))
+                self._publish(number, game)
+            elif op == 'engine':
+                move = await self._engine_move(game, request)
+                self._publish(number, game)
+                return self._describe(number, game, request, move = move)
+            elif op == 'undo':
+                if not game.undo():
+                    raise RequestError("There are no moves to undo")
+                self._publish(number, game)
+            elif op == 'pgn':
+                return self._describe(number, game, request, pgn = game.to_pgn())
+            elif op == 'close':
+                del self.games[number]
+                del self.locks[number]
+                self.broadcasts.pop(number, None)
+                return {'game': number}
+            elif op == 'legal':
+                request = dict(request, legal = True)
+            elif op == 'watch':
+                return self._describe(number, game, request, watching = True)
+            return self._describe(number, game, request)
+
+    async def _engine_move(self, game, request):
+        if game.status().result != '*':
+            raise RequestError("The game is over")
+        limits = [request.get(name) for name in ('time_ms', 'depth', 'nodes')]
+        if any(limit is not None and (not isinstance(limit, int) or limit <= 0) for limit in limits):
+            raise RequestError("time_ms, depth and nodes must be positive integers")
+        time_ms, depth, nodes = limits
+        if time_ms is None and depth is None and nodes is None:
+            time_ms = 100
+        if self.book is not None:
+            move = self.book.choose(game.position)
+            if move is not None:
+                move = move_to_uci(move)
+                game.apply_move(move)
+                self.counters['book_moves'] += 1
+                return move
+        loop = asyncio.get_running_loop()
+        async with self.engine_slots:
+            pool = self.pool
+            try:
+                move = await loop.run_in_executor(pool, _engine_search, encode(game.position),
+                                                  game.repetitions.copy(), time_ms, depth, nodes)
+            except BrokenProcessPool:
+                #A worker died. The first request to find out starts a new pool, so later ones work again
+                if self.pool is pool:
+                    pool.shutdown(wait = False)
+                    self._start_pool()
+                raise RequestError("The engine worker crashed") from None
+        game.apply_move(move)
+        self.counters['engine_moves'] += 1
+        return move
+
+async def _serve(host, port, path, workers, max_games, book, tablebases, ready):
+    server = GameServer(workers, max_games, book = book, tablebases = tablebases)
+    listener = await server.start(host, port, path)
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    try:
+        #SIGTERM (as sent by loadgen or a service manager) shuts down like Ctrl-C, closing the engine pool
+        loop.add_signal_handler(signal.SIGTERM, stopping.set)
+    except (NotImplementedError, AttributeError): #No signal handlers on Windows event loops
+        pass
+    try:
+        address = path or '{}:{}'.format(*listener.sockets[0].getsockname()[:2])
+        ready(address)
+        await stopping.wait()
+    finally:
+        listener.close()
+        server.close()
+
+def serve(host = '127.0.0.1', port = 7878, path = None, workers = None, max_games = 100000, book = None,
+          tablebases = None, ready = None):
+    #ready, if given, is called with the address once the server is listening
+    def announce(address):
+        print(f'listening on {address}', flush = True)
+    try:
+        asyncio.run(_serve(host, port, path, workers, max_games, book, tablebases, ready or announce))
+    except KeyboardInterrupt:
+        pass
+
+def main(args = None):
+    import argparse
+    parser = argparse.ArgumentParser(prog = 'main.py serve', description = 'Host games over a JSON-lines socket.')
+    parser.add_argument('--host', default = '127.0.0.1')
+    parser.add_argument('--port', type = int, default = 7878, help = '0 picks a free port')
+    parser.add_argument('--unix', help = 'Listen on this Unix socket path instead of TCP')
+    parser.add_argument('--workers', type = int, default = None, help = 'Engine processes (default: all cores)')
+    parser.add_argument('--max-games', type = int, default = 100000)
+    parser.add_argument('--book', help = 'Opening book file for engine moves')
+    parser.add_argument('--tablebases', help = 'Directory of endgame tables for engine moves')
+    options = parser.parse_args(args)
+    book = OpeningBook(options.book) if options.book else None
+    serve(options.host, options.port, options.unix, options.workers, options.max_games, book, options.tablebases)
+    return 0
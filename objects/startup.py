@@ -0,0 +1,83 @@
+"""
+This module contains the startup benchmark: how long a new process takes to import the package.
+
+Workers are often short-lived processes, so importing the package is kept cheap. Importing a module
+never starts a game or reads input. The command-line modules load argparse inside their main(). PGN
+text, process pools and opening books are imported by the functions that use them. `bitboard` builds
+its check and pin tables the first time move generation needs them.
+
+Each module is imported in a new interpreter run with `-X importtime`, several times over, and the
+fastest run is kept. The report gives the import time Python measured, the wall time over an
+interpreter that imports nothing, and the modules that took longest to import. The first run of each
+module isn't counted, so compiling stale bytecode doesn't show up as startup time.
+
+Functions:
+- measure(module, runs): (import microseconds, extra wall-clock seconds, [(microseconds, name)] slowest
+    first) for importing one module.
+- main(args): The `python main.py startup-bench` command line.
+"""
+import os
+import subprocess
+import sys
+import time
+
+MODULES = ('objects.position', 'objects.game', 'objects.board', 'objects.engine', 'objects.uci')
+#What a cold start may cost, in milliseconds of import time
+TARGET_MS = 20
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _run(code, importtime = False):
+    #(wall seconds, stderr) of a new interpreter running code from the repository root
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None) #Cached bytecode is part of a normal start
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', code]
+    start = time.perf_counter()
+    done = subprocess.run(command, cwd = _ROOT, env = env, stderr = subprocess.PIPE, text = True, check = True)
+    return time.perf_counter() - start, done.stderr
+
+def _parse(report, module):
+    #(the module's cumulative microseconds, [(self microseconds, name)]) from -X importtime output
+    total = 0
+    modules = []
+    for line in report.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        if name == ' site':
+            modules = [] #Everything up to here is the interpreter's own startup
+            continue
+        modules.append((int(own), name.strip()))
+        if name.strip() == module:
+            total = int(cumulative)
+    return total, modules
+
+def measure(module, runs = 5):
+    code = f'import {module}'
+    _run(code) #Writes the bytecode cache if it is stale
+    baseline = min(_run('pass')[0] for _ in range(runs))
+    best = None
+    for _ in range(runs):
+        seconds, report = _run(code, importtime = True)
+        total, modules = _parse(report, module)
+        if best is None or total < best[0]:
+            best = (total, seconds, modules)
+    total, seconds, modules = best
+    return total, max(0.0, seconds - baseline), sorted(modules, reverse = True)
+
+def main(args = None):
+    import argparse
+    parser = argparse.ArgumentParser(prog = 'main.py startup-bench', description = 'Time importing the package.')
+    parser.add_argument('modules', nargs = '*', default = list(MODULES), help = 'Modules to import')
+    parser.add_argument('--runs', type = int, default = 5, help = 'Imports per module (the fastest counts)')
+    parser.add_argument('--top', type = int, default = 5, help = 'Slowest imported modules to list')
+    options = parser.parse_args(args)
+    over = 0
+    for module in options.modules:
+        total, extra, modules = measure(module, options.runs)
+        verdict = 'ok' if total <= TARGET_MS * 1000 else f'over the {TARGET_MS} ms target'
+        over += total > TARGET_MS * 1000
+        print(f'{module:<18} import {total / 1000:6.2f} ms, wall +{extra * 1000:6.2f} ms  {verdict}')
+        for own, name in modules[:options.top]:
+            print(f'    {own / 1000:6.2f} ms  {name}')
+    return 1 if over else 0
@@ -0,0 +1,589 @@
+"""
+This module contains endgame tablebases: every position of a few small endgames solved by retrograde
+analysis, stored in files that the engine and the game loop look positions up in.
+
+Tables cover white having the pieces named between the kings (KQK is king and queen against a bare
+king); positions where black has them are looked up with the colors swapped and the board flipped.
+Positions are numbered by the side to move and the square of every piece. Pawnless tables use the
+board's eight symmetries to keep the white king on a1-d1-d4, tables with a pawn mirror it onto the a-d
+files, so KQK has 81,920 entries and KBNK 5,242,880. Castling rights aren't covered and the fifty-move
+rule is ignored.
+
+Generation works on the move generator's attack tables. A forward pass finds every position's legal
+moves: mates, stalemates, how many moves stay in the table and what the moves leaving it (captures and
+promotions) lead to, looked up in the smaller tables. Then the positions are solved one ply at a time,
+starting from the mates: a position with a move to a lost position is won one ply later, and a position
+whose moves all lead to won positions is lost one ply after the slowest of them, so every result comes
+with its exact distance to mate (DTM). Both passes are split over a process pool.
+
+Each table is two files, written under `directory` as <name>.wdl and <name>.dtm, each starting with a
+16-byte header (a magic number, the version and the number of entries, big-endian):
+- .wdl: 2 bits per position, 4 to a byte: 0 unused, 1 lost, 2 drawn, 3 won for the side to move.
+- .dtm: 1 byte per position: 0 drawn, 1 unused, else 2 + the plies to mate. An even number of plies
+    means the side to move gets mated, an odd number that it mates.
+`Tablebases` maps both files into memory, so a probe is an index computation and one byte read.
+
+Classes:
+- Tablebases(directory): The tables found in a directory, opened for probing.
+
+Functions:
+- Tablebases.probe(position): (wdl, dtm) for the side to move, or None for positions no table covers.
+    wdl is 1, 0 or -1; dtm is the plies to mate (0 for draws).
+- Tablebases.probe_wdl(position): Just the wdl, from the smaller file.
+- Tablebases.result(position): '1-0', '0-1' or '1/2-1/2' with best play, for adjudicating games.
+- generate(directory, names, workers, progress): Builds tables, smaller ones first.
+- main(args): The `python main.py tablebase` command line.
+"""
+import mmap
+import os
+import struct
+import time
+from array import array
+from .position import Position, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, BLACK, TYPE_MASK, TURN, CASTLING
+from .bitboard import (KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, rook_attacks, bishop_attacks, queen_attacks,
+                       squares_of)
+
+MAGIC_WDL = b'TCTBWDL\x00'
+MAGIC_DTM = b'TCTBDTM\x00'
+VERSION = 1
+HEADER = struct.Struct('>8sII')
+
+#White's pieces besides the king for every table, in the order their squares are numbered
+TABLES = {
+    'KQK': (QUEEN,),
+    'KRK': (ROOK,),
+    'KPK': (PAWN,),
+    'KBNK': (BISHOP, KNIGHT),
+}
+#Endgames nobody can win, which need no table
+DRAWN = ('KK', 'KBK', 'KNK')
+MAX_PIECES = 4
+
+LETTERS = {QUEEN: 'Q', ROOK: 'R', BISHOP: 'B', KNIGHT: 'N', PAWN: 'P'}
+#Pieces are named strongest first, which is also the order of their squares in an index
+ORDER = {QUEEN: 0, ROOK: 1, BISHOP: 2, KNIGHT: 3, PAWN: 4}
+
+#.dtm values
+DRAW, UNUSED = 0, 1
+#.wdl values
+WDL_UNUSED, WDL_LOSS, WDL_DRAW, WDL_WIN = 0, 1, 2, 3
+
+#Forward pass results
+NORMAL, ILLEGAL, MATED, STALEMATE = 0, 1, 2, 3
+#Set instead of a ply count when a move out of the table draws, so the position can't be lost
+CANNOT_LOSE = 255
+
+def _symmetry(sq, flips):
+    #flips: bit 0 mirrors the files, bit 1 the ranks, bit 2 swaps them (a reflection in a1-h8)
+    rank, file = sq >> 3, sq & 7
+    if flips & 1:
+        file = 7 - file
+    if flips & 2:
+        rank = 7 - rank
+    if flips & 4:
+        rank, file = file, rank
+    return rank * 8 + file
+
+SYMMETRIES = [[_symmetry(sq, flips) for sq in range(64)] for flips in range(8)]
+#The squares a pawnless table's white king is moved to: a1, b1, c1, d1, b2, c2, d2, c3, d3, d4
+TRIANGLE = [sq for sq in range(64) if (sq & 7) <= 3 and (sq >> 3) <= (sq & 7)]
+TRIANGLE_INDEX = {sq: index for index, sq in enumerate(TRIANGLE)}
+#For every white king square, the symmetries that move it into the triangle (two on a diagonal)
+KING_SYMMETRIES = [[table for table in SYMMETRIES if table[sq] in TRIANGLE_INDEX] for sq in range(64)]
+#A pawn on the a-d files and ranks 2-7, numbered 0-23
+PAWN_SQUARES = [sq for sq in range(8, 56) if (sq & 7) <= 3]
+PAWN_INDEX = {sq: index for index, sq in enumerate(PAWN_SQUARES)}
+
+class _Layout:
+    #How the positions of one table are numbered
+    def __init__(self, name):
+        self.name = name
+        self.kinds = TABLES[name]
+        self.pawn = self.kinds[0] == PAWN
+        if self.pawn:
+            self.size = 2 * len(PAWN_SQUARES) * 64 * 64 * 64 ** (len(self.kinds) - 1)
+        else:
+            self.size = 2 * len(TRIANGLE) * 64 * 64 ** len(self.kinds)
+
+    def index(self, turn, wk, bk, squares):
+        #turn is 0 for white to move; squares has one square per piece of kinds
+        if self.pawn:
+            if squares[0] & 7 > 3:
+                wk ^= 7
+                bk ^= 7
+                squares = [sq ^ 7 for sq in squares]
+            index = ((turn * 24 + PAWN_INDEX[squares[0]]) * 64 + wk) * 64 + bk
+            for sq in squares[1:]:
+                index = index * 64 + sq
+            return index
+        best = -1
+        #With the king on a diagonal both symmetries keep it in the triangle; the lower index is used
+        for table in KING_SYMMETRIES[wk]:
+            index = (turn * 10 + TRIANGLE_INDEX[table[wk]]) * 64 + table[bk]
+            for sq in squares:
+                index = index * 64 + table[sq]
+            if best < 0 or index < best:
+                best = index
+        return best
+
+    def decode(self, index):
+        #(turn, wk, bk, squares) of an index; only some of them are legal and use their lowest index
+        squares = []
+        for _ in range(len(self.kinds) - self.pawn):
+            index, sq = divmod(index, 64)
+            squares.append(sq)
+        squares.reverse()
+        index, bk = divmod(index, 64)
+        if self.pawn:
+            index, wk = divmod(index, 64)
+            turn, pawn = divmod(index, 24)
+            return turn, wk, bk, [PAWN_SQUARES[pawn]] + squares
+        turn, king = divmod(index, 10)
+        return turn, TRIANGLE[king], bk, squares
+
+def _attacks(kind, sq, occupied):
+    if kind == KNIGHT:
+        return KNIGHT_ATTACKS[sq]
+    if kind == BISHOP:
+        return bishop_attacks(sq, occupied)
+    if kind == ROOK:
+        return rook_attacks(sq, occupied)
+    if kind == QUEEN:
+        return queen_attacks(sq, occupied)
+    return PAWN_ATTACKS[0][sq]
+
+def _white_attacks(kinds, squares, occupied):
+    #Every square white's pieces other than the king attack
+    mask = 0
+    for kind, sq in zip(kinds, squares):
+        mask |= _attacks(kind, sq, occupied)
+    return mask
+
+def _occupied(wk, bk, squares):
+    occupied = 1 << wk | 1 << bk
+    for sq in squares:
+        occupied |= 1 << sq
+    return occupied
+
+def _is_legal(layout, index, turn, wk, bk, squares):
+    occupied = _occupied(wk, bk, squares)
+    if bin(occupied).count('1') != 2 + len(squares) or KING_ATTACKS[wk] >> bk & 1:
+        return False
+    if layout.index(turn, wk, bk, squares) != index:
+        return False #Another index stands for the same position
+    #The side that just moved can't be in check
+    return turn or not _white_attacks(layout.kinds, squares, occupied) >> bk & 1
+
+def _successors(layout, turn, wk, bk, squares, outside):
+    #(indexes of the positions the legal moves lead to in this table, .dtm values of those they lead to
+    #in other tables, whether the side to move is in check). outside looks the latter up
+    kinds = layout.kinds
+    index = layout.index
+    occupied = _occupied(wk, bk, squares)
+    inside = set()
+    leaving = []
+    if turn == 0:
+        for to in squares_of(KING_ATTACKS[wk] & ~occupied & ~KING_ATTACKS[bk]):
+            inside.add(index(1, to, bk, squares))
+        for i, kind in enumerate(kinds):
+            sq = squares[i]
+            moved = list(squares)
+            if kind != PAWN:
+                for to in squares_of(_attacks(kind, sq, occupied) & ~occupied):
+                    moved[i] = to
+                    inside.add(index(1, wk, bk, moved))
+                continue
+            to = sq + 8
+            if occupied >> to & 1:
+                continue
+            moved[i] = to
+            if to >= 56:
+                for promotion in (QUEEN, ROOK, BISHOP, KNIGHT):
+                    leaving.append(outside(kinds[:i] + (promotion,) + kinds[i + 1:], 1, wk, bk, moved))
+                continue
+            inside.add(index(1, wk, bk, moved))
+            if sq < 16 and not occupied >> (to + 8) & 1:
+                moved[i] = to + 8
+                inside.add(index(1, wk, bk, moved))
+        return inside, leaving, False
+    #The king is taken off its square first, so it can't hide behind itself from a slider
+    attacked = KING_ATTACKS[wk] | _white_attacks(kinds, squares, occupied ^ 1 << bk)
+    for to in squares_of(KING_ATTACKS[bk] & ~attacked):
+        if occupied >> to & 1:
+            i = squares.index(to)
+            leaving.append(outside(kinds[:i] + kinds[i + 1:], 0, wk, to, squares[:i] + squares[i + 1:]))
+        else:
+            inside.add(index(0, wk, to, squares))
+    return inside, leaving, bool(attacked >> bk & 1)
+
+def _predecessors(layout, turn, wk, bk, squares):
+    #The indexes of the positions in this table with a legal move to this one
+    kinds = layout.kinds
+    index = layout.index
+    occupied = _occupied(wk, bk, squares)
+    found = set()
+    if turn == 0:
+        #Black moved last, and only has a king
+        for before in squares_of(KING_ATTACKS[bk] & ~occupied & ~KING_ATTACKS[wk]):
+            found.add(index(1, wk, before, squares))
+        return found
+    #White moved last, so black can't have been in check before the move
+    for before in squares_of(KING_ATTACKS[wk] & ~occupied & ~KING_ATTACKS[bk]):
+        if not _white_attacks(kinds, squares, occupied ^ 1 << wk ^ 1 << before) >> bk & 1:
+            found.add(index(0, before, bk, squares))
+    for i, kind in enumerate(kinds):
+        sq = squares[i]
+        if kind == PAWN:
+            starts = []
+            if sq >= 16 and not occupied >> (sq - 8) & 1:
+                starts.append(sq - 8)
+                if 24 <= sq < 32 and not occupied >> (sq - 16) & 1:
+                    starts.append(sq - 16)
+        else:
+            starts = squares_of(_attacks(kind, sq, occupied) & ~occupied)
+        moved = list(squares)
+        for before in starts:
+            moved[i] = before
+            if not _white_attacks(kinds, moved, occupied ^ 1 << sq ^ 1 << before) >> bk & 1:
+                found.add(index(0, wk, bk, moved))
+    return found
+
+class _Table:
+    #One table's two files, mapped into memory
+    def __init__(self, name, directory):
+        self.layout = _Layout(name)
+        self.files = []
+        self.wdl = self._open(os.path.join(directory, name + '.wdl'), MAGIC_WDL, (self.layout.size + 3) // 4)
+        self.dtm = self._open(os.path.join(directory, name + '.dtm'), MAGIC_DTM, self.layout.size)
+
+    def _open(self, path, magic, length):
+        file = open(path, 'rb')
+        self.files.append(file)
+        try:
+            table = mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ)
+        except ValueError:
+            self.close()
+            raise ValueError(f"{path} is empty, not a tablebase") from None
+        self.files.append(table)
+        header = HEADER.unpack_from(table, 0) if len(table) >= HEADER.size else None
+        if header != (magic, VERSION, self.layout.size) or len(table) != HEADER.size + length:
+            self.close()
+            raise ValueError(f"{path} isn't a version {VERSION} {self.layout.name} table")
+        return table
+
+    def close(self):
+        for opened in reversed(self.files):
+            opened.close()
+        self.files = []
+
+class Tablebases:
+    def __init__(self, directory):
+        #Opens every table found in directory; tables that are missing just aren't probed
+        self.directory = directory
+        self.tables = {}
+        try:
+            for name in TABLES:
+                if os.path.exists(os.path.join(directory, name + '.dtm')):
+                    self.tables[name] = _Table(name, directory)
+        except ValueError:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        for table in self.tables.values():
+            table.close()
+        self.tables = {}
+
+    def __contains__(self, name):
+        return name in self.tables
+
+    def _locate(self, position):
+        #(table name, index) of a position, (name, None) for a drawn ending, or None if no table has it
+        if not isinstance(position, Position):
+            position = position.position
+        bb = position.bb
+        data = position.data
+        occupied = bb[0] | bb[BLACK]
+        for _ in range(MAX_PIECES):
+            occupied &= occupied - 1
+        if occupied or data[CASTLING]:
+            return None
+        white, black, kings = [], [], [0, 0]
+        for sq in squares_of(bb[0] | bb[BLACK]):
+            piece = data[sq]
+            kind = piece & TYPE_MASK
+            if kind == KING:
+                kings[piece >> 3] = sq
+            else:
+                (black if piece & BLACK else white).append((ORDER[kind], kind, sq))
+        turn = data[TURN]
+        wk, bk = kings
+        if black:
+            if white:
+                return None
+            #Swap the colors so the side with the pieces is white
+            white = [(order, kind, sq ^ 56) for order, kind, sq in black]
+            wk, bk, turn = bk ^ 56, wk ^ 56, turn ^ 1
+        white.sort()
+        name = 'K' + ''.join(LETTERS[kind] for _, kind, _ in white) + 'K'
+        if name in DRAWN:
+            return name, None
+        table = self.tables.get(name)
+        if table is None:
+            return None
+        return name, table.layout.index(turn, wk, bk, [sq for _, _, sq in white])
+
+    def _value(self, name, index):
+        #The .dtm value of an index; drawn endings have no table
+        if index is None:
+            return DRAW
+        return self.tables[name].dtm[HEADER.size + index]
+
+    def probe(self, position):
+        #(wdl, dtm) for the side to move of a Position (or a Board or Game): wdl is 1 for a win, 0 for a
+        #draw and -1 for a loss, dtm the plies to mate. None if no table covers the position
+        found = self._locate(position)
+        if found is None:
+            return None
+        value = self._value(*found)
+        if value == DRAW:
+            return 0, 0
+        if value == UNUSED:
+            return None #Only an illegal position, such as the side that just moved being in check
+        plies = value - 2
+        return (1 if plies & 1 else -1), plies
+
+    def probe_wdl(self, position):
+        #Just 1, 0 or -1 (or None), read from the .wdl file, which is a quarter of the size
+        found = self._locate(position)
+        if found is None:
+            return None
+        name, index = found
+        if index is None:
+            return 0
+        offset = HEADER.size + (index >> 2)
+        wdl = self.tables[name].wdl[offset] >> ((index & 3) << 1) & 3
+        return None if wdl == WDL_UNUSED else wdl - WDL_DRAW
+
+    def result(self, position):
+        #The result with best play from here, or None if no table covers the position
+        wdl = self.probe_wdl(position)
+        if wdl is None:
+            return None
+        if not wdl:
+            return '1/2-1/2'
+        if not isinstance(position, Position):
+            position = position.position
+        return '1-0' if (wdl > 0) == (position.data[TURN] == 0) else '0-1'
+
+    def _outside(self, kinds, turn, wk, bk, squares):
+        #The .dtm value of a position a capture or promotion leads to, from the table it is in
+        pieces = sorted(zip((ORDER[kind] for kind in kinds), kinds, squares))
+        name = 'K' + ''.join(LETTERS[kind] for _, kind, _ in pieces) + 'K'
+        if name in DRAWN:
+            return DRAW
+        table = self.tables.get(name)
+        if table is None:
+            raise ValueError(f"The {name} table has to be generated first")
+        return self._value(name, table.layout.index(turn, wk, bk, [sq for _, _, sq in pieces]))
+
+#The tables a worker process looks the moves leaving its table up in, opened by _start_worker
+_tablebases = None
+
+def _start_worker(directory):
+    global _tablebases
+    _tablebases = Tablebases(directory)
+
+def _forward_chunk(name, first, count):
+    #Runs in a worker. For every index from first: its NORMAL/ILLEGAL/MATED/STALEMATE status, the moves
+    #that stay in the table, the fewest plies to a win by leaving it (0 if none) and the most plies
+    #to a loss by leaving it (CANNOT_LOSE if leaving can draw)
+    layout = _Layout(name)
+    outside = _tablebases._outside
+    status = bytearray(count)
+    moves = bytearray(count)
+    wins = bytearray(count)
+    losses = bytearray(count)
+    for offset in range(count):
+        index = first + offset
+        turn, wk, bk, squares = layout.decode(index)
+        if not _is_legal(layout, index, turn, wk, bk, squares):
+            status[offset] = ILLEGAL
+            continue
+        inside, leaving, in_check = _successors(layout, turn, wk, bk, squares, outside)
+        if not inside and not leaving:
+            status[offset] = MATED if in_check else STALEMATE
+            continue
+        moves[offset] = len(inside)
+        fastest, slowest = 0, 0
+        for value in leaving:
+            if value < 2:
+                slowest = CANNOT_LOSE
+            elif value & 1:
+                if slowest != CANNOT_LOSE:
+                    slowest = max(slowest, value - 1) #The opponent wins there in value - 2 plies
+            elif not fastest or value - 1 < fastest:
+                fastest = value - 1
+        wins[offset] = fastest
+        losses[offset] = slowest
+    return bytes(status), bytes(moves), bytes(wins), bytes(losses)
+
+def _predecessor_chunk(name, indexes):
+    #Runs in a worker. The predecessors of every index, flattened as count, indexes, count, indexes...
+    layout = _Layout(name)
+    flat = array('I')
+    for index in indexes:
+        found = _predecessors(layout, *layout.decode(index))
+        flat.append(len(found))
+        flat.extend(found)
+    return flat
+
+#Levels with fewer positions than this are solved without the pool
+POOL_MINIMUM = 4096
+
+def _generate_table(name, directory, pool, workers, progress):
+    layout = _Layout(name)
+    size = layout.size
+    run = pool.map if pool else map
+    #Forward pass, split by the side to move and first square
+    step = size // (2 * (len(PAWN_SQUARES) if layout.pawn else len(TRIANGLE)))
+    firsts = range(0, size, step)
+    status, moves, wins, losses = bytearray(), bytearray(), bytearray(), bytearray()
+    for chunk in run(_forward_chunk, [name] * len(firsts), firsts, [step] * len(firsts)):
+        for whole, part in zip((status, moves, wins, losses), chunk):
+            whole += part
+    progress(f'{name}: {size - status.count(ILLEGAL)} positions, forward pass done')
+
+    values = bytearray(size) #The .dtm values, DRAW until a position is solved
+    levels = {}
+    for index in range(size):
+        state = status[index]
+        if state == ILLEGAL:
+            values[index] = UNUSED
+        elif state == MATED:
+            levels.setdefault(0, []).append(index)
+        elif state == NORMAL:
+            if wins[index]:
+                levels.setdefault(wins[index], []).append(index)
+            elif not moves[index] and losses[index] != CANNOT_LOSE:
+                levels.setdefault(losses[index], []).append(index) #Every move leaves the table and loses
+    del status
+
+    plies = 0
+    while levels:
+        solved = []
+        for index in levels.pop(plies, ()):
+            if not values[index]:
+                values[index] = plies + 2
+                solved.append(index)
+        if len(solved) >= POOL_MINIMUM and pool:
+            size_of = -(-len(solved) // (workers * 4))
+            parts = [solved[start:start + size_of] for start in range(0, len(solved), size_of)]
+            flat = array('I')
+            for part in run(_predecessor_chunk, [name] * len(parts), parts):
+                flat.extend(part)
+        else:
+            flat = _predecessor_chunk(name, solved)
+        position = 0
+        lost = not plies & 1 #The solved positions are lost for their side to move
+        after = plies + 1
+        for _ in solved:
+            count = flat[position]
+            for before in flat[position + 1:position + 1 + count]:
+                if values[before]:
+                    continue
+                if lost:
+                    levels.setdefault(after, []).append(before)
+                    continue
+                left = moves[before] - 1
+                moves[before] = left
+                if not left and not wins[before] and losses[before] != CANNOT_LOSE:
+                    levels.setdefault(max(after, losses[before]), []).append(before)
+            position += count + 1
+        if solved:
+            progress(f'{name}: {len(solved)} positions {"lost" if lost else "won"} in {plies} plies')
+        plies += 1
+    _write(directory, name, values)
+    return size - values.count(UNUSED)
+
+def _write(directory, name, values):
+    #The .dtm file is the values as they are; the .wdl file packs a 2-bit code per position
+    size = len(values)
+    codes = bytearray(values.translate(bytes(
+        [WDL_DRAW, WDL_UNUSED] + [WDL_LOSS if value & 1 == 0 else WDL_WIN for value in range(2, 256)])))
+    codes += bytes(-size % 4)
+    packed = 0
+    for shift in range(4):
+        packed |= int.from_bytes(codes[shift::4], 'little') << (shift * 2)
+    for extension, magic, body in (('.wdl', MAGIC_WDL, packed.to_bytes(len(codes) // 4, 'little')),
+                                   ('.dtm', MAGIC_DTM, values)):
+        path = os.path.join(directory, name + extension)
+        with open(path + '.tmp', 'wb') as file:
+            file.write(HEADER.pack(magic, VERSION, size))
+            file.write(body)
+        os.replace(path + '.tmp', path) #Readers never see a half-written table
+
+def generate(directory, names = None, workers = 1, progress = None):
+    #Build the named tables (default: all of them) in directory, and any table they need first, such
+    #as KQK and KRK for KPK's promotions. Returns {name: legal positions}
+    names = list(TABLES) if names is None else list(names)
+    unknown = [name for name in names if name not in TABLES]
+    if unknown:
+        raise ValueError(f"No such table: {', '.join(unknown)} (known: {', '.join(TABLES)})")
+    if 'KPK' in names:
+        names += [name for name in ('KQK', 'KRK') if name not in names]
+    #Tables with fewer pieces and no pawns first, so whatever a capture or promotion leads to is ready
+    names.sort(key = lambda name: (len(name), PAWN in TABLES[name], list(TABLES).index(name)))
+    from concurrent.futures import ProcessPoolExecutor
+    progress = progress or (lambda message: None)
+    os.makedirs(directory, exist_ok = True)
+    counts = {}
+    for name in names:
+        start = time.perf_counter()
+        if workers > 1:
+            with ProcessPoolExecutor(workers, initializer = _start_worker, initargs = (directory,)) as pool:
+                counts[name] = _generate_table(name, directory, pool, workers, progress)
+        else:
+            _start_worker(directory)
+            try:
+                counts[name] = _generate_table(name, directory, None, 1, progress)
+            finally:
+                _tablebases.close()
+        progress(f'{name}: written in {time.perf_counter() - start:.1f}s')
+    return counts
+
+def main(args = None):
+    import argparse
+    parser = argparse.ArgumentParser(prog = 'main.py tablebase', description = 'Generate or probe endgame tablebases.')
+    commands = parser.add_subparsers(dest = 'command', required = True)
+    build = commands.add_parser('generate', help = 'Solve endgames and write their tables')
+    build.add_argument('directory')
+    build.add_argument('tables', nargs = '*', help = f'Tables to build (default: {" ".join(TABLES)})')
+    build.add_argument('--workers', type = int, default = os.cpu_count() or 1, help = 'Processes to use')
+    probe = commands.add_parser('probe', help = 'Look a position up')
+    probe.add_argument('directory')
+    probe.add_argument('fen')
+    options = parser.parse_args(args)
+    if options.command == 'generate':
+        start = time.perf_counter()
+        counts = generate(options.directory, options.tables or None, options.workers, progress = print)
+        print(f'{sum(counts.values())} positions in {len(counts)} tables in {time.perf_counter() - start:.1f}s')
+        return 0
+    with Tablebases(options.directory) as tablebases:
+        position = Position.from_fen(options.fen)
+        start = time.perf_counter()
+        found = tablebases.probe(position)
+        seconds = time.perf_counter() - start
+        if found is None:
+            print('not in the tables')
+            return 1
+        wdl, plies = found
+        print({1: f'win, mate in {(plies + 1) // 2}', 0: 'draw', -1: f'loss, mated in {plies // 2}'}[wdl]
+              + f' ({tablebases.result(position)}), probe took {seconds * 1e6:.0f} us')
+    return 0
@@ -0,0 +1,115 @@
+"""
+This module contains the terminal front end: a client of the headless `Game` that reads moves from the
+keyboard and prints the board.
+
+All the rules live in `Game`; this module only turns key presses into UCI moves and a game's state into
+text. Moves are typed as two squares, the piece's square and then where it goes, and 'undo' or 'redo'
+can be typed instead of the first square.
+
+Functions:
+- render(position): The board as text, white at the bottom.
+- play(game, computer, think_ms, book, tablebases): Plays a game in the terminal until it ends. Pass
+    computer='w' or 'b' to play against the engine, an `OpeningBook` for it to play its openings from,
+    and `Tablebases` to end the game as soon as they know its result.
+"""
+from .elements import PIECE_GLYPHS
+from .functions import take_user_input
+from .position import PIECE_CODES, SQUARE_NAMES, BLACK, coords_to_index, move_to_uci
+from .game import Game
+
+#The glyph of every piece code, ' ' for empty squares
+GLYPHS = [' '] * 16
+for _name, _code in PIECE_CODES.items():
+    if _code:
+        GLYPHS[_code] = PIECE_GLYPHS[(_name[0], _name[1])]
+
+LONG_NAMES = {'w': 'White', 'b': 'Black'}
+
+def render(position):
+    data = position.data
+    letters = 'abcdefgh'
+    lines = ["    " + "    ".join(letters), "  " + "-" * 41]
+    for row in range(7, -1, -1):
+        squares = "".join(f" {GLYPHS[data[row * 8 + col]]:^2} |" for col in range(8))
+        lines.append(f"{row + 1} |{squares} {row + 1}")
+        lines.append("  " + "-" * 41)
+    lines.append("    " + "    ".join(letters))
+    return "\n".join(lines) + "\n"
+
+def display(game):
+    print(render(game.position))
+
+def human_turn(game, color, computer = None, read_move = take_user_input):
+    while True:
+        inp = read_move()
+        if inp == 'undo':
+            if not game.undo():
+                print("There are no more moves to undo...Please add a valid move")
+                continue
+            if computer:
+                game.undo() #Take back the engine's reply too, or it would just play again
+        elif inp == 'redo':
+            if not game.redo():
+                print("There are no moves to redo...Please add a valid move")
+                continue
+            if computer:
+                game.redo()
+        else:
+            _from, _to = inp
+            code = game.position.data[coords_to_index(_from)]
+            if not code:
+                print("There is no piece at that location")
+                continue
+            if (code & BLACK) != (BLACK if color == 'b' else 0):
+                print("That piece is the wrong color")
+                continue
+            try:
+                game.apply_move(SQUARE_NAMES[coords_to_index(_from)] + SQUARE_NAMES[coords_to_index(_to)])
+            except ValueError:
+                print("That is not valid move. Please try again")
+                continue
+        display(game)
+        return
+
+def computer_turn(game, color, think_ms, book = None, tablebases = None):
+    result = game.engine_move(time_ms = think_ms, book = book, tablebases = tablebases)
+    if not result.depth:
+        print(f"{LONG_NAMES[color]} plays {move_to_uci(result.move)} (book)")
+    else:
+        print(f"{LONG_NAMES[color]} plays {move_to_uci(result.move)} "
+              f"(depth {result.depth}, {result.nodes} nodes, {result.nps} nodes/s)")
+    display(game)
+
+def play(game = None, computer = None, think_ms = 1000, read_move = take_user_input, book = None, tablebases = None):
+    #Returns the game once it is over
+    if game is None:
+        game = Game()
+    print("Let's play chess!\nInitial Board State:")
+    display(game)
+    while True:
+        status = game.status()
+        long_turn = f"{LONG_NAMES[status.turn]}'s"
+        if status.reason == 'checkmate':
+            print(f"CHECKMATE! {LONG_NAMES['b' if status.turn == 'w' else 'w']} WINS!!")
+            return game
+        if status.reason == 'stalemate':
+            print("STALEMATE! It's a draw.")
+            return game
+        if status.reason:
+            print(f"DRAW by {status.reason}!")
+            return game
+        result = game.adjudicate(tablebases) if tablebases is not None else None
+        if result == '1/2-1/2':
+            print("DRAW! The tablebases say neither side can win.")
+            return game
+        if result:
+            print(f"{LONG_NAMES['w' if result == '1-0' else 'b']} WINS! The tablebases say it's a forced mate.")
+            return game
+        if status.in_check:
+            print(f"It's {long_turn} turn! Be careful, you're in check!")
+        else:
+            print(f"It's {long_turn} turn! Make a move.")
+        if status.turn == computer:
+            computer_turn(game, status.turn, think_ms, book, tablebases)
+        else:
+            human_turn(game, status.turn, computer, read_move)
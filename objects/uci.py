@@ -0,0 +1,257 @@
+"""
+This module contains a UCI (Universal Chess Interface) front end, so the engine can be run by chess GUIs
+and match tools such as cutechess-cli.
+
+Commands are read from standard input one line at a time and answered on standard output. A search runs
+on a background thread, so the engine keeps reading commands while it thinks: `stop` ends the search
+straight away and `isready` is answered during one. Each completed depth is reported as an `info` line
+with the depth, score, nodes, nodes/second, time, hash use and principal variation, and the search ends
+with `bestmove`. After `go infinite` the bestmove waits for `stop`, even if the search ends first.
+
+Supported commands:
+- uci, isready, ucinewgame, quit
+- setoption name Hash value <MB>
+- setoption name BookFile value <path>: An `OpeningBook` to play from before searching (empty for none)
+- setoption name TablebasePath value <directory>: `Tablebases` for the search to score endgames from
+- position startpos|fen <FEN> [moves <uci moves>]
+- go [wtime <ms>] [btime <ms>] [winc <ms>] [binc <ms>] [movestogo <n>] [movetime <ms>] [depth <n>]
+    [nodes <n>] [infinite]
+- stop
+
+The position is kept as a headless `Game`, so repetitions of positions from the game's moves count as
+draws in the search.
+
+Classes:
+- UCIEngine(write): The protocol state. handle(line) carries out one command.
+
+Functions:
+- time_budget(limits, turn): The milliseconds to spend on a move under a clock.
+- main(args): The `python main.py uci` command line.
+"""
+import sys
+import threading
+from .game import Game
+from .engine import Searcher, TranspositionTable, MAX_PLY, format_score
+from .position import move_to_uci
+from .book import OpeningBook
+from .tablebase import Tablebases
+
+ENGINE_NAME = 'TerminalChess'
+ENGINE_AUTHOR = 'TerminalChess contributors'
+DEFAULT_HASH_MB = 32
+MAX_HASH_MB = 4096
+#Rough memory per transposition table slot once it's filled, in bytes
+SLOT_BYTES = 128
+#Kept back from every move's time for reading and writing the protocol
+MOVE_OVERHEAD_MS = 30
+#Moves left to plan for when the clock doesn't say
+DEFAULT_MOVES_TO_GO = 30
+
+_GO_PARAMETERS = ('wtime', 'btime', 'winc', 'binc', 'movestogo', 'movetime', 'depth', 'nodes')
+
+def time_budget(limits, turn):
+    #limits holds the numbers given to go; turn is 'w' or 'b'. None means no time limit
+    if 'movetime' in limits:
+        return max(1, limits['movetime'] - MOVE_OVERHEAD_MS)
+    left = limits.get('wtime' if turn == 'w' else 'btime')
+    if left is None:
+        return None
+    increment = limits.get('winc' if turn == 'w' else 'binc', 0)
+    budget = left // (limits.get('movestogo') or DEFAULT_MOVES_TO_GO) + increment * 3 // 4
+    #Never risk more than half the clock
+    return max(1, min(budget, left // 2) - MOVE_OVERHEAD_MS)
+
+def _table_slots(megabytes):
+    return max(1, megabytes) * (1 << 20) // SLOT_BYTES
+
+class UCIEngine:
+    def __init__(self, write = None):
+        #write is called with every line the engine sends, without the newline
+        self.write = write or self._print
+        self.output_lock = threading.Lock()
+        self.tablebases = None
+        self.searcher = Searcher(TranspositionTable(_table_slots(DEFAULT_HASH_MB)))
+        self.game = Game()
+        self.thread = None
+        self.released = threading.Event() #Set by stop; an infinite search holds its bestmove until then
+        self.book = None
+
+    @staticmethod
+    def _print(line):
+        sys.stdout.write(line + '\n')
+        sys.stdout.flush()
+
+    def send(self, line):
+        #The search thread and the command loop both write, one whole line at a time
+        with self.output_lock:
+            self.write(line)
+
+    def handle(self, line):
+        #Carry out one command. Returns False once the engine should quit
+        words = line.split()
+        if not words:
+            return True
+        command, args = words[0], words[1:]
+        if command == 'uci':
+            self.send(f'id name {ENGINE_NAME}')
+            self.send(f'id author {ENGINE_AUTHOR}')
+            self.send(f'option name Hash type spin default {DEFAULT_HASH_MB} min 1 max {MAX_HASH_MB}')
+            self.send('option name BookFile type string default <empty>')
+            self.send('option name TablebasePath type string default <empty>')
+            self.send('uciok')
+        elif command == 'isready':
+            self.send('readyok')
+        elif command == 'ucinewgame':
+            self.stop()
+            self.searcher = Searcher(self.searcher.table, tablebases = self.tablebases)
+            self.searcher.table.clear()
+            self.game = Game()
+        elif command == 'setoption':
+            self.set_option(args)
+        elif command == 'position':
+            self.stop()
+            self.set_position(args)
+        elif command == 'go':
+            self.stop()
+            self.go(args)
+        elif command == 'stop':
+            self.stop()
+        elif command == 'quit':
+            self.stop()
+            return False
+        else:
+            self.send(f'info string Unknown command: {command}')
+        return True
+
+    def set_option(self, args):
+        text = ' '.join(args)
+        name, _, value = text.partition(' value ')
+        name = name.replace('name', '', 1).strip()
+        if name.lower() == 'bookfile':
+            self.set_book(value.strip())
+            return
+        if name.lower() == 'tablebasepath':
+            self.set_tablebases(value.strip())
+            return
+        if name.lower() != 'hash':
+            self.send(f'info string Unknown option: {name}')
+            return
+        try:
+            megabytes = min(max(int(value), 1), MAX_HASH_MB)
+        except ValueError:
+            self.send(f'info string Bad Hash value: {value}')
+            return
+        self.stop()
+        self.searcher = Searcher(TranspositionTable(_table_slots(megabytes)), tablebases = self.tablebases)
+
+    def set_book(self, path):
+        self.stop()
+        if self.book is not None:
+            self.book.close()
+            self.book = None
+        if path and path != '<empty>':
+            try:
+                self.book = OpeningBook(path)
+            except (OSError, ValueError) as error:
+                self.send(f'info string Bad book file: {error}')
+
+    def set_tablebases(self, directory):
+        self.stop()
+        if self.tablebases is not None:
+            self.tablebases.close()
+            self.tablebases = None
+        if directory and directory != '<empty>':
+            try:
+                self.tablebases = Tablebases(directory)
+            except (OSError, ValueError) as error:
+                self.send(f'info string Bad tablebases: {error}')
+        self.searcher.tablebases = self.tablebases
+
+    def set_position(self, args):
+        if 'moves' in args:
+            split = args.index('moves')
+            setup, moves = args[:split], args[split + 1:]
+        else:
+            setup, moves = args, []
+        try:
+            if setup[:1] == ['startpos']:
+                game = Game()
+            elif setup[:1] == ['fen']:
+                game = Game(' '.join(setup[1:]))
+            else:
+                raise ValueError("Expected startpos or fen")
+            for move in moves:
+                #Not apply_move: the GUI decides when the game is over, and may play on past a draw
+                #that could be claimed
+                game.play_move(move)
+        except ValueError as error:
+            self.send(f'info string Bad position: {error}')
+            return
+        self.game = game
+
+    def go(self, args):
+        limits = {}
+        for index, word in enumerate(args[:-1]):
+            if word in _GO_PARAMETERS:
+                try:
+                    limits[word] = int(args[index + 1])
+                except ValueError:
+                    pass
+        turn = self.game.status().turn
+        infinite = 'infinite' in args
+        if self.book is not None and not infinite:
+            move = self.book.choose(self.game.position)
+            if move is not None:
+                self.send('info string book move')
+                self.send(f'bestmove {move_to_uci(move)}')
+                return
+        time_ms = None if infinite else time_budget(limits, turn)
+        depth = limits.get('depth')
+        nodes = limits.get('nodes')
+        if infinite or (time_ms is None and depth is None and nodes is None):
+            depth = MAX_PLY #Until stop
+        #The thread gets its own copies, so a new position can't change the one being searched
+        position = self.game.position.copy()
+        repetitions = self.game.repetitions.copy()
+        self.released = threading.Event()
+        self.thread = threading.Thread(target = self._search,
+                                       args = (position, repetitions, time_ms, depth, nodes, infinite), daemon = True)
+        self.thread.start()
+
+    def _search(self, position, repetitions, time_ms, depth, nodes, infinite = False):
+        result = self.searcher.search(position, time_ms = time_ms, depth = depth, nodes = nodes,
+                                      info = self._info, repetitions = repetitions)
+        if infinite:
+            #The protocol allows no bestmove before stop, even if the search found a mate or hit MAX_PLY
+            self.released.wait()
+        if result.move is None:
+            self.send('bestmove 0000')
+        elif len(result.pv) > 1:
+            self.send(f'bestmove {move_to_uci(result.move)} ponder {move_to_uci(result.pv[1])}')
+        else:
+            self.send(f'bestmove {move_to_uci(result.move)}')
+
+    def _info(self, result):
+        self.send(f'info depth {result.depth} score {format_score(result.score)} nodes {result.nodes} '
+                  f'nps {result.nps} time {int(result.seconds * 1000)} '
+                  f'hashfull {int(self.searcher.table.usage() * 1000)} '
+                  f'pv {" ".join(move_to_uci(move) for move in result.pv)}')
+
+    def stop(self):
+        #End a running search; its bestmove is sent before this returns
+        self.released.set()
+        if self.thread is not None:
+            #Asked again until the thread ends, in case the search hadn't started when first asked
+            while self.thread.is_alive():
+                self.searcher.stop()
+                self.thread.join(0.01)
+            self.thread = None
+
+def main(args = None, stdin = None):
+    engine = UCIEngine()
+    for line in stdin or sys.stdin:
+        if not engine.handle(line):
+            break
+    else:
+        engine.stop()
+    return 0
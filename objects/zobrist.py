@@ -0,0 +1,251 @@
+"""
+This module contains the Zobrist keys used to give every position a 64-bit identity.
+
+A position's key is the XOR of one random number per (piece, square) pair on the board, plus numbers for
+the side to move, the castling rights and the en passant file. Because XOR undoes itself, `Position`
+keeps its key current with a handful of XORs per move instead of rescanning the board.
+
+The numbers are fixed constants, so keys are the same in every process and can be stored on disk
+(transposition tables, repetition counts, opening books and caches all rely on that).
+"""
+#The 781 keys in the order they are handed out below: 64 for each piece code, the turn key, 4 castling
+#rights and 8 en passant files. They are the first 781 random.Random(0x5EED_C4E55).getrandbits(64)
+#values, written out so the keys never depend on how a library seeds its generator (and so importing
+#the package doesn't import random)
+_KEYS = (
+    0xA3E72CF12FA700FE, 0xD6AC331AC8437444, 0x82AC549450624002, 0x1D18B7FFDBF528AB,
+    0x01B039C9B807EEF4, 0x5F5A554BF140A23E, 0x3CFCE721AA38079F, 0xE1CED91152B952C7,
+    0x93FDD080056070D9, 0x92975E4280001EF0, 0x6EE83EF4658301C1, 0xBFB63312C34F7086,
+    0xB739CCE747BA193F, 0x63D488B7BBD6064D, 0xDF7D86DAD30242E1, 0xE74B0946066AB058,
+    0x930EE9D518423B6A, 0x504B645ECF629A38, 0x0F5EABE50CF25139, 0x04E836A59ABC0DE2,
+    0xCF86FC3C5BC2CD0B, 0x6182CFCA5DDB1BFA, 0x00315867AE8E5E97, 0xCBD8268F0D75237E,
+    0x9BBCB5DE4D988797, 0x61F8E844F514667F, 0x9A655A50101A3026, 0x2D47E758FF3C5A6B,
+    0x14094B676582EC46, 0x5648ED00A1AAE12A, 0xDCEFBF9CA1530E94, 0x1E1065BCC802EBE0,
+    0x1F6BA4067E89BD89, 0x29AD329B130F4D49, 0xA730B89DCA1F0CF6, 0xEBCFA9C8EA9F67B4,
+    0xA144927A056B2562, 0x1BF20E7AA766806E, 0x1AB4C65427F4B654, 0xC371F3647D3F9255,
+    0xE5A0F848BC1EC701, 0x3B3C6C52A0781A99, 0xC259BA97B6315C94, 0x358AF0ADE481202E,
+    0x30084800F77148FE, 0xC65116A5F1DB18FE, 0x7C7BF616F331239E, 0x8407F5775212FF41,
+    0xB775CA91701F326C, 0xE83869A4B07E8D14, 0x3171893525999F57, 0x0C9FE9061898F7F8,
+    0xAD90B303FA4FDFCB, 0x5DC8266684F878DD, 0xA8EFE6A39681F4FB, 0x36FE05501FFC28C9,
+    0xB2ED9E9E548F8D35, 0xC3347B79A6ED0102, 0x0E53896E49CF1DFD, 0x37ABBCC2CB5DEE15,
+    0xF387D39EC2B80806, 0x4BD882B868D265CD, 0x1546E1E68B6FB16A, 0x3C1967B7596234F1,
+    0x6F4460335E9D5511, 0x220A67A6AB53BCB3, 0x756F0930D2453A01, 0x187C7C482176421F,
+    0x2F4D5E9393069504, 0xF36E8C21A32BD29D, 0xD96A5CBBB24C433C, 0xFFB91651C19260A1,
+    0xA39062775EE4CC4D, 0xA1C215C1BDDDBBBC, 0x592AEAAFD4B157B2, 0x0D7860F8ADFD4850,
+    0x53E53831A2C8CC97, 0x3C7F5D387F44250D, 0x178C7F796216A83B, 0xF1389BEE9AD7FEB5,
+    0xD2793F81F6DAB384, 0x4C41C4D1525FF8E7, 0x9A8F653B8D3F99EA, 0xBC488FC1F0CBB352,
+    0xD1F46A64CF36F34C, 0xD101494F4AB10984, 0x99D2F48C0D4B0F4C, 0x86E0361E44A9606D,
+    0x4276B5D38ABC3E54, 0x768A196450963EE3, 0x3DA3A041D520AE9A, 0x0EC07AF5C5274AD6,
+    0x4E30DE72F169D7FF, 0x0E770E69F51377D2, 0x59DFC18C53494698, 0x386F0A70C472383E,
+    0x55E806798FAAB78E, 0x30A95A307F301AB7, 0xEB37B93C8788AAEF, 0xD2D834ADC9927BCF,
+    0x0AFC865FA2ADBB17, 0x14D18B8BE9EBBDB2, 0xEFBD250473A420A0, 0xF518B30A30CC21A2,
+    0xC29126FAF53CE8BF, 0xD46C53DDCFEC56BD, 0x3C112164E70525D0, 0x3862B47B249429F5,
+    0xB2575294DC3D75B6, 0x9A2550DDD71A90DF, 0xB981EAF73AAFC48E, 0xD934B5F73ED587A1,
+    0x523570BB31F2A7E1, 0xFCDD7548368C8790, 0x4A3BD83DE7C558BC, 0x66FD26FEF806D4F8,
+    0xF69D50A4DF30BA89, 0x2BEE712263941595, 0x2607DD0EE5B9718C, 0x0DC010421DFBACBB,
+    0x0F9EA896590F7AE6, 0x768EC363CB931BA2, 0xF5220A66624EA441, 0x7CE8D4FD32F99AD5,
+    0x7C406A3FE4755F10, 0xA25ECD66A0F977F6, 0x3F3C4B08BD2DE08F, 0xF7F92416DA7515DC,
+    0xAA167F2A89555DE2, 0x0399019F6186F963, 0x1142E8BEBBC3C64B, 0x9E6D8044002B3E37,
+    0x4E11E15F823E735F, 0xBB048C56B9B02262, 0x8903EDB1A53DFD09, 0xCC4CFA4B5ED43C8E,
+    0xC5FD809F33ED8FA1, 0xD4598CDBE5152722, 0x97C086B554763DF5, 0x9C5E4E911F647874,
+    0xDFC8A62B7BCE9EDE, 0x5DFD15DD5C8C1A54, 0xD19A819FF1868720, 0xC76930B3896031DC,
+    0x4219DD58DB790AA0, 0x2159377569AC134C, 0x5EF24466F0470A70, 0x0C6C41A43D7E1C98,
+    0xA6AFB37D5C958069, 0x897021854BC1F9DE, 0xF619810EF9B46E9E, 0x9DE9FAA6D3A3D858,
+    0x785670CA90A98C70, 0x33E77AD6439C74F2, 0xD50627F257B770FF, 0x29EFC68BD723C8AC,
+    0x8B74A3E411508F4E, 0x1B707175AEE9F7D2, 0xFA5124881903FA71, 0x4985DC8AD8A22FF5,
+    0x5E6887CD75BEA293, 0x56FEB264AADFA2EA, 0xF79C93B2C2A81201, 0x29B9D521359639D6,
+    0x20C4C04EB2F3EB91, 0x57F56705E478696A, 0x21C64A8AA9CDA083, 0x030657CA2F98A7ED,
+    0xE60AB265FE8618A3, 0xDCF39DA29C6B5B5D, 0x549C8B916E343A79, 0x3D7AA7B33CED9620,
+    0x7B08D03116020E27, 0x2E579E4495A4CFE5, 0x6600A491361D4756, 0x661A37D958A9E466,
+    0x30AF54982CCDE03B, 0x25BDBAC2E0AE4354, 0xB45B9F0F989AF654, 0x9610AC3F563BA561,
+    0x5EFBD39950715FBF, 0xBFF426E54BD37312, 0x58A902F4038809F3, 0x03544DED4B75811C,
+    0xB58C06A99F8FBC0D, 0xB02BF60683CC6FDC, 0xC299721F1BC475F8, 0xFA93C34E2BC9CE89,
+    0x9E24FCF1E049270C, 0x24A910BB5B51C732, 0x681C4B675B82C930, 0xAC752A05F14D1692,
+    0x02B8B5DD16337AC9, 0x447E6930903951A6, 0x6DF4FB5E66096841, 0x89F4EB44F71BCF99,
+    0x46A422F22539D33A, 0xE4AA1BC88722781B, 0x3A442275585A3B42, 0x438BBD83C67D34E9,
+    0x00B62EBF8E2D4FE6, 0x2B6EA31E341C5AD6, 0xDC46EE24D45D569E, 0xF5B8A56B65EB1884,
+    0xF42C2870959A0E79, 0x640D687A7A5E6A9C, 0x1F5E14ED69987A8E, 0xD39E916D3FEDCB4A,
+    0xF0A2859460F8D1E8, 0xA7D057A115BAA9D5, 0xA6B58AC7FE85D997, 0x37D6F0AC3F4232BD,
+    0x15DE15D6A40A4D21, 0x67916531C82B9D15, 0x583E142C7BDB7607, 0xE02AE6E82126AB3E,
+    0x502C479A3E77DE18, 0x1AB4275FE1DB94FE, 0xA53865EF68C6725F, 0x6D64F0CCBA8D4662,
+    0xA6E11F5A047D1243, 0x7E3096A06ACF9497, 0xC8B2986C74970C7B, 0xE178AF778CD54EBC,
+    0xDB4C0EF1558513AA, 0xCD208077B284EA66, 0x4EE79245C1EDF143, 0x97217E6D27F24FCA,
+    0x69E4808A3890D3D6, 0xC6A1988AC1067CA6, 0x4C1609406E87D57E, 0x844ECB3BB7001E39,
+    0xCE6D88AF137CEEF3, 0x7DB5D16ACE38E2E1, 0x48217E71E72C4B94, 0x384C7366F0C43E93,
+    0x7C27A55692E20896, 0xB0152EFF642433EA, 0x697F0FA080478F83, 0xA43249CF58DE0C7F,
+    0x920198D24BC5EE62, 0x933C5393857733C8, 0x0A1581E29AB6870C, 0xA769DB5BD716CE8D,
+    0xAC6D3A95B23E4BAA, 0xDC34466E6B825EA3, 0xB252A1F736A1A225, 0xF4F087891BEFA8C1,
+    0x57F84F052907367E, 0xA3A174B428732CD4, 0xF39CC88DA71DFFBA, 0xB7907C47D32CA33C,
+    0xC675A4E04111777A, 0x763EF08AB0E619CF, 0x02962E2E697A4F37, 0x2AB47D5A6EE8F0B5,
+    0x48185EE0E036D718, 0xEE7FAEE67026DEF9, 0x361235F3673F0697, 0x88E198D2AF56A8E4,
+    0x1C54196E85798758, 0xAA9B32B5C002AADA, 0xFFD10140AEE3AEAF, 0x5780333BE4E67A5E,
+    0xBDF2DAFAA643C53A, 0xB1B56F1325B44478, 0xC2C72F99D9DDF8F7, 0x884DE50752819C29,
+    0x17E72C79CDDDC410, 0x4CEBBF6B906BACEB, 0x8FC387FAB8D2BEE8, 0x7B1B3C1CD4A63C3B,
+    0x0236759758CC9CEE, 0xF0DF5C2109C947C7, 0xB72C79C9AA708956, 0x501884E987A3B955,
+    0x26C5D2533E19D814, 0xD7ACFC2552DA34F8, 0x5693AE21B2E3609B, 0x4A60C4D442C940B6,
+    0x45CE68455F498B63, 0xE0E7767A6FE9579F, 0x84D405C8CB8444B9, 0x06BC91F8F5AB85F8,
+    0x29E10CB4DE5BFE98, 0x1DD2052F7120EE9F, 0x9AADC28FBB790303, 0x032BF2CE47FA782C,
+    0x78CACBA2E11E859D, 0xFC50608050F7C93D, 0x3A9CF2FBE122827D, 0x78BC0E2A5212DC5A,
+    0x79B6CD244645D94F, 0x3BC34512152CD330, 0xE8AF79375169D8CB, 0xF2854665BBFA8631,
+    0xBC904075BAABEE1C, 0xCE7EBEADD7CBD0A5, 0xE4B540247074E84D, 0xBE44CE01D801F446,
+    0x7B68A792E77ED21D, 0x0FAF64A38720D539, 0xCF85E875C84C79B6, 0x0B2CEB03CB82FCDC,
+    0x7BEF311062AA034B, 0x89945C63E52E62EE, 0x770074DB6EAA9C0C, 0xF2F7C8CA0C8A94B4,
+    0xE620135B89926990, 0x6BC0ECE706B9F06E, 0xB2E2434E2DEBC0E9, 0xED5EF648EE04EB1B,
+    0xD256528041A86BC3, 0x5D5780FC3BF1AC85, 0xC5A9FC102732E5C8, 0xC1C3AEC378EEE3E2,
+    0x412847039F227E26, 0xAD9072B3B537440F, 0xB49D1711232D6C3F, 0xEF87F6C00B8D8EE2,
+    0xA8D3CDFD96C5F174, 0x390C96CCE4B1ED5C, 0xBD9816B7CA081D50, 0x3A692DCD1D73BFFF,
+    0x9180F418BA9EC050, 0xAB9C88DD23CB7843, 0xEFCEBC8D4359B9B5, 0x01342A81DE89F63D,
+    0xDB926C2ADBD1C295, 0x7A8FC7643701AF4D, 0xCB96FA8B0D650851, 0x7FF946AD893288F8,
+    0xEC4C21DD17FBAEB8, 0x6EA77F6F82FA1D37, 0x77252B3CBABB8CB9, 0xCA5775F346C8AEE2,
+    0x3F9ED63ADECF6D62, 0x1300101B626F2E66, 0xDAAC7EF7C14CA655, 0x0FD5F1DE2CBEBB1D,
+    0x3202AB5F59E009F6, 0x6C8965B09DD4F150, 0x48854A36475846B6, 0x2624EBCA50BD8011,
+    0x9D65D0E5A6369726, 0xF2ED75EF80AE6A7B, 0x0DB918488B567040, 0x0482382A7CA67473,
+    0x0BB01955FB6EF23E, 0xE81A01BC4ED99E49, 0xC1C24DD7FD69F939, 0x7E2C10D320A1870E,
+    0x3A14D9072997370A, 0xEDC93B6DF19168A9, 0xEBE330239A80AAFB, 0x73C19A0997B5A8DF,
+    0xA443601CC44990F4, 0x587F7F5AFC55324C, 0x198FB3CB78EABB30, 0x4F7C13A745CA97AA,
+    0xFD20A137F746C75D, 0x05600F76191B28EF, 0x7DEDE195F478DD11, 0x4411B69C39448F5D,
+    0xAE22C84E28278B90, 0x4DA23D7299E6FF19, 0x41577FB8791B9C3E, 0xFB45777AA4AAD998,
+    0xB2B05FBF00D1DEED, 0xDDBDEB742F0934EF, 0xB35DE58FBD704F0E, 0x98590D1ADA02336D,
+    0xAD81CBED3E36BD85, 0x1FD5F1224AFB24BA, 0xDD8C61E435BDB9C6, 0x785FC292453E640D,
+    0xADBE9AFBC6869F2D, 0x73C0865B8181AD60, 0xFDDD47C399956116, 0x63D7DFD7855BBF8A,
+    0x90FB645C42E62078, 0x29808310B12E8FA2, 0xBA139F57EAE03E08, 0x573040A3F3CF9CF4,
+    0xBC9F29D9E7E26932, 0x0366CB8204547157, 0xB37EB13D53A7D388, 0x7335E4550A0A3AC7,
+    0x43A1757221732F73, 0x6F586CD24DEE0347, 0x190BCA0CA66DEBB4, 0x5E681020EDBF1C38,
+    0xAD58916AB567A3DA, 0xF9CAA39868C7A294, 0x2A2ED95ED6BA5C1D, 0xAD8F3D3B0410DEA7,
+    0x8E6E8BD493BFDE17, 0x0839488F54775A0D, 0x5DAAF997BA8C7D13, 0x1DD6ED5CBEDB4FBE,
+    0x7B4253E131E03E32, 0xF6D0B907980032AE, 0xE50CC9054CA9796E, 0x648D1F8422A4CF96,
+    0x6F7453C8F1C3DB53, 0x1826A23BE9AF04DD, 0x80D7BA5F931295F9, 0x581D89A47B24EFDE,
+    0x53A91711F20B16DF, 0x9B5CC2A77D8DCA2A, 0xEB6766D2F087CEC8, 0xAFA8AE2D3646A46E,
+    0x836C5179ECDB384F, 0x9DB6E2CBB06B0715, 0x3768ABA3A94BD1E6, 0xA141A044C197D442,
+    0xB5B2553A27884CD9, 0x513EA5E67273F7B7, 0x1ACFAC371872738E, 0x02882A18FEC8F10C,
+    0x7424691A1E3E249D, 0x406697BF6AF040E1, 0x4BF42237B8B5E375, 0x5B95CDF889912C67,
+    0x773CA48C46A5C1C4, 0x1243BEDFA6E8A913, 0x3CFB11324A024845, 0xA591F282A4AC842B,
+    0x9FBD55C7C0A52B12, 0xA09CED38A78ADEFD, 0x9841CBF050FAA8F0, 0x3D8601CE27ABC06D,
+    0x7118802D91E437B7, 0xDFA35C8D184A9453, 0xE6B51E287F8BAA3C, 0xB03B919ABC2B83A6,
+    0x4BBAA0E0AAF94038, 0xCA034A952645D137, 0xFBE1AFA94167F382, 0x798C451BC0C5B3B6,
+    0x13BAF5709E34C3E4, 0x9AEE2A47117B0727, 0xBF833F33BF67EFA9, 0xDD41B4F96B639079,
+    0x6F3663B769CA3FB1, 0x5C1447E03D3E0297, 0xAE59BA0B7FC46BCE, 0xE5BEDB1C21B75C07,
+    0x781117A772C38AB5, 0xCDD9909A4070DADC, 0xD4EE7550404FE92C, 0x281AF5569953B285,
+    0x28A7C160E4D3B88D, 0x8791138A245B52EC, 0x7F5DA1302B4BABB1, 0xFAA3EA77B625ABEF,
+    0xC038C96381CEEB0B, 0x8F853E3A334DCC88, 0x4967D5638BF8882F, 0xCB35FAFE9C39978C,
+    0x7335CB808439C2C3, 0x8CC8DB6ED1818D8F, 0xAA867D0668A6FFD4, 0x4BC4C176627E6D82,
+    0x22FD459A6A1E458F, 0xB990E5022F1E9648, 0x5524337FC37BE2C5, 0xE446B447192F0965,
+    0xCEF348BA5A6D309C, 0x936E5765BDD60F51, 0x123C85318D64E25B, 0xB3A2AB1C0D7840E7,
+    0x338DAE1C28C6C272, 0x4B7AF1C73A58DC8A, 0x1C3C3F3F46D1EDA1, 0x8EA8497369DF8A3E,
+    0x3DF26E035E7F65C7, 0xC8489FBABDCF0D97, 0xC4509EB1D8AA3D18, 0xAF90FA9D4076A00B,
+    0x95C38F68750EBBD4, 0xBC614972657C7572, 0xB8966C0CC8A123E0, 0xBF05D6C9878BB0CF,
+    0x59DB47DD3B10696C, 0x1399D28F986146F5, 0xB39EF2C5B7BFF7AA, 0x0CE902176C07CF39,
+    0x40A62514FFBA1CB9, 0x563FCFBA94886931, 0x795D52E06C2F57D3, 0x82D78AD772195B79,
+    0x1253533B924997F5, 0xE63C6986CF2BB464, 0x850BCE425D453D95, 0x5EFCA7784D3CF0A3,
+    0xEDF5006497A7F15F, 0x0400080EE5095562, 0x1ADCA8085EEFBC59, 0x55CC181DDEED7A95,
+    0x5FEBBECCFDCD4664, 0xE534058AACD0CE6D, 0x376298C40CB71607, 0xDEFF3B72F5F15BBD,
+    0xF41C1DCDC2BC0FD1, 0x62137E268D0BE466, 0x3A38AF8DD4CAD7DF, 0xE7867521268149DF,
+    0x90E056FB53BF7F1E, 0x4A15ABD7B5B5C78D, 0x369B48C4EFE8698E, 0x2891D6E28C46C760,
+    0x0BE91D5A0307DDF5, 0xDF61215FEAEAD531, 0x8108C993CD51AAF6, 0x2EBB11A54937FBBC,
+    0xD743E82ACDD96004, 0x7EB025B29C103016, 0x1BD20313EA88E2E3, 0xA4BE5C3071AE5F55,
+    0xD5A84BA9C6199A32, 0x1034D0CB346D4D9B, 0xE8205DFEA293A26A, 0x00DD3D469B861D34,
+    0xFEA4241998BFAF7D, 0xC6889AE3E3C8C356, 0x7B92CCD9903CA935, 0xFB76B9A2A669BBCD,
+    0x017FC7757C4AD4E3, 0x14306D80E7F008D8, 0x53988EA4DC8BB42D, 0x5EDE6BC2D99BB745,
+    0xDB04366D0DC70A04, 0x0CB0FD11E12CCA2E, 0xD1A898B36F40FFAA, 0x0A175C78C3E2948A,
+    0x1D8A7BC2BC100B5F, 0xFAF8970668E72032, 0x0B5B79ADFCDA3B8B, 0xBD0467FD867FAA0B,
+    0xF44B7AE8064F4E26, 0x42A62C74973CB771, 0x4B26A06AB72D6381, 0x147FC5C76F01A3CB,
+    0xC1413DE987505CAE, 0x4EA8D9C2533FDCA3, 0x6350A344850E3754, 0x2831A0451D15FA93,
+    0x62CC6CE7DD51F83E, 0x7A9B12204AD2C794, 0x93A8E1686D77AB25, 0x3CDB166458E24E8C,
+    0x7D4CC5974D189DF7, 0xACE7D7C0C20F0555, 0xB3D5D761835EBC73, 0x656656B2AFD50B40,
+    0x7CFD52364DCCEAE7, 0x34066B0D3C8C19B2, 0xEF27ED8C73728F9E, 0xE090FFC4ED6B3BA5,
+    0x703EEB0119D3A654, 0x47F784CF96E6A9AD, 0xD4A3E9D313AF6FFD, 0x1D9A00467261DF65,
+    0x66DDEA1D0DE9F4EF, 0xFFEEECB66DA6F3FB, 0xC7D3AB004E911A21, 0xA1FF9BD635B65938,
+    0xB92D201C523AB59A, 0xE348FD4F35206F6B, 0x1152E9D75CEECFAD, 0x6DBAB6753530202B,
+    0x64EED054668C382D, 0xA5B56DEBDDAE5791, 0x883BC392797DAE01, 0x5FD2F995B464D2E8,
+    0x42A3267F4ABE5E4B, 0x2E6D469AAB430568, 0x2CC387F2F61CB736, 0x86F471D5661CA122,
+    0x9E9CF0B188FA2581, 0x4B99498F2912B033, 0xCBD48791AA655653, 0x28059B2D01880378,
+    0xC13E4925AFF3D44F, 0x9CA6CE0F788FF915, 0x1591C32F394B862C, 0x81068654BC379DA3,
+    0x2DEC4FDC0D8B7B6A, 0x3E5B26568A355D33, 0x222D562457AF3D5F, 0xB208E5A898DE24F0,
+    0x0416FB28CE60ED26, 0x44D8988D6DBE88BE, 0x8477B5F9291B7A29, 0x4177A4924ED5DD7D,
+    0x3B4EF355E557C91A, 0x828B84A46A38D66B, 0x30EDF9F68DBC89D6, 0xF4EECD13CEBD1DC4,
+    0x62C66209FD7FEFB5, 0x80947328F979A0F0, 0x734E012F7040974A, 0xAED563CB11EF2245,
+    0x5E74D2D605B98174, 0x6BEB4B951E43A5CA, 0x1415C70C5299A787, 0x78422C469D55FB3E,
+    0x023C6408284DA6FB, 0xD0365BDA8B2D9815, 0x117898DDA4A5CEF4, 0xE505428BA42634CF,
+    0x9F690CCC934A86C9, 0x69D00FF1A083C6EA, 0x233152C2582E37F7, 0xB8DFBBE403A838C9,
+    0x1B4AD1C8EF7F61F6, 0x3BA7CE8D7AF1F9BB, 0x870C1DE535D27DF3, 0xF9AC847C588DB77A,
+    0x3F4A120420D97DD5, 0xF094F6DD1A0B1489, 0xF86C4D7F42E9FD4B, 0x1F91F54D67C276A4,
+    0x408A192F143D5627, 0xF3BA4391D825BC12, 0xA503EC6769DC6AA3, 0x2A2BC65FF846EB0F,
+    0x5DE1CFE1E60B5EFE, 0xA5F5203C6B9BAC8F, 0xDBE4C7ABBBDDB6DF, 0xC064C633BFD19B3A,
+    0x9DC29276C4BC4225, 0xD263FC45D7ECD82A, 0xF316A8D406DDE295, 0x039C35DB3D5D3FFA,
+    0x2C405194FFD42C3F, 0xF6F6CDD7DB7F5633, 0xEDD965DD0D39D388, 0xB9FC613517298AED,
+    0xA0E86A6B9CB8E9F4, 0x4BFA1C8BD47DDA0A, 0xFAFE77C101D86FA2, 0x20950F097A157B29,
+    0x3444D2B6525A677A, 0x66F0314BD2FB1E61, 0xF56EC49673B39A7A, 0x5E994AF4F8DDEF70,
+    0x0CE7F43C9F6F67E5, 0x3748B6431EFB47EE, 0xF75C5345D75CAD10, 0x4CCEAC80717A6433,
+    0xC9BCFBA961976531, 0xF564D415402EC37E, 0xFB076BE0004ECE22, 0x876BED4C3A43A6E5,
+    0x49574E3F7B993A9B, 0xADD9AF4F051E3035, 0x202574019A413A73, 0xE022512D1CBC440B,
+    0xD43E53E62E3924CB, 0x6B8D0E78A4CAF226, 0xC77EBFA5FFD63CB2, 0xD86F6114D21CBEE4,
+    0x6F13F856577D0E55, 0x4E26EFD5DB6A8A47, 0x13246E4F425B5BFF, 0x0523349F6694EF29,
+    0x947E220F856F3F49, 0xF4C603E9D14D6B13, 0x57FD7402B0350699, 0x6DCD013E332BA3B3,
+    0x43DB5A549BC88248, 0xEC8ECAC4F06BF56D, 0xC4F269E7E714DD75, 0xF538D2D46074EFAA,
+    0xD628C2C79DEC2EAA, 0xBAC8041B8F12E220, 0x49A07B6AB5C5306D, 0xD2E7C61031363315,
+    0xCC299189985034E0, 0xF4416DE4584F6F77, 0x678020754DBDAD94, 0x495D93C551670542,
+    0xB6534FB8CE8B2F27, 0xA25ADB0C4D9A859F, 0xCEE939614B59F13A, 0x07ADC7F34D01B8C4,
+    0xAF1987FE5BEE1FE4, 0x45A757BDA678826A, 0x9DEE27E45EF56579, 0x2E585C4E06E132E1,
+    0x8E0B929356F9F484, 0xF9BE1788458D8CFA, 0x8B0C6977B35977E9, 0x867C45B067DFC4A0,
+    0xBA65D06BB5F9F3AC, 0xC31F81CDF8CF6B3B, 0xB819E4528CCCB961, 0xD22346A16C322A66,
+    0x74DA7FCFE5B2FC23, 0x1ED4B76AA02421D7, 0xA3A06474050D670A, 0x4DDEFC4232134A19,
+    0xE43EEEDAECA63598, 0x705C6FF91EA82DBC, 0x74737C95BE9CE920, 0x254AB841589B00B1,
+    0x46783CDEAE2C0FC1, 0xA3A24836BCC6EBB7, 0xC45298BC6D935995, 0x3C9B7973BD5D034C,
+    0x295BD2A3565D7FCB, 0xB6A78C28315D67AF, 0xE6D17C0C81393355, 0x66490999E3BBE170,
+    0xF9C7AA94FC6CF6E4, 0x191266C9AB223C2F, 0xE42B535283FD3001, 0xAF0B388D4F3010FB,
+    0xE12CAB8D82A53F9D, 0xD49678F98C47AA36, 0x35C1BE910ADA3DBD, 0x2954107479AB629E,
+    0x3C5733DDAFA6E73B, 0x04F7E6B5F6809870, 0xA53EC91F93E16092, 0x86319B64EE5FEF18,
+    0xAEE45B8692A88246, 0xDFA233886AC09FF7, 0x294D72C26629EF9B, 0x5709304CE49DC09E,
+    0x9B654AA7DAC5C117, 0x7D2A0D4C7A468ED5, 0x9B99932C9CC01203, 0xC30DD90DAC796928,
+    0x4F21E1C1678046E5, 0x4010AA477ED4D4B2, 0x9AC66F63CA7CB594, 0x6ED88A3F4C31F800,
+    0x2AF114A430CD7800, 0xB03AF1DCB09F32F4, 0x650ADF61585C9537, 0x195EE618D242E60F,
+    0x6F4CD67D69129DE3, 0x763314A0183E3CD7, 0x156217DF57B17268, 0xB65D8F3F31E17F6F,
+    0x84AB011D5F22DB5E, 0xD32C5765FF1293B2, 0xA0C31D96ED8CDD0F, 0xEE94745E09B156F3,
+    0xA4085BD9F15EAAFA, 0x7420FAA341A3B115, 0xA64E0B96E7CDE70B, 0xE942C2ECFCCD6D9B,
+    0x5D3C000F242CB581, 0xA7FD4DCC87A617F7, 0xDEF0AFD6BAF2A9DC, 0x18636ACC795CAE10,
+    0x7F704EB2449BF1B3, 0x6C301F24DD6CC2FF, 0xA4416221EE58D466, 0xFA2EFF99EE6C7EEB,
+    0x212674105AADEDDD, 0x40CAC5174A4F2D97, 0x945D2CD174511261, 0xAF1FDC4A81E0369B,
+    0xEB8146786D304B9B, 0xBF6B4A8F0350C326, 0xADCD3789B38F0ADD, 0x3F4CB396582D5AEB,
+    0x3EA01CF21D0934E5, 0xBEF72F4664791915, 0xBF78AB04E48C3DD9, 0xC1D489FF87A1C839,
+    0x0ECF539ECC94A7C4, 0x312CDA0CC14B8E27, 0x8CA984E908CCFF3A, 0xF434C4A786E2CECF,
+    0xDD690D8D9F86B164,
+)
+_next_key = iter(_KEYS).__next__
+
+def _random_key():
+    return _next_key()
+
+#Indexed by piece code, then square. Codes that are never placed (EMPTY, 7, 8, 15) stay 0
+PIECE_KEYS = [[0] * 64 for _ in range(16)]
+for _code in (1, 2, 3, 4, 5, 6, 9, 10, 11, 12, 13, 14):
+    PIECE_KEYS[_code] = [_random_key() for _ in range(64)]
+
+#XORed in when black is to move
+TURN_KEY = _random_key()
+
+#One key per castling right, combined for each of the 16 possible sets of rights
+_RIGHT_KEYS = [_random_key() for _ in range(4)]
+CASTLING_KEYS = []
+for _rights in range(16):
+    _key = 0
+    for _bit in range(4):
+        if _rights >> _bit & 1:
+            _key ^= _RIGHT_KEYS[_bit]
+    CASTLING_KEYS.append(_key)
+
+#Indexed by the file of the en passant square
+EP_KEYS = [_random_key() for _ in range(8)]
+
+def compute_key(squares, black_to_move, castling, ep_square):
+    #Hash a position from scratch. ep_square is 64 when there is none
+    key = 0
+    for index in range(64):
+        code = squares[index]
+        if code:
+            key ^= PIECE_KEYS[code][index]
+    if black_to_move:
+        key ^= TURN_KEY
+    key ^= CASTLING_KEYS[castling]
+    if ep_square < 64:
+        key ^= EP_KEYS[ep_square & 7]
+    return key
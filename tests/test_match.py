@@ -0,0 +1,48 @@
+import math
+import unittest
+from objects.match import sprt_llr, sprt_bounds, elo
+
+class SPRTTest(unittest.TestCase):
+    def test_known_values(self):
+        #Half a game added to each count, then the normal approximation of the GSPRT
+        self.assertAlmostEqual(sprt_llr(10, 20, 10, 0, 10), -0.033951, places = 5)
+        self.assertAlmostEqual(sprt_llr(25, 50, 15, 0, 10), 0.572895, places = 5)
+        self.assertAlmostEqual(sprt_llr(30, 0, 0, 0, 50), 51.441969, places = 5)
+
+    def test_no_games(self):
+        self.assertAlmostEqual(sprt_llr(0, 0, 0, 0, 10), 0.0, places = 2)
+
+    def test_clean_sweeps_are_decided(self):
+        low, high = sprt_bounds(0.05, 0.05)
+        self.assertGreater(sprt_llr(30, 0, 0, 0, 50), high)
+        self.assertLess(sprt_llr(0, 0, 30, 0, 50), low)
+        self.assertLess(sprt_llr(0, 30, 0, 0, 50), low)
+
+    def test_one_draw_does_not_swing_the_ratio(self):
+        sweep = sprt_llr(30, 0, 0, 0, 50)
+        self.assertLess(sprt_llr(29, 1, 0, 0, 50), sweep)
+        self.assertLess(sprt_llr(5, 1, 0, 0, 5), sprt_bounds(0.05, 0.05)[1])
+
+    def test_symmetry(self):
+        self.assertAlmostEqual(sprt_llr(12, 30, 8, 0, 10), sprt_llr(8, 30, 12, 0, -10), places = 9)
+
+    def test_bounds(self):
+        low, high = sprt_bounds(0.05, 0.05)
+        self.assertAlmostEqual(high, math.log(19))
+        self.assertAlmostEqual(low, -math.log(19))
+
+class EloTest(unittest.TestCase):
+    def test_even_score(self):
+        difference, margin = elo(10, 20, 10)
+        self.assertEqual(difference, 0.0)
+        self.assertGreater(margin, 0)
+
+    def test_clean_sweep(self):
+        self.assertEqual(elo(10, 0, 0), (math.inf, math.inf))
+        self.assertEqual(elo(0, 0, 4), (-math.inf, math.inf))
+
+    def test_one_sided_margin_is_infinite(self):
+        self.assertEqual(elo(9, 1, 0)[1], math.inf)
+
+if __name__ == '__main__':
+    unittest.main()
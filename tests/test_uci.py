@@ -0,0 +1,46 @@
+import time
+import unittest
+from objects.game import Game
+from objects.uci import UCIEngine
+
+SHUFFLE = 'g1f3 g8f6 f3g1 f6g8 g1f3 g8f6 f3g1 f6g8'
+
+class UCITest(unittest.TestCase):
+    def setUp(self):
+        self.lines = []
+        self.engine = UCIEngine(self.lines.append)
+
+    def tearDown(self):
+        self.engine.handle('quit')
+
+    def test_position_replays_past_threefold_repetition(self):
+        self.engine.handle(f'position startpos moves {SHUFFLE} e2e4')
+        expected = Game()
+        for move in SHUFFLE.split() + ['e2e4']:
+            expected.play_move(move)
+        self.assertFalse(any('Bad position' in line for line in self.lines))
+        self.assertEqual(self.engine.game.to_fen(), expected.to_fen())
+        self.engine.handle('go depth 1')
+        self.engine.stop()
+        bestmove = [line for line in self.lines if line.startswith('bestmove')][-1].split()[1]
+        self.assertIn(bestmove, expected.legal_moves())
+
+    def test_position_rejects_illegal_moves(self):
+        self.engine.handle('position startpos moves e2e5')
+        self.assertTrue(any('Bad position' in line for line in self.lines))
+        self.assertEqual(self.engine.game.to_fen(), Game().to_fen())
+
+    def test_infinite_search_holds_bestmove_until_stop(self):
+        #Mate in one: the search ends almost at once, but must not say so before stop
+        self.engine.handle('position fen 6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1')
+        self.engine.handle('go infinite')
+        deadline = time.monotonic() + 5
+        while not any('score mate' in line for line in self.lines) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.2)
+        self.assertFalse(any(line.startswith('bestmove') for line in self.lines))
+        self.engine.handle('stop')
+        self.assertEqual(self.lines[-1].split()[:2], ['bestmove', 'a1a8'])
+
+if __name__ == '__main__':
+    unittest.main()